@@ -0,0 +1,48 @@
+"""
+Measures building the recipient list of a broadcast to teams whose members overlap:
+the nested list membership checks Competition.send_email used to make, against
+model.broadcast.unique_recipients (pass the number of teams and members per team).
+
+Run from the project root with:  python -m benchmarks.bench_broadcast [teams] [members per team]
+"""
+import sys
+import time
+from model.broadcast import unique_recipients
+from model.team import Team
+from model.team_member import TeamMember
+
+
+def build_teams(num_teams, members_per_team):
+    # every member plays on two neighbouring teams
+    members = [TeamMember(i + 1, f"Member {i}", f"m{i}@example.com") for i in range(num_teams * members_per_team // 2)]
+    teams = []
+    for t in range(num_teams):
+        team = Team(t + 1, f"Team {t}")
+        start = t * members_per_team // 2
+        for member in (members * 2)[start:start + members_per_team]:
+            team.add_member(member)
+        teams.append(team)
+    return teams
+
+
+def nested_list_recipients(teams):
+    recipient_list = []
+    members = []
+    for team in teams:
+        for member in team.iter_members():
+            if member not in members:
+                members.append(member)
+                if member.email is not None and member.email != "":
+                    if member.email not in recipient_list:
+                        recipient_list.append(member.email)
+    return recipient_list
+
+
+if __name__ == '__main__':
+    num_teams = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    members_per_team = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    teams = build_teams(num_teams, members_per_team)
+    for name, function in (("nested lists", nested_list_recipients), ("casefolded set", unique_recipients)):
+        start = time.perf_counter()
+        recipients = function(teams)
+        print(f"{name:>15}: {time.perf_counter() - start:.4f}s, {len(recipients):,} recipients")
@@ -0,0 +1,75 @@
+"""
+Compares the memory allocated by one UI-style refresh of a league (visiting
+every team and every member) when the collections are copied on each read
+versus read through the zero-copy views.
+
+Run from the project root with:  python -m benchmarks.bench_collection_reads
+"""
+import tracemalloc
+from model.league import League
+from model.team import Team
+from model.team_member import TeamMember
+
+
+def build_league(num_teams, members_per_team):
+    """
+    Builds a league with the specified number of teams and members per team.
+
+    :param num_teams: The number of teams to create.
+    :param members_per_team: The number of members on each team.
+    :return: The new league.
+    """
+    league = League(1, "Benchmark")
+    for team_oid in range(1, num_teams + 1):
+        team = Team(team_oid, f"Team {team_oid}")
+        for member_oid in range(1, members_per_team + 1):
+            team.add_member(TeamMember(member_oid, f"Member {member_oid}", f"m{team_oid}.{member_oid}@example.com"))
+        league.add_team(team)
+    return league
+
+
+def refresh_with_copies(league):
+    # what every read cost before the views: a fresh list per property access
+    rows = 0
+    for team in list(league.teams):
+        for member in list(team.members):
+            rows += 1
+    return rows
+
+
+def refresh_with_views(league):
+    rows = 0
+    for team in league.teams:
+        for member in team.members:
+            rows += 1
+    return rows
+
+
+def refresh_with_iterators(league):
+    rows = 0
+    for team in league.iter_teams():
+        for member in team.iter_members():
+            rows += 1
+    return rows
+
+
+def peak_bytes(refresh, league):
+    """
+    Returns the peak number of bytes allocated while running a refresh.
+
+    :param refresh: The refresh function to measure.
+    :param league: The league to refresh.
+    :return: The peak traced allocation size in bytes.
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    refresh(league)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == '__main__':
+    league = build_league(500, 200)
+    for refresh in (refresh_with_copies, refresh_with_views, refresh_with_iterators):
+        print(f"{refresh.__name__:>24}: {peak_bytes(refresh, league):>10,} bytes peak per refresh")
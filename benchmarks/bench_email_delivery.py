@@ -0,0 +1,97 @@
+"""
+Measures sending one message to a league of members the way Emailer used to (a new
+logged-in session per call and one message per recipient) against DeliveryEngine
+(a pooled session and one blind-copied message per batch of recipients).
+
+The SMTP server is a stand-in running in this process on a local port. It accepts
+everything and waits a fixed time before each reply to stand for the round trip to
+a real mail server (pass the number of recipients and the delay in milliseconds as
+arguments).
+
+Run from the project root with:  python -m benchmarks.bench_email_delivery [recipients] [delay ms]
+"""
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+from model.email_delivery import DeliveryEngine, SmtpPool, build_message
+
+SENDER = "league@example.com"
+
+
+class StandInHandler(socketserver.StreamRequestHandler):
+    """
+    Speaks just enough SMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP and QUIT.
+    """
+    def reply(self, line):
+        time.sleep(self.server.delay)
+        self.wfile.write(line + b"\r\n")
+
+    def handle(self):
+        self.reply(b"220 stand-in ready")
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.reply(b"250-stand-in\r\n250 AUTH PLAIN LOGIN")
+            elif command == b"AUTH":
+                self.reply(b"235 accepted")
+            elif command == b"DATA":
+                self.reply(b"354 go ahead")
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                self.server.messages += 1
+                self.reply(b"250 queued")
+            elif command == b"QUIT":
+                self.reply(b"221 bye")
+                return
+            else:
+                self.reply(b"250 ok")
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.delay = delay
+        self.messages = 0
+
+
+def connect(server):
+    connection = smtplib.SMTP(*server.server_address)
+    connection.login(SENDER, "password")
+    return connection
+
+
+def send_one_by_one(server, recipients, subject, message):
+    # what Emailer.send_plain_email did with yagmail
+    connection = connect(server)
+    data = build_message(SENDER, subject, message)
+    for recipient in recipients:
+        connection.sendmail(SENDER, [recipient], data)
+    connection.quit()
+
+
+if __name__ == '__main__':
+    num_recipients = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 1.0) / 1000
+    server = StandInServer(delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    recipients = [f"member{i}@example.com" for i in range(num_recipients)]
+    print(f"{num_recipients:,} recipients, {delay * 1000:g} ms per reply")
+
+    start = time.perf_counter()
+    send_one_by_one(server, recipients, "Bonspiel", "See you on the ice.")
+    print(f"one by one:     {time.perf_counter() - start:.2f}s, {server.messages} messages")
+
+    engine = DeliveryEngine(SmtpPool(lambda: connect(server)), SENDER)
+    engine.send(["warm-up@example.com"], "Warm-up", "")  # the pooled session is opened once per program
+    server.messages = 0
+    start = time.perf_counter()
+    result = engine.send(recipients, "Bonspiel", "See you on the ice.")
+    print(f"pooled batches: {time.perf_counter() - start:.2f}s, {result}")
+    engine.pool.close()
+    server.shutdown()
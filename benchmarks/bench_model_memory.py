@@ -0,0 +1,58 @@
+"""
+Reports the memory used per member, team and competition of a synthetic league,
+measured with tracemalloc. Index and back-reference overhead is included.
+
+Run from the project root with:  python -m benchmarks.bench_model_memory
+"""
+import tracemalloc
+from model.competition import Competition
+from model.league import League
+from model.team import Team
+from model.team_member import TeamMember
+
+
+def traced_bytes(build):
+    """
+    Returns the result of build() and the number of bytes it left allocated.
+
+    :param build: A function that creates the objects to measure.
+    :return: A (result, bytes) tuple.
+    """
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    result = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, after - before
+
+
+if __name__ == '__main__':
+    num_teams, members_per_team = 1_000, 100
+    league = League(1, "Benchmark")
+
+    def build_teams():
+        teams = [Team(oid, f"Team {oid}") for oid in range(1, num_teams + 1)]
+        for team in teams:
+            league.add_team(team)
+        return teams
+
+    teams, team_bytes = traced_bytes(build_teams)
+
+    def build_members():
+        for team in teams:
+            for oid in range(1, members_per_team + 1):
+                team.add_member(TeamMember(oid, f"Member {oid}", f"m{team.oid}.{oid}@example.com"))
+
+    _, member_bytes = traced_bytes(build_members)
+
+    def build_competitions():
+        for oid in range(1, num_teams):
+            league.add_competition(Competition(oid, [teams[oid - 1], teams[oid]], f"Rink {oid}", None))
+
+    _, competition_bytes = traced_bytes(build_competitions)
+
+    num_members = num_teams * members_per_team
+    print(f"{'object':>12} {'count':>10} {'bytes each':>12}")
+    print(f"{'member':>12} {num_members:>10} {member_bytes / num_members:>12.1f}")
+    print(f"{'team':>12} {num_teams:>10} {team_bytes / num_teams:>12.1f}")
+    print(f"{'competition':>12} {num_teams - 1:>10} {competition_bytes / (num_teams - 1):>12.1f}")
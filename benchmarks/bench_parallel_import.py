@@ -0,0 +1,65 @@
+"""
+Imports a season's worth of club roster files with an increasing number of
+worker processes and reports the elapsed time for each, then the time the parent
+process alone spends taking the files' teams in, which no number of workers can
+beat.
+
+The workers read the files and build and check their teams; the parent rebuilds
+each team from its members' values and adds it to the league. On one CPU, 200
+files of 2,000 rows (400,000 rows) measured 3.3-4.9s of worker work against
+3.3-4.3s in the parent, so the import can at best run about twice as fast as with
+one worker. Sending parsed rows instead, as before, left 4.0-5.0s of merging in
+the parent against 0.4-0.5s of parsing: a ceiling of 1.1x.
+
+Run from the project root with:  python -m benchmarks.bench_parallel_import [files] [rows per file]
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+from model.league import League
+from model.roster_import import RosterImporter, _build_for_transfer
+
+
+def write_club_files(directory, num_files, rows_per_file):
+    """
+    Writes one roster CSV per club.
+
+    :param directory: The directory to write the files to.
+    :param num_files: The number of files to write.
+    :param rows_per_file: The number of member rows in each file.
+    :return: The file names, in order.
+    """
+    file_names = []
+    for club in range(num_files):
+        file_name = os.path.join(directory, f"club_{club:04}.csv")
+        with open(file_name, "w", encoding="utf-8", newline="") as file:
+            file.write("Team name,Member name,Member email\n")
+            for row in range(rows_per_file):
+                file.write(f"Club {club} Team {row % 20},Member {row},m{row}@club{club}.example.com\n")
+        file_names.append(file_name)
+    return file_names
+
+
+if __name__ == '__main__':
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rows_per_file = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    with tempfile.TemporaryDirectory() as directory:
+        file_names = write_club_files(directory, num_files, rows_per_file)
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            league = League(1, "Benchmark")
+            start = time.perf_counter()
+            result = league.import_league_team_files(file_names, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>3} workers: {result.rows_read:,} rows in {elapsed:.2f}s")
+            workers *= 2
+
+        built = [_build_for_transfer(file_name) for file_name in file_names]
+        importer = RosterImporter(League(1, "Benchmark"))
+        start = time.perf_counter()
+        for data in built:
+            teams, lines, result = pickle.loads(data)
+            importer.merge_teams(teams, lines, result)
+        print(f"     parent alone: {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,44 @@
+"""
+Measures loading a 1,000-league database saved as a shard directory with different
+numbers of reader threads, next to loading the same database from a single pickle
+(pass a different member count per league as the first argument).
+
+Unpickling holds the GIL and is always done on the loading thread; the reader
+threads only fetch the shard files' bytes ahead of it. With the shards in the file
+cache there is nothing for them to win: on one CPU with 200 members per league the
+single pickle took 1.86s, one thread 2.03s and two to eight threads 2.04s-2.34s.
+Expect a gain only when the reads are slow, as with a cold cache or a network drive.
+
+Run from the project root with:  python -m benchmarks.bench_shard_load [members]
+"""
+import os
+import sys
+import tempfile
+import time
+from benchmarks.bench_sqlite_store import build_database
+from model.league_database import LeagueDatabase
+
+NUM_LEAGUES = 1_000
+
+
+def timed_read(file_name, max_workers=None):
+    start = time.perf_counter()
+    LeagueDatabase.read(file_name, max_workers)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    num_members = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    db = build_database(NUM_LEAGUES, num_members)
+    cpus = os.cpu_count() or 1
+    print(f"{NUM_LEAGUES:,} leagues of {num_members:,} members, {cpus} CPUs")
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_file = os.path.join(directory, "leagues.pkl")
+        shards = os.path.join(directory, "leagues.shards")
+        db.save(pickle_file)
+        db.save(shards)
+        print(f"{'single pickle':>16}: {timed_read(pickle_file):.2f}s")
+        workers = 1
+        while workers <= max(8, 2 * cpus):
+            print(f"{workers:>8} threads: {timed_read(shards, workers):.2f}s")
+            workers *= 2
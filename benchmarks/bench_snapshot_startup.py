@@ -0,0 +1,41 @@
+"""
+Measures time-to-first-row: how long it takes from opening a file until the main
+window could show its first league row (oid, name and number of teams, as
+MainWindow.refresh_league_list does). Compares a pickle file, a SQLite store and an
+mmap snapshot for 20 leagues of 50,000 members each (pass a different member count
+per league as the first argument). The window itself is left out so the benchmark
+runs without a display.
+
+Run from the project root with:  python -m benchmarks.bench_snapshot_startup [members]
+"""
+import os
+import sys
+import tempfile
+import time
+from benchmarks.bench_sqlite_store import NUM_LEAGUES, build_database
+from model.league_database import LeagueDatabase
+
+
+def first_row(file_name):
+    """
+    Opens a database file and returns the cells of the first league row.
+
+    :param file_name: The file to open.
+    :return: The (oid, name, number of teams) cells.
+    """
+    league = LeagueDatabase.read(file_name).leagues[0]
+    return str(league.oid), league.name, str(league.team_count)
+
+
+if __name__ == '__main__':
+    num_members = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    db = build_database(NUM_LEAGUES, num_members)
+    with tempfile.TemporaryDirectory() as directory:
+        for suffix in (".pkl", ".sqlite", ".snapshot"):
+            file_name = os.path.join(directory, "leagues" + suffix)
+            db.save(file_name)
+            start = time.perf_counter()
+            row = first_row(file_name)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(file_name) / 2**20
+            print(f"{suffix:>9} ({size:,.0f} MiB): first row {row} after {elapsed * 1000:,.1f} ms")
@@ -0,0 +1,62 @@
+"""
+Compares opening a database saved as a pickle file with opening it as a SQLite store,
+for 20 leagues of 10,000 members each (pass a different member count per league as
+the first argument). The store only reads league rows on load, so its time and memory
+grow with the leagues that are actually opened.
+
+Run from the project root with:  python -m benchmarks.bench_sqlite_store [members]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.bench_league_export import build_league
+from model.league_database import LeagueDatabase
+
+NUM_LEAGUES = 20
+
+
+def build_database(num_leagues, num_members):
+    """
+    Builds a database of leagues with the specified number of members each.
+
+    :param num_leagues: The number of leagues.
+    :param num_members: The number of members in each league.
+    :return: The new database.
+    """
+    db = LeagueDatabase()
+    for oid in range(1, num_leagues + 1):
+        db.add_league(build_league(num_members, oid=oid))
+    return db
+
+
+def measure(label, action):
+    """
+    Runs action and prints its time and peak traced memory.
+
+    :param label: The name to print.
+    :param action: A function to time.
+    :return: The result of action().
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = action()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:>28}: {elapsed:.3f}s, peak {peak / 2**20:,.1f} MiB")
+    return result
+
+
+if __name__ == '__main__':
+    num_members = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    db = build_database(NUM_LEAGUES, num_members)
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_file = os.path.join(directory, "leagues.pkl")
+        store_file = os.path.join(directory, "leagues.sqlite")
+        db.save(pickle_file)
+        db.save(store_file)
+        measure("load pickle", lambda: LeagueDatabase.read(pickle_file))
+        loaded = measure("load store", lambda: LeagueDatabase.read(store_file))
+        measure("open one league from store", lambda: len(loaded.leagues[0].teams))
@@ -0,0 +1,30 @@
+"""
+Measures how long it takes to fill a single team with members.
+
+Run from the project root with:  python -m benchmarks.bench_team_roster
+"""
+import time
+from model.team import Team
+from model.team_member import TeamMember
+
+
+def build_roster(size):
+    """
+    Builds a team with the specified number of members and returns the elapsed time in seconds.
+
+    :param size: The number of members to add.
+    :return: The time taken to add all members.
+    """
+    team = Team(1, "Benchmark")
+    members = [TeamMember(oid, f"Member {oid}", f"member{oid}@example.com") for oid in range(1, size + 1)]
+    start = time.perf_counter()
+    for member in members:
+        team.add_member(member)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    print(f"{'members':>10} {'seconds':>10} {'usec/member':>12}")
+    for size in (100, 1_000, 10_000, 100_000):
+        elapsed = build_roster(size)
+        print(f"{size:>10} {elapsed:>10.4f} {elapsed / size * 1e6:>12.2f}")
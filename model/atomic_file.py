@@ -0,0 +1,51 @@
+"""
+Writing files so that readers see either the old or the new contents, never a mix.
+"""
+import contextlib
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_write(file_name):
+    """
+    Opens a temporary file next to file_name for binary writing. If the block finishes
+    without an exception, the data is synced to disk and the temporary file replaces
+    file_name; otherwise the temporary file is deleted and file_name is left as it was.
+
+    :param file_name: The name of the file to write.
+    :return: A context manager yielding the open temporary file.
+    """
+    directory = os.path.dirname(os.path.abspath(file_name))
+    descriptor, temporary_name = tempfile.mkstemp(dir=directory, prefix=os.path.basename(file_name) + ".",
+                                                  suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_name, file_name)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temporary_name)
+        raise
+    sync_directory(directory)
+
+
+def sync_directory(directory):
+    """
+    Makes renames in a directory durable. Does nothing where directories cannot be
+    opened (Windows), since renames there are already durable.
+
+    :param directory: The name of the directory.
+    """
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
@@ -0,0 +1,114 @@
+"""
+Saves a LeagueDatabase in the background after it changes.
+
+The service watches the database's change count from a worker thread. Once the
+database is dirty and no change has been reported for `delay` seconds (or it has been
+dirty for `max_delay` seconds while edits keep coming), the worker calls
+LeagueDatabase.save. The thread that edits the model, such as the Qt event loop,
+does not spend its own time writing the file.
+
+A save holds the database's read lock (see model.rw_lock), so a change made on
+another thread while the file is written waits for the save to finish and is then
+picked up by the next one.
+"""
+import threading
+import time
+
+DEFAULT_DELAY = 2.0  # seconds without changes before saving
+DEFAULT_MAX_DELAY = 30.0  # longest a change waits while edits keep coming
+
+
+class AutosaveService:
+    """
+    A background thread that saves a database to a file a short time after it changes.
+    """
+    def __init__(self, database, file_name, delay=DEFAULT_DELAY, max_delay=DEFAULT_MAX_DELAY):
+        """
+        Initializes an autosave service. Call start() to begin watching.
+
+        :param database: The LeagueDatabase to save.
+        :param file_name: The file to save to (any format LeagueDatabase.save accepts).
+        :param delay: Optional. Seconds without changes before the database is saved.
+        :param max_delay: Optional. Most seconds a change waits while changes keep arriving.
+        """
+        self.database = database
+        self.file_name = file_name
+        self.delay = delay
+        self.max_delay = max_delay
+        self.saves = 0  # number of saves completed
+        self.failed = False  # True if the last save failed (the error is printed by LeagueDatabase.save)
+        self._wake = threading.Event()
+        self._stopping = False
+        self._save_lock = threading.Lock()  # one save at a time, from the worker or from flush()
+        self._thread = None
+
+    @property
+    def running(self):
+        """
+        Read-only property that is True while the worker thread is running.
+
+        :return: True if the service has been started and not stopped.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts the worker thread.
+        """
+        if self.running:
+            return
+        self._stopping = False
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the worker thread, then saves whatever is still pending. Call this before
+        the application exits.
+
+        :return: True if nothing is left unsaved.
+        """
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        return self.flush()
+
+    def flush(self):
+        """
+        Saves the database now if it has unsaved changes, on the calling thread.
+
+        :return: True if nothing is left unsaved.
+        """
+        with self._save_lock:
+            if not self.database.is_dirty:
+                return True
+            saved = self.database.save(self.file_name)
+            self.failed = not saved
+            if saved:
+                self.saves += 1
+            return saved and not self.database.is_dirty
+
+    def _run(self):
+        seen = self.database.change_count
+        dirty_since = None  # monotonic time the first unsaved change was seen
+        while not self._stopping:
+            self._wake.wait(self.delay)
+            if self._stopping:
+                break
+            count = self.database.change_count
+            now = time.monotonic()
+            if count != seen:
+                seen = count
+                if dirty_since is None:
+                    dirty_since = now
+                if now - dirty_since < self.max_delay:
+                    continue  # still being edited; wait for a quiet period
+            if not self.database.is_dirty:
+                dirty_since = None
+                continue
+            self.flush()
+            # after a failed save, or changes made during it, try again after the next quiet period
+            dirty_since = now if self.database.is_dirty else None
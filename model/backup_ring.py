@@ -0,0 +1,231 @@
+"""
+A bounded ring of backup generations for a database file.
+
+Before a new version of file_name replaces the current one, the current one is kept
+as a backup in one of a fixed number of slots (file_name + ".backup1" ... ".backupN",
+with ".gz" or ".xz" added when compressed). An index file (file_name + ".backups")
+records the size and CRC-32 of the live file and of every backup together with its
+generation number, so the next slot is generation % N and the newest valid copy is
+found from the index instead of by opening each file in turn.
+"""
+import gzip
+import json
+import lzma
+import os
+import shutil
+import zlib
+from model.atomic_file import atomic_write
+
+INDEX_VERSION = 1
+DEFAULT_GENERATIONS = 5
+COMPRESSIONS = {None: "", "gzip": ".gz", "lzma": ".xz"}  # compression -> suffix of the backup file
+COPY_BUFFER = 1 << 20
+
+
+def _compressor(stream, compression):
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="wb", compresslevel=6)
+    return lzma.LZMAFile(stream, mode="wb", preset=1)
+
+
+def _decompressor(stream, compression):
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if compression == "lzma":
+        return lzma.LZMAFile(stream, mode="rb")
+    return stream
+
+
+class ChecksumWriter:
+    """
+    Passes writes through to a binary stream while counting bytes and computing their CRC-32.
+    """
+    def __init__(self, stream):
+        """
+        Initializes a writer over the specified stream.
+
+        :param stream: The writable binary stream.
+        """
+        self._stream = stream
+        self.size = 0
+        self.crc32 = 0
+
+    def write(self, data):
+        self.size += len(data)
+        self.crc32 = zlib.crc32(data, self.crc32)
+        return self._stream.write(data)
+
+    @property
+    def checksum(self):
+        """
+        Read-only property describing the bytes written so far, in the form stored in the index.
+
+        :return: A dict with "size" and "crc32".
+        """
+        return {"size": self.size, "crc32": self.crc32}
+
+
+class ChecksumReader:
+    """
+    Passes reads through from a binary stream while counting bytes and computing their CRC-32.
+    """
+    def __init__(self, stream):
+        """
+        Initializes a reader over the specified stream.
+
+        :param stream: The readable binary stream.
+        """
+        self._stream = stream
+        self.size = 0
+        self.crc32 = 0
+
+    def _count(self, data):
+        self.size += len(data)
+        self.crc32 = zlib.crc32(data, self.crc32)
+        return data
+
+    def read(self, size=-1):
+        return self._count(self._stream.read(size))
+
+    def readline(self, size=-1):
+        return self._count(self._stream.readline(size))
+
+    def matches(self, checksum):
+        """
+        Reads whatever is left of the stream and compares everything read with a checksum.
+
+        :param checksum: A dict with "size" and "crc32", or None to accept any contents.
+        :return: True if the contents match (or there is nothing to compare with).
+        """
+        while self.read(COPY_BUFFER):
+            pass
+        return checksum is None or (self.size == checksum["size"] and self.crc32 == checksum["crc32"])
+
+
+class BackupRing:
+    """
+    The backup generations of one database file and the index describing them.
+    """
+    def __init__(self, file_name, generations=DEFAULT_GENERATIONS, compression=None):
+        """
+        Initializes the ring of the specified file.
+
+        :param file_name: The name of the database file.
+        :param generations: Optional. The number of backups kept (0 keeps none).
+        :param compression: Optional. None, "gzip" or "lzma" for backups written from now on.
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression {compression!r}; expected one of {tuple(COMPRESSIONS)}")
+        self.file_name = file_name
+        self.generations = generations
+        self.compression = compression
+        self.index_file_name = file_name + ".backups"
+
+    def read_index(self):
+        """
+        Reads the index. A missing or unreadable index describes a file without backups.
+
+        :return: A dict with "generation", "primary" (checksum of the live file or None) and "backups".
+        """
+        try:
+            with open(self.index_file_name, encoding="utf-8") as file:
+                index = json.load(file)
+            if index.get("version") == INDEX_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+        return {"version": INDEX_VERSION, "generation": 0, "primary": None, "backups": []}
+
+    def _write_index(self, index):
+        with atomic_write(self.index_file_name) as file:
+            file.write(json.dumps(index, indent=1).encode("utf-8"))
+
+    def rotate(self, checksum):
+        """
+        Keeps the current file as the newest backup and records the checksum of the file
+        about to replace it. Call this after the new contents are written under a
+        temporary name and before that name is renamed over file_name.
+
+        :param checksum: The checksum (see ChecksumWriter) of the new contents.
+        """
+        index = self.read_index()
+        generation = index["generation"] + 1
+        backups = index["backups"]
+        if self.generations > 0 and os.path.exists(self.file_name):
+            slot = f"{self.file_name}.backup{generation % self.generations + 1}"
+            backup_name = slot + COMPRESSIONS[self.compression]
+            self._copy_to(backup_name)
+            slot_files = {os.path.basename(slot + suffix) for suffix in COMPRESSIONS.values()}
+            backups = [entry for entry in backups if entry["file"] not in slot_files]
+            for suffix in COMPRESSIONS.values():
+                if slot + suffix != backup_name and os.path.exists(slot + suffix):
+                    os.unlink(slot + suffix)  # the slot held a backup with other compression settings
+            backups.insert(0, {"file": os.path.basename(backup_name), "generation": generation - 1,
+                               "compression": self.compression, "checksum": index["primary"]})
+        index = {"version": INDEX_VERSION, "generation": generation, "primary": checksum,
+                 "backups": backups[:max(self.generations, 0)]}
+        self._write_index(index)
+
+    def _copy_to(self, backup_name):
+        if self.compression is None:
+            # a hard link costs nothing and keeps the old contents once file_name is replaced
+            link_name = backup_name + ".tmp"
+            try:
+                if os.path.exists(link_name):
+                    os.unlink(link_name)
+                os.link(self.file_name, link_name)
+                os.replace(link_name, backup_name)
+                return
+            except OSError:
+                pass
+        with open(self.file_name, "rb") as source, atomic_write(backup_name) as target:
+            if self.compression is None:
+                shutil.copyfileobj(source, target, COPY_BUFFER)
+            else:
+                with _compressor(target, self.compression) as compressed:
+                    shutil.copyfileobj(source, compressed, COPY_BUFFER)
+
+    def backups(self):
+        """
+        Returns the backups recorded in the index, newest first.
+
+        :return: A list of (file name, compression, checksum) tuples.
+        """
+        directory = os.path.dirname(self.file_name)
+        return [(os.path.join(directory, entry["file"]), entry["compression"], entry["checksum"])
+                for entry in sorted(self.read_index()["backups"], key=lambda entry: -entry["generation"])]
+
+    @staticmethod
+    def open(file_name, compression=None):
+        """
+        Opens a backup (or the live file) for reading its uncompressed contents.
+
+        :param file_name: The name of the file.
+        :param compression: Optional. The compression of the file.
+        :return: A readable binary stream; closing it closes the file.
+        """
+        stream = open(file_name, "rb")
+        if compression is None:
+            return stream
+        return _ClosingDecompressor(_decompressor(stream, compression), stream)
+
+
+class _ClosingDecompressor:
+    """
+    A decompressing stream that also closes the file under it.
+    """
+    def __init__(self, decompressor, stream):
+        self._decompressor = decompressor
+        self._stream = stream
+        self.read = decompressor.read
+        self.readline = decompressor.readline
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._decompressor.close()
+        self._stream.close()
@@ -0,0 +1,205 @@
+"""
+Batches of changes to a LeagueDatabase that take effect together or not at all.
+
+Inside `with database.batch():` the database's write lock is held throughout, so
+other threads see none of the batch until it commits. Every change made in the
+block goes through the batched form of its method (_batched_<name>, called by
+model.rw_lock.mutator), which changes only the primary data: the oid-keyed
+collections, names, emails, oid allocators and back-references. It appends the
+inverse of what it did to the batch's undo log, and leaves the indexes derived from
+that data (member names and emails, team names, the member -> teams and team ->
+competitions reverse indexes, league names) out of date.
+
+An out-of-date index is detached from its object the first time a change touches
+it in the batch, and kept aside. Reading it inside the batch rebuilds it on demand
+from the object's __getattr__ (see model.rw_lock.rebuild_index), so reads in the
+block still see the changes. At the end of the block every detached index is
+rebuilt once from the primary data, and that rebuild is where the batch is
+validated: an email used twice on a team raises DuplicateEmail from the end of the
+with block instead of from the offending call. Checks that need only the primary
+data (duplicate oids, teams still in a competition) still raise at the call.
+Marking leagues dirty, counting changes and appending the journal records, pickled
+together as a single record, also wait for the commit.
+
+If the block or the validation raises, the detached indexes are put back as they
+were, the undo log is replayed backwards and collections that lost items get their
+order back, all in place, so references held elsewhere stay valid. The exception
+then propagates. Objects the batch took out of the database (a removed member,
+say) no longer reach it through their back-references, so until the batch ends
+their changes are routed to it by model.rw_lock instead, and undone with the rest.
+A league whose contents were loaded from its store during the batch stays loaded.
+"""
+from model.change_journal import encode_change
+from model.rw_lock import adopt_orphans, release_orphans
+
+_UNSET = object()  # stands for an attribute that is not set
+
+
+def _object_attribute(obj, name):
+    # reads an attribute without calling the class's __getattr__ (which would rebuild a detached index)
+    try:
+        return object.__getattribute__(obj, name)
+    except AttributeError:
+        return _UNSET
+
+
+class Batch:
+    """
+    The changes made to a database inside one `with database.batch():` block.
+    Created by LeagueDatabase.batch().
+    """
+    def __init__(self, database):
+        """
+        Initializes an empty batch.
+
+        :param database: The LeagueDatabase the batch changes.
+        """
+        self._database = database
+        self._undo = []  # (function, arguments) putting back one change, in the order the changes were made
+        self._detached = {}  # (id(object), index name) -> (object, index name, the index as the batch found it)
+        self._rebuilt = set()  # keys of _detached whose index was rebuilt on use and is out of date again
+        self._stale = set()  # (id(object), names) already passed to stale(), to skip repeats quickly
+        self._orders = {}  # id(collection) -> (collection, its keys in order) for collections that lost items
+        self._orphans = []  # keys of the objects taken out of the database, see model.rw_lock.adopt_orphans
+        self._dirty_leagues = {}  # id(league) -> league
+        self._changes = 0
+        self._records = []  # journal record tuples, if the database has a journal; pickled at commit
+
+    @property
+    def changes(self):
+        """
+        Read-only property representing the number of changes made in the batch so far.
+
+        :return: The number of changes.
+        """
+        return self._changes
+
+    def undo(self, function, *args):
+        """
+        Records how to put back a change just made. Called by the batched methods.
+
+        :param function: The function to call on rollback.
+        :param args: Its arguments.
+        """
+        self._undo.append((function, args))
+
+    def stale(self, obj, names):
+        """
+        Marks indexes of an object out of date: the first time in the batch they are
+        kept aside for a rollback, afterwards an index rebuilt on use is dropped again.
+
+        :param obj: The object keeping the indexes.
+        :param names: A tuple of the attribute names of the indexes.
+        """
+        if not self._rebuilt:
+            key = (id(obj), names)
+            if key in self._stale:
+                return
+            self._stale.add(key)
+        detached = self._detached
+        for name in names:
+            key = (id(obj), name)
+            if key not in detached:
+                index = detached[key] = (obj, name, _object_attribute(obj, name))
+                if index[2] is not _UNSET:
+                    object.__delattr__(obj, name)
+            elif self._rebuilt and key in self._rebuilt:
+                self._rebuilt.discard(key)
+                object.__delattr__(obj, name)
+
+    def keep_order(self, collection):
+        """
+        Remembers the order of an oid-keyed dictionary about to lose an item, so a
+        rollback can put the item back in its place.
+
+        :param collection: The dictionary.
+        """
+        if id(collection) not in self._orders:
+            self._orders[id(collection)] = (collection, list(collection))
+
+    def orphan(self, objects):
+        """
+        Keeps objects the batch took out of the database in the batch until it ends.
+        Called by the batched remove methods.
+
+        :param objects: An iterable of the removed object and everything it holds.
+        """
+        self._orphans += adopt_orphans(self, objects)
+
+    def team_changed(self, team, op, *args):
+        """
+        Records a change to a team or one of its members for every league holding the
+        team; the shortcut the batched methods take instead of Team._changed.
+
+        :param team: The team that changed.
+        :param op: The kind of change, e.g. "member.add".
+        :param args: The details of the change, after the team's oid.
+        """
+        database = self._database
+        journal = database._journal
+        for league in team._leagues:
+            databases = league._databases
+            if len(databases) != 1 or databases[0] is not database:
+                league._changed(op, team.oid, *args)  # held by another database as well
+                continue
+            self._dirty_leagues[id(league)] = league
+            self._changes += 1
+            if journal is not None:
+                self._records.append(encode_change((op, league.oid, team.oid) + args))
+
+    def changed(self, league, change):
+        """
+        Records a change reported to the database; it is applied to the database's
+        bookkeeping when the batch commits.
+
+        :param league: The league that changed.
+        :param change: The change tuple.
+        """
+        self._dirty_leagues[id(league)] = league
+        self._changes += 1
+        if self._database._journal is not None:
+            self._records.append(encode_change(change))  # the values as the change left them
+
+    def validate(self):
+        """
+        Rebuilds every index the batch left out of date from the primary data, checking it.
+
+        :raises DuplicateEmail: If a team ends up with two members using the same email address.
+        """
+        for obj, name, _ in self._detached.values():
+            object.__setattr__(obj, name, obj._build_index(name, True))
+        self._rebuilt.clear()
+
+    def commit(self):
+        """
+        Marks the changed leagues dirty, counts the changes and hands the journal records
+        over, pickled together as one batch record. Call after validate().
+        """
+        database = self._database
+        database._dirty_leagues.update(league.oid for league in self._dirty_leagues.values())
+        database._change_count += self._changes
+        if self._records:
+            database._journal.append(database._journal.encode_batch(self._records))
+        release_orphans(self._orphans)
+
+    def rollback(self):
+        """
+        Puts every object changed in the batch back as it was before the batch.
+        """
+        for obj, name, index in self._detached.values():
+            if index is _UNSET:
+                if _object_attribute(obj, name) is not _UNSET:
+                    object.__delattr__(obj, name)
+            else:
+                object.__setattr__(obj, name, index)
+        for function, args in reversed(self._undo):
+            function(*args)
+        for collection, keys in self._orders.values():
+            # the keys were saved at the first removal: items added before it are gone again
+            items = {key: collection[key] for key in keys if key in collection}
+            collection.clear()
+            collection.update(items)
+        release_orphans(self._orphans)
+        self._undo = []
+        self._detached = {}
+        self._orders = {}
@@ -0,0 +1,71 @@
+"""
+Sending one message to everyone on a group of teams, each person once.
+
+A member may play on several teams, and two member records may share an address
+spelled with different case. unique_recipients keeps a set of casefolded addresses
+(the same key the team email index uses), so the recipient list is built in one pass
+however many teams a person is on. The list is collected under the read lock of the
+databases holding the teams, so it is consistent, and handed to the emailer outside
+it, BROADCAST_BATCH_SIZE addresses per call, so a slow send never holds up writers.
+"""
+from model.rw_lock import read_locked
+
+BROADCAST_BATCH_SIZE = 500  # recipients handed to the emailer per call
+
+
+def unique_recipients(teams):
+    """
+    Lists the email addresses of the members of some teams, each address once (compared
+    without regard to case, keeping the first spelling). Members without an address are skipped.
+
+    :param teams: An iterable of teams.
+    :return: A list of email addresses, in team and member order.
+    """
+    seen = set()
+    recipients = []
+    for team in teams:
+        for member in team.iter_members():
+            email = member.email
+            if email:
+                key = email.casefold()
+                if key not in seen:
+                    seen.add(key)
+                    recipients.append(email)
+    return recipients
+
+
+def broadcast(emailer, teams, subject, message, databases=(), batch_size=BROADCAST_BATCH_SIZE):
+    """
+    Sends a message to every member of some teams, each address once.
+
+    :param emailer: The emailer object used to send the email (an EmailOutbox returns at once).
+    :param teams: A function returning an iterable of the teams; called under the read lock.
+    :param subject: The subject of the email.
+    :param message: The message content of the email.
+    :param databases: Optional. The databases whose read locks guard the teams.
+    :param batch_size: Optional. The most recipients handed to the emailer per call.
+    :return: A list of what the emailer returned, one entry per call (empty if there is nobody to send to).
+    """
+    with read_locked(databases):
+        recipients = unique_recipients(teams())
+    return [emailer.send_plain_email(recipients[start:start + batch_size], subject, message)
+            for start in range(0, len(recipients), batch_size)]
+
+
+def teams_playing_on(leagues, date):
+    """
+    Lists the teams with a competition on a given day, each team once.
+
+    :param leagues: An iterable of leagues.
+    :param date: A datetime.date (or datetime, whose date is used).
+    :return: A list of teams, in league and competition order.
+    """
+    date = date.date() if hasattr(date, "date") else date
+    teams = {}
+    for league in leagues:
+        for competition in league.competitions:
+            date_time = competition.date_time
+            if date_time is not None and date_time.date() == date:
+                for team in competition.teams_competing:
+                    teams.setdefault(id(team), team)
+    return list(teams.values())
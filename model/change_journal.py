@@ -0,0 +1,296 @@
+"""
+Append-only change journal for LeagueDatabase.
+
+A journaled database is stored as a pickle snapshot plus a journal file next to it
+(file_name + ".journal"). The journal starts with a header naming the snapshot
+generation it belongs to, followed by length-prefixed records, one per mutation:
+
+    ("league.add", league oid, name, teams, competitions)
+    ("league.remove", league oid)
+    ("league.set", league oid, attribute, value)
+    ("team.add", league oid, team oid, name, members)
+    ("team.remove", league oid, team oid)
+    ("team.set", league oid, team oid, attribute, value)
+    ("member.add", league oid, team oid, member oid, name, email)
+    ("member.remove", league oid, team oid, member oid)
+    ("member.set", league oid, team oid, member oid, attribute, value)
+    ("competition.add", league oid, competition oid, team oids, location, date_time)
+    ("competition.set", league oid, competition oid, attribute, value)
+    ("batch", records)      the records of a LeagueDatabase.batch(), in order
+
+Records hold only oids and plain values, never model objects, so each costs about
+the size of the change it describes. A batch is a single record, so a crash while
+it is written loses the whole batch rather than part of it.
+"""
+import os
+import pickle
+import struct
+import threading
+from model.competition import Competition
+from model.league import League
+from model.team import Team
+from model.team_member import TeamMember
+
+MAGIC = b"CLJ1"
+GENERATION_SIZE = 16
+RECORD_LENGTH = struct.Struct(">I")
+COMPACT_MIN_BYTES = 1 << 20  # never compact a journal smaller than this
+COMPACT_RATIO = 0.5  # compact once the journal is this large relative to the snapshot
+
+
+def journal_file_name(file_name):
+    """
+    Returns the name of the journal that belongs to a snapshot file.
+
+    :param file_name: The name of the snapshot file.
+    :return: The journal file name.
+    """
+    return file_name + ".journal"
+
+
+def _member_values(member):
+    return member.oid, member.name, member.email
+
+
+def _team_values(team):
+    return team.oid, team.name, tuple(_member_values(member) for member in team.iter_members())
+
+
+def _competition_values(competition):
+    return (competition.oid, tuple(team.oid for team in competition.teams_competing),
+            competition.location, competition.date_time)
+
+
+def encode_change(change):
+    """
+    Converts a change reported by the model into a journal record. Model objects in
+    the change are replaced by their values at the time of the change.
+
+    :param change: A change tuple as passed to LeagueDatabase._league_changed.
+    :return: The journal record tuple.
+    """
+    op = change[0]
+    if op == "league.add":
+        league = change[1]
+        return (op, league.oid, league.name, tuple(_team_values(team) for team in league.iter_teams()),
+                tuple(_competition_values(competition) for competition in league.competitions))
+    if op == "team.add":
+        return (op, change[1]) + _team_values(change[2])
+    if op == "member.add":
+        return (op, change[1], change[2]) + _member_values(change[3])
+    if op == "competition.add":
+        return (op, change[1]) + _competition_values(change[2])
+    return change
+
+
+class ChangeJournal:
+    """
+    Collects encoded change records in memory and appends them to the journal file on flush.
+    """
+    def __init__(self, file_name, generation, snapshot_size, journal_size):
+        """
+        Initializes a journal attached to a snapshot.
+
+        :param file_name: The name of the snapshot file.
+        :param generation: The generation token stored in the snapshot.
+        :param snapshot_size: The size of the snapshot file in bytes.
+        :param journal_size: The size of the journal file in bytes.
+        """
+        self.file_name = file_name
+        self.generation = generation
+        self._snapshot_size = snapshot_size
+        self._journal_size = journal_size
+        self._pending = bytearray()
+        self._lock = threading.Lock()  # records may arrive while another thread flushes
+
+    @classmethod
+    def start(cls, file_name, generation):
+        """
+        Creates an empty journal for a snapshot that was just written.
+
+        :param file_name: The name of the snapshot file.
+        :param generation: The generation token stored in the snapshot.
+        :return: The new ChangeJournal.
+        """
+        with open(journal_file_name(file_name), "wb") as journal:
+            journal.write(MAGIC + generation)
+            journal.flush()
+            os.fsync(journal.fileno())
+        return cls(file_name, generation, os.path.getsize(file_name), len(MAGIC) + len(generation))
+
+    @property
+    def has_pending(self):
+        """
+        Read-only property that is True if there are records that have not been flushed.
+
+        :return: True if a flush would write something.
+        """
+        return bool(self._pending)
+
+    @staticmethod
+    def encode(change):
+        """
+        Encodes a change as a journal record, length prefix included.
+
+        :param change: A change tuple as passed to LeagueDatabase._league_changed.
+        :return: The record bytes.
+        """
+        data = pickle.dumps(encode_change(change), pickle.HIGHEST_PROTOCOL)
+        return RECORD_LENGTH.pack(len(data)) + data
+
+    @staticmethod
+    def encode_batch(records):
+        """
+        Encodes the changes of a batch as one journal record, length prefix included.
+
+        :param records: The record tuples made by encode_change(), in order.
+        :return: The record bytes.
+        """
+        data = pickle.dumps(("batch", tuple(records)), pickle.HIGHEST_PROTOCOL)
+        return RECORD_LENGTH.pack(len(data)) + data
+
+    def record(self, change):
+        """
+        Encodes a change and adds it to the pending records.
+
+        :param change: A change tuple as passed to LeagueDatabase._league_changed.
+        """
+        self.append(self.encode(change))
+
+    def append(self, records):
+        """
+        Adds records made by encode() or encode_batch() to the pending records.
+
+        :param records: The encoded records, one after the other.
+        """
+        with self._lock:
+            self._pending += records
+
+    def flush(self):
+        """
+        Appends the pending records to the journal file and syncs it to disk.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, bytearray()
+        if not pending:
+            return
+        try:
+            with open(journal_file_name(self.file_name), "ab") as journal:
+                journal.write(pending)
+                journal.flush()
+                os.fsync(journal.fileno())
+        except BaseException:
+            with self._lock:
+                self._pending[:0] = pending  # keep the records for the next flush
+            raise
+        self._journal_size += len(pending)
+
+    @property
+    def should_compact(self):
+        """
+        Read-only property that is True once the journal has grown large enough that
+        folding it into a new snapshot is worthwhile.
+
+        :return: True if the database should be compacted.
+        """
+        return self._journal_size > max(COMPACT_MIN_BYTES, COMPACT_RATIO * self._snapshot_size)
+
+
+def read_records(file_name, generation):
+    """
+    Reads the records of the journal that belongs to a snapshot. A journal written for
+    another generation of the snapshot is ignored, and a record cut short by a crash
+    ends the journal.
+
+    :param file_name: The name of the snapshot file.
+    :param generation: The generation token stored in the snapshot.
+    :return: A generator of record tuples.
+    """
+    try:
+        journal = open(journal_file_name(file_name), "rb")
+    except FileNotFoundError:
+        return
+    with journal:
+        if journal.read(len(MAGIC) + GENERATION_SIZE) != MAGIC + generation:
+            return
+        while True:
+            header = journal.read(RECORD_LENGTH.size)
+            if len(header) < RECORD_LENGTH.size:
+                return
+            data = journal.read(RECORD_LENGTH.unpack(header)[0])
+            try:
+                record = pickle.loads(data)
+            except Exception:
+                return  # torn write at the end of the journal
+            yield record
+
+
+def _shared_member(league, oid, name, email):
+    # a member can play on several teams; reuse the object already in the league if it is the same person
+    teams = league._member_teams.get(TeamMember(oid, name, email))
+    if teams:
+        member = next(iter(teams.values()))._members.get(oid)
+        if member is not None and member.name == name and member.email == email:
+            return member
+    return TeamMember(oid, name, email)
+
+
+def _build_team(league, oid, name, members):
+    team = Team(oid, name)
+    for member_oid, member_name, member_email in members:
+        team.add_member(_shared_member(league, member_oid, member_name, member_email))
+    return team
+
+
+def _build_competition(league, oid, team_oids, location, date_time):
+    return Competition(oid, [league._teams[team_oid] for team_oid in team_oids], location, date_time)
+
+
+def apply_record(database, record):
+    """
+    Replays one journal record against a database.
+
+    :param database: The LeagueDatabase to change.
+    :param record: The record tuple.
+    """
+    op, league_oid = record[0], record[1]
+    if op == "batch":
+        for change in league_oid:
+            apply_record(database, change)
+        return
+    if op == "league.add":
+        name, teams, competitions = record[2:]
+        league = League(league_oid, name)
+        for team in teams:
+            league.add_team(_build_team(league, *team))
+        for competition in competitions:
+            league.add_competition(_build_competition(league, *competition))
+        database.add_league(league)
+        return
+    league = database._leagues[league_oid]
+    if op == "league.remove":
+        database.remove_league(league)
+    elif op == "league.set":
+        setattr(league, record[2], record[3])
+    elif op == "team.add":
+        league.add_team(_build_team(league, *record[2:]))
+    elif op == "team.remove":
+        league.remove_team(league._teams[record[2]])
+    elif op == "team.set":
+        setattr(league._teams[record[2]], record[3], record[4])
+    elif op == "member.add":
+        team = league._teams[record[2]]
+        team.add_member(_shared_member(league, *record[3:]))
+    elif op == "member.remove":
+        team = league._teams[record[2]]
+        team.remove_member(team._members[record[3]])
+    elif op == "member.set":
+        member = league._teams[record[2]]._members[record[3]]
+        if getattr(member, record[4]) != record[5]:  # a member on several teams is reported once per team
+            setattr(member, record[4], record[5])
+    elif op == "competition.add":
+        league.add_competition(_build_competition(league, *record[2:]))
+    elif op == "competition.set":
+        setattr(league._competitions[record[2]], record[3], record[4])
+    else:
+        raise ValueError(f"unknown journal record {op!r}")
@@ -0,0 +1,83 @@
+from collections.abc import Sequence
+from itertools import islice
+from model.identified_object import IdentifiedObject
+
+
+class CollectionView(Sequence):
+    """
+    A read-only, zero-copy view over a collection of identified objects.
+
+    The view wraps the owner's oid -> object dictionary directly, so reading a
+    property such as Team.members never copies the collection. The view is
+    live: changes to the owner are visible through views created earlier.
+    """
+    __slots__ = ("_items",)
+
+    def __init__(self, items):
+        """
+        Initializes a view over the specified oid -> object dictionary.
+
+        :param items: The dictionary whose values are exposed by the view.
+        """
+        self._items = items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def snapshot(self):
+        """
+        Returns a copy of the collection taken in one step. Iterating over a snapshot is
+        safe while other threads change the collection; to see several collections as
+        they were at one moment, hold the database's read lock instead
+        (LeagueDatabase.reading()).
+
+        :return: A tuple of the items.
+        """
+        return tuple(self._items.values())
+
+    def __reversed__(self):
+        return reversed(self._items.values())
+
+    def __contains__(self, item):
+        """
+        Membership follows IdentifiedObject equality (same type and oid) but costs O(1).
+
+        :param item: The object to look for.
+        :return: True if an equal object is in the collection.
+        """
+        if not isinstance(item, IdentifiedObject):
+            return False
+        found = self._items.get(item.oid)
+        return found is not None and found == item
+
+    def __getitem__(self, index):
+        """
+        Returns the item at the specified position. Positional access walks the
+        collection, so prefer iteration when visiting every item.
+
+        :param index: An integer position or a slice.
+        :return: The item at the position, or a list for a slice.
+        """
+        if isinstance(index, slice):
+            return list(self._items.values())[index]
+        size = len(self._items)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("collection index out of range")
+        if index > size // 2:
+            return next(islice(reversed(self._items.values()), size - index - 1, None))
+        return next(islice(self._items.values(), index, None))
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({list(self._items.values())!r})"
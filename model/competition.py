@@ -1,9 +1,13 @@
+from model.broadcast import unique_recipients
 from model.identified_object import IdentifiedObject
+from model.rw_lock import mutator
 
 class Competition(IdentifiedObject):
     """
     A class representing a competition.
     """
+    __slots__ = ("_teams", "_location", "_datetime", "_leagues")
+
     def __init__(self, oid, teams, location, datetime):
         """
         Initializes a Competition object with the specified OID, teams, location, and datetime.
@@ -20,6 +24,25 @@ class Competition(IdentifiedObject):
         self._teams = teams
         self._location = location
         self._datetime = datetime
+        self._leagues = ()  # leagues holding this competition, kept by League so changes can be reported
+
+    def _holding_databases(self):
+        """
+        Returns the databases whose locks guard this competition (see model.rw_lock).
+
+        :return: A list of databases.
+        """
+        return [database for league in getattr(self, "_leagues", ()) for database in league._databases]
+
+    def _changed(self, attribute, value):
+        """
+        Reports a changed attribute to the leagues holding this competition.
+
+        :param attribute: The name of the property that changed.
+        :param value: The new value.
+        """
+        for league in getattr(self, "_leagues", ()):
+            league._changed("competition.set", self.oid, attribute, value)
 
     def __str__(self):
         """
@@ -55,6 +78,7 @@ class Competition(IdentifiedObject):
         return self._datetime
 
     @date_time.setter
+    @mutator
     def date_time(self, new_date_time):
         """
         Setter for the date and time of the competition.
@@ -62,6 +86,13 @@ class Competition(IdentifiedObject):
         :param new_date_time: The new date and time for the competition.
         """
         self._datetime = new_date_time
+        self._changed("date_time", new_date_time)
+
+    def _batched_date_time(self, batch, new_date_time):
+        # the date_time setter inside a batch (see model.batch)
+        batch.undo(setattr, self, "_datetime", self._datetime)
+        self._datetime = new_date_time
+        self._changed("date_time", new_date_time)
 
     @property
     def location(self):
@@ -73,6 +104,7 @@ class Competition(IdentifiedObject):
         return self._location
 
     @location.setter
+    @mutator
     def location(self, new_location):
         """
         Setter for the location of the competition.
@@ -80,14 +112,22 @@ class Competition(IdentifiedObject):
         :param new_location: The new location for the competition.
         """
         self._location = new_location
+        self._changed("location", new_location)
+
+    def _batched_location(self, batch, new_location):
+        # the location setter inside a batch (see model.batch)
+        batch.undo(setattr, self, "_location", self._location)
+        self._location = new_location
+        self._changed("location", new_location)
 
     def send_email(self, emailer, subject, message):
         """
         Sends an email to all members of all teams in this competition without duplicates.
 
-        :param emailer: The emailer object used to send the email.
+        :param emailer: The emailer object used to send the email (an EmailOutbox returns at once).
         :param subject: The subject of the email.
         :param message: The message content of the email.
+        :return: What the emailer returns (a DeliveryResult, or an OutgoingEmail from an outbox).
         """
         # use the emailer argument to send an email to all members of all teams in this competition without
         # duplicates.  That is, a team member may be on multiple teams that may be competing against each
@@ -95,18 +135,8 @@ class Competition(IdentifiedObject):
         # method should send a single email so if the teams have N and M members respectively, the recipient
         # list will have N+M elements assuming all of the members were distinct.  If the teams have S "shared"
         # members then we'd expect a single email with N+M-S recipients.
-        recipient_list = []
-        members = []
-        for team in self.teams_competing:
-            for member in team.members:
-                if member not in members:
-                    members.append(member)
-                    if member.email is not None and member.email != "":
-                        if member.email not in recipient_list:
-                            recipient_list.append(member.email)
-
-        if recipient_list is not None:
-            emailer.send_plain_email(recipient_list, subject, message)
+        recipient_list = unique_recipients(self.teams_competing)  # one pass, whatever the overlap
+        return emailer.send_plain_email(recipient_list, subject, message)
 
 
         
@@ -0,0 +1,79 @@
+"""
+Time-limited cache for slow lookups such as keyring passwords.
+
+Reading a password from the system keyring can take hundreds of milliseconds, and
+Emailer needs it every time it opens an SMTP connection. A CredentialCache keeps
+each value for ttl seconds. Threads asking for the same key while it is being looked
+up wait for that lookup instead of starting their own, so a warm-up on a background
+thread and the first send never both pay for it. A lookup that finds nothing (None)
+is not cached, so a password registered later is found on the next call.
+"""
+import threading
+import time
+
+DEFAULT_TTL = 3600.0  # seconds
+
+
+class CredentialCache:
+    """
+    Caches the results of a lookup function per key for a limited time. Safe to use from several threads.
+    """
+    def __init__(self, lookup, ttl=DEFAULT_TTL):
+        """
+        Initializes an empty cache.
+
+        :param lookup: A function key -> value; None means there is no value.
+        :param ttl: Optional. Seconds a value is kept, or None to keep it until invalidated.
+        """
+        self._lookup = lookup
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._values = {}  # key -> (value, monotonic time it was looked up)
+        self._lookups = {}  # key -> Event set when the lookup in progress finishes
+
+    def get(self, key):
+        """
+        Returns the value for a key, looking it up if it is not cached or has expired.
+
+        :param key: The key, such as a sender address.
+        :return: The value, or None if the lookup found none.
+        """
+        while True:
+            with self._lock:
+                cached = self._values.get(key)
+                if cached is not None and (self.ttl is None or time.monotonic() - cached[1] < self.ttl):
+                    return cached[0]
+                pending = self._lookups.get(key)
+                if pending is None:
+                    pending = self._lookups[key] = threading.Event()
+                    break
+            pending.wait()  # another thread is looking the key up
+            with self._lock:
+                cached = self._values.get(key)
+            if cached is not None:
+                return cached[0]
+            # its lookup found nothing or failed: look again, so the error (if any) is raised here too
+        value = None
+        try:
+            value = self._lookup(key)
+            return value
+        finally:
+            with self._lock:
+                if value is None:
+                    self._values.pop(key, None)  # an expired value must not outlive a failed lookup
+                else:
+                    self._values[key] = (value, time.monotonic())
+                del self._lookups[key]
+            pending.set()
+
+    def invalidate(self, key=None):
+        """
+        Forgets the value for a key, or every value.
+
+        :param key: Optional. The key to forget; None forgets all.
+        """
+        with self._lock:
+            if key is None:
+                self._values.clear()
+            else:
+                self._values.pop(key, None)
@@ -18,3 +18,33 @@ class DuplicateOid(Exception):
     def __int__(self, oid):
         super.__init__(oid)
         self.value = oid
+
+
+class DamagedFile(ValueError):
+    """
+    Exception raised when a saved database fails its integrity checks.
+    """
+    def __init__(self, file_name, reason):
+        """
+        Initialize the DamagedFile exception.
+
+        :param file_name: The name of the damaged file.
+        :param reason: What is wrong with it.
+        """
+        super().__init__(f"{file_name} is damaged: {reason}")
+        self.file_name = file_name
+        self.reason = reason
+
+
+class MissingCredentials(Exception):
+    """
+    Exception raised when no password is registered for the address email is sent from.
+    """
+    def __init__(self, sender_address):
+        """
+        Initialize the MissingCredentials exception.
+
+        :param sender_address: The sender address that has no password in the keyring.
+        """
+        super().__init__(f"no password is registered for {sender_address}")
+        self.sender_address = sender_address
@@ -0,0 +1,272 @@
+"""
+Delivery of plain-text email over pooled SMTP connections.
+
+A message to many recipients is sent as a few copies rather than one per recipient:
+the recipients are split into batches of at most batch_size, and each batch gets one
+copy with the recipients on the envelope only (blind copies), so nobody sees the
+other addresses. Connections are kept open in an SmtpPool between sends, so a
+broadcast costs one login and one message per batch instead of a session and a
+message per recipient.
+
+Failures are reported per recipient in a DeliveryResult instead of being raised:
+addresses the server refuses are marked with its reply, a batch that cannot be sent
+at all marks all of its recipients, and the other batches still go out. A connection
+the server dropped while idle is replaced and the batch tried once more.
+"""
+import contextlib
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+DEFAULT_BATCH_SIZE = 50  # recipients per copy; providers limit recipients per message (Gmail: 100)
+DEFAULT_MAX_IDLE = 60.0  # seconds a pooled connection may sit unused before it is closed rather than reused
+
+
+class RecipientResult:
+    """
+    The outcome of sending a message to one recipient.
+    """
+    __slots__ = ("recipient", "error")
+
+    def __init__(self, recipient, error=None):
+        """
+        Initializes a RecipientResult.
+
+        :param recipient: The email address.
+        :param error: Optional. A description of why the message was not accepted for the recipient.
+        """
+        self.recipient = recipient
+        self.error = error
+
+    @property
+    def sent(self):
+        """
+        Read-only property that is True if the server accepted the message for the recipient.
+
+        :return: True if there was no error.
+        """
+        return self.error is None
+
+    @property
+    def permanent(self):
+        """
+        Read-only property that is True if the server refused the recipient for good (a
+        5xx reply such as "550 No such user"), so trying again is pointless.
+
+        :return: True for a permanent failure.
+        """
+        return self.error is not None and self.error[:1] == "5" and self.error[:3].isdigit()
+
+    def __str__(self):
+        return self.recipient if self.error is None else f"{self.recipient}: {self.error}"
+
+
+class DeliveryResult:
+    """
+    The outcome of sending a message to a list of recipients.
+    """
+    def __init__(self):
+        """
+        Initializes an empty result.
+        """
+        self.recipients = []  # RecipientResult objects, in the order the recipients were given
+        self.messages_sent = 0  # copies the server accepted
+
+    @property
+    def ok(self):
+        """
+        Read-only property that is True if the message was sent to every recipient.
+
+        :return: True if no recipient failed.
+        """
+        return all(result.sent for result in self.recipients)
+
+    @property
+    def failed(self):
+        """
+        Read-only property representing the recipients the message was not sent to.
+
+        :return: A list of RecipientResult objects.
+        """
+        return [result for result in self.recipients if not result.sent]
+
+    def __str__(self):
+        failed = len(self.failed)
+        return (f"{len(self.recipients) - failed} of {len(self.recipients)} recipients sent "
+                f"in {self.messages_sent} messages, {failed} failed")
+
+
+def _close(connection):
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        pass  # the server may have dropped it already
+
+
+class SmtpPool:
+    """
+    Keeps logged-in SMTP connections open for reuse. Safe to use from several threads.
+    """
+    def __init__(self, connect, max_connections=1, max_idle=DEFAULT_MAX_IDLE):
+        """
+        Initializes an empty pool.
+
+        :param connect: A function returning a new, logged-in smtplib.SMTP (or compatible) connection.
+        :param max_connections: Optional. The most connections open at once; further users wait.
+        :param max_idle: Optional. Seconds an idle connection is kept; older ones are closed instead of reused.
+        """
+        self._connect = connect
+        self._max_idle = max_idle
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle = []  # (connection, time it was returned), most recently used last
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Lends a connection for the duration of a with block. A connection that was
+        dropped or raised a socket error in the block is closed rather than returned to
+        the pool; after other SMTP errors (a refused recipient, say) it is still usable.
+
+        :return: A context manager yielding the connection.
+        """
+        with self._slots:
+            connection = self._take_idle() or self._connect()
+            try:
+                yield connection
+            except Exception as e:
+                if isinstance(e, smtplib.SMTPServerDisconnected) or not isinstance(e, smtplib.SMTPException):
+                    _close(connection)
+                    raise
+                self._return(connection)
+                raise
+            self._return(connection)
+
+    def _return(self, connection):
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+
+    def _take_idle(self):
+        stale = []
+        connection = None
+        with self._lock:
+            now = time.monotonic()
+            while self._idle:
+                candidate, returned = self._idle.pop()
+                if now - returned <= self._max_idle:
+                    connection = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            _close(candidate)
+        return connection
+
+    def warm_up(self):
+        """
+        Opens a connection ahead of the first send and leaves it idle in the pool,
+        unless one is idle already.
+        """
+        with self._slots:
+            with self._lock:
+                if self._idle:
+                    return
+            self._return(self._connect())
+
+    def close(self):
+        """
+        Closes the idle connections. Connections in use are returned to the pool as usual.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            _close(connection)
+
+
+def build_message(sender, subject, message):
+    """
+    Builds the copy of a message sent to every batch. The recipients are not named in
+    the headers; the To header is the sender, as usual for blind-copied mail.
+
+    :param sender: The sender's email address.
+    :param subject: The subject line.
+    :param message: The plain-text body.
+    :return: The message as bytes, ready for SMTP.
+    """
+    mail = EmailMessage()
+    mail["From"] = sender
+    mail["To"] = sender
+    mail["Subject"] = subject
+    mail.set_content(message)
+    return mail.as_bytes()
+
+
+class DeliveryEngine:
+    """
+    Sends plain-text messages to lists of recipients through an SmtpPool.
+    """
+    def __init__(self, pool, sender, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Initializes a DeliveryEngine.
+
+        :param pool: The SmtpPool to take connections from.
+        :param sender: The sender's email address.
+        :param batch_size: Optional. The most recipients sent one copy of a message.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.pool = pool
+        self.sender = sender
+        self.batch_size = batch_size
+
+    def send(self, recipients, subject, message):
+        """
+        Sends a message to every recipient, batch_size recipients per copy.
+
+        :param recipients: A collection of email addresses.
+        :param subject: The subject line.
+        :param message: The plain-text body.
+        :return: A DeliveryResult with one RecipientResult per recipient.
+        """
+        result = DeliveryResult()
+        recipients = list(recipients)
+        if not recipients:
+            return result
+        data = build_message(self.sender, subject, message)
+        for start in range(0, len(recipients), self.batch_size):
+            batch = recipients[start:start + self.batch_size]
+            refused = self._send_batch(batch, data)
+            if len(refused) < len(batch):
+                result.messages_sent += 1
+            result.recipients.extend(RecipientResult(recipient, refused.get(recipient)) for recipient in batch)
+        return result
+
+    def _send_batch(self, batch, data):
+        """
+        Sends one copy of a message to a batch of recipients, replacing a dropped
+        connection once.
+
+        :param batch: The recipients' email addresses.
+        :param data: The message bytes.
+        :return: A dictionary of refused recipient -> description of the error.
+        """
+        for attempt in range(2):
+            try:
+                with self.pool.connection() as connection:
+                    refused = connection.sendmail(self.sender, batch, data)
+                return {recipient: _describe(reply) for recipient, reply in refused.items()}
+            except smtplib.SMTPServerDisconnected as e:
+                if attempt:
+                    return dict.fromkeys(batch, f"disconnected: {e}")
+            except smtplib.SMTPRecipientsRefused as e:
+                return {recipient: _describe(reply) for recipient, reply in e.recipients.items()}
+            except (smtplib.SMTPException, OSError) as e:
+                return dict.fromkeys(batch, str(e) or type(e).__name__)
+
+
+def _describe(reply):
+    # an SMTP reply is a (code, message bytes) pair
+    code, text = reply
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", "replace")
+    return f"{code} {text}"
@@ -0,0 +1,241 @@
+"""
+Background sending of email, so the caller (the Qt UI thread, say) never waits for SMTP.
+
+EmailOutbox.send_plain_email queues a message and returns an OutgoingEmail right
+away; Team.send_email, Competition.send_email and TeamMember.send_email take an
+outbox wherever they take an emailer. The message is split into batches of the
+delivery engine's batch_size recipients, and a pool of worker threads sends the
+batches through the engine (see model.email_delivery):
+
+    - at most `workers` batches are being sent at once, which with a pool of as many
+      connections is also the number of SMTP sessions open at once;
+    - a RateLimiter spaces the batches out to at most `rate` per second across all
+      workers, to stay under the provider's sending limits.
+
+Progress and completion callbacks run on the worker thread that sent the batch, so a
+UI must hand them over to its own thread (with a queued Qt signal, for example)
+before touching widgets.
+"""
+import queue
+import threading
+import time
+import traceback
+from model.email_delivery import DeliveryResult, RecipientResult
+
+DEFAULT_WORKERS = 2
+DEFAULT_RATE = 5.0  # batches per second
+
+
+class RateLimiter:
+    """
+    Spaces calls out to at most a given number per second, across threads.
+    """
+    def __init__(self, rate):
+        """
+        Initializes a RateLimiter.
+
+        :param rate: The most calls per second, or None for no limit.
+        """
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+        self._interval = 0.0 if rate is None else 1.0 / rate
+        self._lock = threading.Lock()
+        self._next = 0.0  # monotonic time of the next free slot
+
+    def acquire(self):
+        """
+        Waits for the next free slot.
+        """
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class OutgoingEmail:
+    """
+    A queued message and its progress. Returned by EmailOutbox.send_plain_email.
+    """
+    def __init__(self, recipients, subject, message, batch_size, on_progress=None, on_done=None):
+        """
+        Initializes an OutgoingEmail.
+
+        :param recipients: A collection of email addresses.
+        :param subject: The subject line.
+        :param message: The plain-text body.
+        :param batch_size: The most recipients per batch.
+        :param on_progress: Optional. A function called with this object after each batch is sent.
+        :param on_done: Optional. A function called with this object once every batch is sent.
+        """
+        recipients = list(recipients)
+        self.subject = subject
+        self.message = message
+        self.batches = [recipients[start:start + batch_size] for start in range(0, len(recipients), batch_size)]
+        self.result = DeliveryResult()
+        self._results = [None] * len(self.batches)  # DeliveryResult of each batch, in order
+        self._batches_done = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._on_progress = on_progress
+        self._done_callbacks = [] if on_done is None else [on_done]
+        if not self.batches:
+            self._done.set()
+
+    @property
+    def batches_done(self):
+        """
+        Read-only property representing the number of batches sent so far (successfully or not).
+
+        :return: The number of batches.
+        """
+        return self._batches_done
+
+    @property
+    def done(self):
+        """
+        Read-only property that is True once every batch has been sent.
+
+        :return: True if the message is finished.
+        """
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Waits for every batch to be sent.
+
+        :param timeout: Optional. The most seconds to wait.
+        :return: True if the message is finished.
+        """
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, callback):
+        """
+        Calls a function with this object once every batch is sent, or right away if it is already.
+
+        :param callback: The function.
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._done_callbacks.append(callback)
+                return
+        _call(callback, self)
+
+    def _batch_sent(self, index, result):
+        with self._lock:
+            self._results[index] = result
+            self._batches_done += 1
+            finished = self._batches_done == len(self.batches)
+            if finished:
+                # merged in recipient order, whichever worker finished first
+                for batch_result in self._results:
+                    self.result.recipients.extend(batch_result.recipients)
+                    self.result.messages_sent += batch_result.messages_sent
+                self._results = None
+                callbacks, self._done_callbacks = self._done_callbacks, []
+                self._done.set()
+        if self._on_progress is not None:
+            _call(self._on_progress, self)
+        if finished:
+            for callback in callbacks:
+                _call(callback, self)
+
+
+def _call(callback, email):
+    try:
+        callback(email)
+    except Exception:
+        traceback.print_exc()  # a broken callback must not stop the worker
+
+
+class EmailOutbox:
+    """
+    Queues messages and sends them on worker threads, rate limited.
+    """
+    def __init__(self, engine, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE):
+        """
+        Initializes an EmailOutbox. The worker threads start with the first message.
+
+        :param engine: The DeliveryEngine to send with; its pool should allow `workers` connections.
+        :param workers: Optional. The most batches sent at once.
+        :param rate: Optional. The most batches sent per second, or None for no limit.
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.engine = engine
+        self._workers = workers
+        self._limiter = RateLimiter(rate)
+        self._queue = queue.Queue()  # (OutgoingEmail, batch index), or None to stop a worker
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def send_plain_email(self, recipients, subject, message, on_progress=None, on_done=None):
+        """
+        Queues a plain-text message to every recipient and returns without waiting.
+
+        :param recipients: A collection of email addresses.
+        :param subject: The subject line.
+        :param message: The plain-text body.
+        :param on_progress: Optional. A function called with the OutgoingEmail after each batch is sent.
+        :param on_done: Optional. A function called with the OutgoingEmail once it is finished.
+        :return: The OutgoingEmail.
+        :raises RuntimeError: If the outbox is closed.
+        """
+        email = OutgoingEmail(recipients, subject, message, self.engine.batch_size, on_progress, on_done)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("the outbox is closed")
+            while len(self._threads) < self._workers:
+                thread = threading.Thread(target=self._work, name="email-outbox", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            for index in range(len(email.batches)):
+                self._queue.put((email, index))
+        if not email.batches and on_done is not None:
+            _call(on_done, email)
+        return email
+
+    @property
+    def pending(self):
+        """
+        Read-only property representing the number of batches waiting for a worker.
+
+        :return: The number of batches.
+        """
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            email, index = item
+            batch = email.batches[index]
+            self._limiter.acquire()
+            try:
+                result = self.engine.send(batch, email.subject, email.message)
+            except Exception as e:  # a configuration problem such as missing credentials
+                result = DeliveryResult()
+                result.recipients = [RecipientResult(recipient, str(e) or type(e).__name__) for recipient in batch]
+            email._batch_sent(index, result)
+
+    def close(self, wait=True):
+        """
+        Stops accepting messages. The messages already queued are still sent.
+
+        :param wait: Optional. If True, waits until they are.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,240 @@
+"""
+Durable outbox: email queued in a SQLite file and sent with retries.
+
+Every message is stored once and every recipient gets a delivery row with a status:
+
+    pending   waiting to be sent, not before next_attempt
+    sending   handed to the SMTP server; set, and committed, just before the batch is sent
+    sent      the server accepted the message for the recipient
+    failed    refused for good (a 5xx reply) or still failing after max_attempts tries
+
+A recipient that fails for a passing reason (a dropped connection, a 4xx reply) is
+tried again after a delay that doubles with each attempt, from base_delay up to
+max_delay. Because the status is on disk, closing the program or losing the
+connection halfway through a broadcast loses nothing: when the queue is opened
+again, the recipients still pending are sent and those already sent are not. The one
+exception is the batch that was being sent when the program stopped; it is left
+"sending", which is put back to pending on open, so its recipients may get the
+message twice rather than not at all.
+
+Queuing a message is one transaction with one insert per recipient, so tens of
+thousands of recipients cost well under a second. A recipient named twice in one
+message is stored, and sent to, once.
+"""
+import sqlite3
+import threading
+import time
+from model.email_delivery import RecipientResult
+from model.email_outbox import DEFAULT_RATE, RateLimiter
+
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BASE_DELAY = 60.0  # seconds before the first retry
+DEFAULT_MAX_DELAY = 3600.0  # longest wait between retries
+FETCH_ROWS = 1000  # due deliveries read at a time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY, subject TEXT NOT NULL, body TEXT NOT NULL, queued REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS deliveries (
+    id INTEGER PRIMARY KEY, message_id INTEGER NOT NULL REFERENCES messages (id), recipient TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL, error TEXT,
+    UNIQUE (message_id, recipient));
+CREATE INDEX IF NOT EXISTS due_deliveries ON deliveries (status, next_attempt);
+"""
+
+
+class EmailQueue:
+    """
+    Keeps outgoing email in a SQLite file and sends it, on a background thread once
+    started. Safe to use from several threads.
+    """
+    def __init__(self, file_name, engine, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY, rate=DEFAULT_RATE):
+        """
+        Opens the queue file, creating it if needed. Deliveries left "sending" by a
+        program that stopped halfway are put back to pending.
+
+        :param file_name: The name of the SQLite file.
+        :param engine: The DeliveryEngine to send with.
+        :param max_attempts: Optional. The most tries per recipient.
+        :param base_delay: Optional. Seconds before the first retry; each further retry waits twice as long.
+        :param max_delay: Optional. The longest wait between retries, in seconds.
+        :param rate: Optional. The most batches sent per second, or None for no limit.
+        """
+        self.file_name = file_name
+        self.engine = engine
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._limiter = RateLimiter(rate)
+        self._lock = threading.Lock()  # guards the connection
+        self._connection = sqlite3.connect(file_name, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+            self._connection.execute("UPDATE deliveries SET status = 'pending' WHERE status = 'sending'")
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def send_plain_email(self, recipients, subject, message):
+        """
+        Queues a plain-text message to every recipient. It is sent by the background
+        thread if the queue is started, or by the next call to send_due.
+
+        :param recipients: A collection of email addresses.
+        :param subject: The subject line.
+        :param message: The plain-text body.
+        :return: The id of the queued message.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            message_id = self._connection.execute(
+                "INSERT INTO messages (subject, body, queued) VALUES (?, ?, ?)", (subject, message, now)).lastrowid
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO deliveries (message_id, recipient, next_attempt) VALUES (?, ?, ?)",
+                ((message_id, recipient, now) for recipient in recipients))
+        self._wake.set()
+        return message_id
+
+    def message_status(self, message_id):
+        """
+        Counts the recipients of a message by delivery status.
+
+        :param message_id: The id returned by send_plain_email.
+        :return: A dictionary of status -> number of recipients, with every status present.
+        """
+        counts = dict.fromkeys(("pending", "sending", "sent", "failed"), 0)
+        with self._lock:
+            counts.update(self._connection.execute(
+                "SELECT status, COUNT(*) FROM deliveries WHERE message_id = ? GROUP BY status", (message_id,)))
+        return counts
+
+    def failures(self, message_id):
+        """
+        Returns the recipients a message could not be sent to.
+
+        :param message_id: The id returned by send_plain_email.
+        :return: A list of RecipientResult objects for the failed recipients, in the order they were queued.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT recipient, error FROM deliveries WHERE message_id = ? AND status = 'failed' ORDER BY id",
+                (message_id,)).fetchall()
+        return [RecipientResult(recipient, error) for recipient, error in rows]
+
+    def next_due(self):
+        """
+        Returns when the next pending delivery is due.
+
+        :return: A time.time() value, or None if nothing is pending.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT MIN(next_attempt) FROM deliveries WHERE status = 'pending'").fetchone()[0]
+
+    def _retry_delay(self, attempts):
+        return min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+
+    def send_due(self, now=None):
+        """
+        Sends the deliveries that are due, up to FETCH_ROWS of them, batch_size
+        recipients of the same message per copy. Stops early if the queue is closing.
+
+        :param now: Optional. The time.time() value to compare next_attempt with (defaults to the current time).
+        :return: The number of recipients tried.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT d.id, d.message_id, d.recipient, d.attempts, m.subject, m.body"
+                " FROM deliveries d JOIN messages m ON m.id = d.message_id"
+                " WHERE d.status = 'pending' AND d.next_attempt <= ? ORDER BY d.id LIMIT ?",
+                (now, FETCH_ROWS)).fetchall()
+        batches = []
+        for row in rows:
+            if batches and batches[-1][0][1] == row[1] and len(batches[-1]) < self.engine.batch_size:
+                batches[-1].append(row)
+            else:
+                batches.append([row])
+        tried = 0
+        for batch in batches:
+            if self._stopping:
+                break  # the rest stay pending
+            self._send_batch(batch)
+            tried += len(batch)
+        return tried
+
+    def _send_batch(self, batch):
+        ids = [(row[0],) for row in batch]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE deliveries SET status = 'sending', attempts = attempts + 1 WHERE id = ?", ids)
+        _, _, _, _, subject, body = batch[0]
+        self._limiter.acquire()
+        try:
+            results = self.engine.send([row[2] for row in batch], subject, body).recipients
+        except Exception as e:  # a configuration problem such as missing credentials
+            results = [RecipientResult(row[2], str(e) or type(e).__name__) for row in batch]
+        now = time.time()
+        updates = []
+        for row, result in zip(batch, results):
+            attempts = row[3] + 1
+            if result.sent:
+                updates.append(("sent", None, now, row[0]))
+            elif result.permanent or attempts >= self.max_attempts:
+                updates.append(("failed", result.error, now, row[0]))
+            else:
+                updates.append(("pending", result.error, now + self._retry_delay(attempts), row[0]))
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE deliveries SET status = ?, error = ?, next_attempt = ? WHERE id = ?", updates)
+
+    def purge(self):
+        """
+        Deletes the messages that are finished: every recipient sent or failed.
+
+        :return: The number of messages deleted.
+        """
+        with self._lock, self._connection:
+            finished = "SELECT id FROM messages WHERE id NOT IN " \
+                       "(SELECT message_id FROM deliveries WHERE status IN ('pending', 'sending'))"
+            self._connection.execute(f"DELETE FROM deliveries WHERE message_id IN ({finished})")
+            return self._connection.execute(f"DELETE FROM messages WHERE id IN ({finished})").rowcount
+
+    def start(self):
+        """
+        Starts the background thread that sends deliveries as they fall due.
+        """
+        with self._lock:
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._run, name="email-queue", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            if self.send_due():
+                continue
+            due = self.next_due()
+            self._wake.wait(None if due is None else max(0.0, due - time.time()))
+            self._wake.clear()
+        with self._lock:
+            self._connection.close()
+
+    def close(self, wait=True):
+        """
+        Stops the background thread after the batch in progress and closes the file.
+        Deliveries not sent yet stay queued for the next time the file is opened.
+
+        :param wait: Optional. If True, waits for the background thread to stop.
+        """
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+            if thread is None:
+                self._connection.close()
+        self._wake.set()
+        if wait and thread is not None:
+            thread.join()
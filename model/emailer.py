@@ -1,36 +1,172 @@
+import functools
+import smtplib
+import threading
 import keyring
-import yagmail
+from model.credential_cache import CredentialCache, DEFAULT_TTL
+from model.custom_exceptions import MissingCredentials
+from model.email_delivery import DEFAULT_BATCH_SIZE, DEFAULT_MAX_IDLE, DeliveryEngine, SmtpPool
+from model.email_outbox import DEFAULT_RATE, DEFAULT_WORKERS, EmailOutbox
+from model.email_queue import EmailQueue
+
+KEYRING_SERVICE = 'yagmail_service'  # the service the credentials were registered under with yagmail
+SMTP_TIMEOUT = 30  # seconds
 
 
 class Emailer:
     sender_address = 'jimkowalski70@gmail.com'
+    smtp_host = 'smtp.gmail.com'
+    smtp_port = 465  # SMTP over SSL
+    batch_size = DEFAULT_BATCH_SIZE  # most recipients sent one copy of a message
+    workers = DEFAULT_WORKERS  # most copies the outbox sends at once (and connections it keeps open)
+    send_rate = DEFAULT_RATE  # most copies the outbox sends per second
+    connection_ttl = DEFAULT_MAX_IDLE  # seconds an unused SMTP connection is kept for the next send
+    _credentials = CredentialCache(lambda sender: keyring.get_password(KEYRING_SERVICE, sender), DEFAULT_TTL)
     _sole_instance = None  # the only instance of this class
+    _engine = None  # DeliveryEngine for the current sender, created on first send
+    _outbox = None  # EmailOutbox sending through _engine, created on first use
+    _queue = None  # EmailQueue sending through _engine, opened by queue()
+    _engine_lock = threading.Lock()
 
     @classmethod
-    def configure(cls, sender_address):
-        # sets the class variable as specified
-        cls.sender_address = sender_address
+    def configure(cls, sender_address, batch_size=None, workers=None, send_rate=None, credential_ttl=None,
+                  connection_ttl=None):
+        # sets the class variables as specified; the cached password and the connections of the old sender
+        # are dropped, and mail already in the outbox is still sent from, and logged in as, the old sender
+        with cls._engine_lock:
+            cls._credentials.invalidate(cls.sender_address)
+            cls.sender_address = sender_address
+            if batch_size is not None:
+                cls.batch_size = batch_size
+            if workers is not None:
+                cls.workers = workers
+            if send_rate is not None:
+                cls.send_rate = send_rate
+            if credential_ttl is not None:
+                cls._credentials.ttl = credential_ttl
+            if connection_ttl is not None:
+                cls.connection_ttl = connection_ttl
+            if cls._outbox is not None:
+                cls._outbox.close(wait=False)
+                cls._outbox = None
+            if cls._queue is not None:
+                cls._queue.close(wait=False)  # what is left in it is sent from the new sender when reopened
+                cls._queue = None
+            if cls._engine is not None:
+                cls._engine.pool.close()
+                cls._engine = None
 
     @classmethod
     def instance(cls):
         # return the only instance of this class
         return cls._sole_instance
 
-    def send_plain_email(self, recipients, subject, message):
-        # Note: this is an instance method.
-        # recipients must be a collection of email addresses (not TeamMembers!).  
-        # subject and message are strings.  
-        # Just have this method print f"Sending mail to: {recipient}" for each recipient in the recipients list.  
-        # We'll cover sending e-mail from Python later.
+    @classmethod
+    def _connect(cls, sender):
+        """
+        Opens an SMTP connection logged in as a sender. The password is read from the
+        keyring at most once per credential TTL.
 
-        password = keyring.get_password('yagmail_service', Emailer.sender_address)
+        :param sender: The sender's email address, which is also the login.
+        :return: The smtplib.SMTP_SSL connection.
+        :raises MissingCredentials: If the keyring holds no password for the sender.
+        """
+        password = cls._credentials.get(sender)
         if password is None:
-            print("Please register your credentials .")
-            exit()
-        yag = yagmail.SMTP(Emailer.sender_address, password)
-        for recipient in recipients:
+            raise MissingCredentials(sender)
+        connection = smtplib.SMTP_SSL(cls.smtp_host, cls.smtp_port, timeout=SMTP_TIMEOUT)
+        try:
+            connection.login(sender, password)
+        except smtplib.SMTPAuthenticationError:
+            connection.close()
+            cls._credentials.invalidate(sender)  # the password changed: read it again next time
+            raise
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    @classmethod
+    def delivery_engine(cls):
+        """
+        Returns the DeliveryEngine that sends mail for the current sender, whose pooled
+        connection is reused from one send to the next.
+
+        :return: The DeliveryEngine.
+        """
+        with cls._engine_lock:
+            return cls._delivery_engine()
+
+    @classmethod
+    def _delivery_engine(cls):
+        # call with _engine_lock held; the pool logs in as the sender of its engine even after configure
+        # switches senders, so mail the old engine still has is not sent From one account as another
+        if cls._engine is None:
+            pool = SmtpPool(functools.partial(cls._connect, cls.sender_address), max_connections=cls.workers,
+                            max_idle=cls.connection_ttl)
+            cls._engine = DeliveryEngine(pool, cls.sender_address, cls.batch_size)
+        return cls._engine
+
+    @classmethod
+    def warm_up(cls):
+        """
+        Reads the sender's password and opens an SMTP connection on a background thread,
+        so the first send does not wait for them. Meant to be called at start-up; a
+        failure is left for the first send to report.
+
+        :return: The started thread.
+        """
+        def warm_up():
             try:
-                yag.send(to=recipient, subject=subject, contents=message)
-                print(f"Email sent to: {recipient}")
-            except Exception as e:
-                print(f"Failed to send email to {recipient}: {str(e)}")
+                cls.delivery_engine().pool.warm_up()
+            except Exception:
+                pass  # no password, no network: the first send reports it
+
+        thread = threading.Thread(target=warm_up, name="email-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    @classmethod
+    def outbox(cls):
+        """
+        Returns the EmailOutbox that sends mail for the current sender in the background.
+        Pass it to Team.send_email and the like instead of an Emailer to return at once.
+
+        :return: The EmailOutbox.
+        """
+        with cls._engine_lock:
+            if cls._outbox is None:
+                cls._outbox = EmailOutbox(cls._delivery_engine(), cls.workers, cls.send_rate)
+            return cls._outbox
+
+    @classmethod
+    def queue(cls, file_name):
+        """
+        Returns the durable EmailQueue that sends mail for the current sender from the
+        specified file, opening it and starting its background thread if needed. Mail
+        left in the file by an earlier run is sent too.
+
+        :param file_name: The name of the queue's SQLite file.
+        :return: The started EmailQueue.
+        """
+        with cls._engine_lock:
+            if cls._queue is not None and cls._queue.file_name != file_name:
+                cls._queue.close(wait=False)
+                cls._queue = None
+            if cls._queue is None:
+                cls._queue = EmailQueue(file_name, cls._delivery_engine(), rate=cls.send_rate)
+                cls._queue.start()
+            return cls._queue
+
+    def send_plain_email(self, recipients, subject, message):
+        """
+        Sends a plain-text message to every recipient, in blind-copied batches over a
+        pooled connection (see model.email_delivery), and waits until it is sent.
+        Emailer.outbox().send_plain_email does the same without waiting.
+
+        :param recipients: A collection of email addresses (not TeamMembers!).
+        :param subject: The subject line.
+        :param message: The plain-text body.
+        :return: A DeliveryResult with the outcome for each recipient.
+        :raises MissingCredentials: If no password is registered for the sender.
+        """
+        return Emailer.delivery_engine().send(recipients, subject, message)
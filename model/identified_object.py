@@ -1,8 +1,18 @@
+from model.schema import upgrade
+
 
 class IdentifiedObject:
     """
     A class representing an identified object.
+
+    Model objects use __slots__ instead of a per-instance __dict__ to keep large
+    databases compact. __getstate__ and __setstate__ pickle the slot values as a
+    plain attribute dictionary, the same shape that objects pickled before the
+    slots were introduced carry, so old and new files load the same way.
+    Attribute changes since then are handled by the migrations in model.schema.
     """
+    __slots__ = ("_oid",)
+
     @property
     def oid(self):
         """
@@ -48,3 +58,39 @@ class IdentifiedObject:
         # return hash code based on object's oid
         return hash(self._oid)
 
+    @classmethod
+    def _slot_names(cls):
+        """
+        Returns the names of all slots declared by this class and its bases.
+
+        :return: A tuple of slot names.
+        """
+        names = cls.__dict__.get("_all_slot_names")
+        if names is None:
+            names = tuple(name for klass in reversed(cls.__mro__) for name in klass.__dict__.get("__slots__", ()))
+            cls._all_slot_names = names
+        return names
+
+    def __getstate__(self):
+        """
+        Returns the attribute dictionary to pickle.
+
+        :return: A dictionary mapping slot names to their values (unset slots are omitted).
+        """
+        state = {}
+        for name in self._slot_names():
+            try:
+                state[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the attributes of a pickled object, upgrading them first if they were
+        written with an older schema (see model.schema).
+
+        :param state: The pickled attribute dictionary.
+        """
+        for name, value in upgrade(self, state).items():
+            object.__setattr__(self, name, value)
@@ -1,12 +1,31 @@
 import csv
+import itertools
+import threading
+from model.broadcast import broadcast, teams_playing_on
 from model.identified_object import IdentifiedObject
+from model.collection_view import CollectionView
+from model.name_index import NameIndex
+from model.oid_allocator import OidAllocator
 from model.custom_exceptions import DuplicateOid
-from model.team import Team
-from model.team_member import TeamMember
+from model.league_export import WRITE_BUFFER
+from model.roster_import import RosterImporter, import_roster_files
+from model.rw_lock import mutator, read_locked, rebuild_index
+from model.schema import migration
+
+_load_lock = threading.RLock()  # serializes reading deferred leagues from their stores
+
+
 class League(IdentifiedObject):
     """
     A class representing a sports league.
     """
+    __slots__ = ("_name", "_teams", "_competitions", "_team_names", "_team_oids", "_member_teams",
+                 "_team_competitions", "_databases", "_loader")
+    # slots left unset on a league whose contents have not been read from its store yet
+    _DEFERRED_SLOTS = frozenset(("_teams", "_competitions", "_team_names", "_team_oids", "_member_teams",
+                                 "_team_competitions"))
+    _INDEXES = frozenset(("_team_names", "_member_teams", "_team_competitions"))  # slots derived from the others
+
     def __init__(self, oid, name):
         """
         Initializes a League object with the specified OID and name.
@@ -16,8 +35,203 @@ class League(IdentifiedObject):
         """
         super().__init__(oid)
         self._name = name
-        self._teams = []
-        self._competitions = []
+        self._teams = {}  # oid -> team, kept in insertion order
+        self._competitions = {}  # oid -> competition, kept in insertion order
+        self._team_names = NameIndex()
+        self._team_oids = OidAllocator(self._teams)
+        self._member_teams = {}  # member -> {team oid: team} for every team the member plays on
+        self._team_competitions = {}  # team -> {competition oid: competition} for every competition the team plays in
+        self._databases = []  # databases holding this league, kept by LeagueDatabase so its indexes follow our changes
+        self._loader = None  # store that still holds the teams and competitions (see deferred())
+
+    @classmethod
+    def deferred(cls, oid, name, loader):
+        """
+        Creates a league whose teams, members and competitions stay in a store until
+        they are first used. The loader's load_league_contents(league) is then called
+        once to fill them in; until then team_count is answered by loader.team_count(league).
+
+        :param oid: The unique identifier of the league.
+        :param name: The name of the league.
+        :param loader: The store holding the league's contents.
+        :return: The new league.
+        """
+        league = cls.__new__(cls)
+        IdentifiedObject.__init__(league, oid)
+        league._name = name
+        league._databases = []
+        league._loader = loader
+        return league
+
+    @property
+    def is_loaded(self):
+        """
+        Read-only property that is False while the league's contents are still in its store.
+
+        :return: True if the teams and competitions are in memory.
+        """
+        return self._loader is None
+
+    def __getattr__(self, name):
+        """
+        Reads the league's contents from its store the first time they are used, and
+        rebuilds an index left out of date by a batch in progress the first time it is
+        read (see model.batch). Only called for attributes that are not set.
+
+        :param name: The name of the attribute.
+        :return: The attribute value.
+        """
+        if name not in League._DEFERRED_SLOTS:
+            raise AttributeError(name)
+        if object.__getattribute__(self, "_loader") is None:
+            if name not in League._INDEXES:
+                raise AttributeError(name)
+            return rebuild_index(self, name)
+        self._load_contents()
+        return object.__getattribute__(self, name)
+
+    def _load_contents(self):
+        """
+        Fills in the teams and competitions of a deferred league from its store.
+
+        The contents are read into a separate league and moved over when complete, so
+        another thread never sees a league that is half filled in: until a slot is set,
+        reading it comes back to __getattr__ and waits here for the load to finish.
+        """
+        with _load_lock:
+            loader = self._loader
+            if loader is None:
+                return  # another thread loaded the league while this one waited
+            scratch = League(self.oid, self._name)
+            loader.load_league_contents(scratch)
+            for team in scratch._teams.values():
+                team._leagues = [self if league is scratch else league for league in team._leagues]
+            for competition in scratch._competitions.values():
+                competition._leagues = tuple(self if league is scratch else league for league in competition._leagues)
+            for name in League._DEFERRED_SLOTS:
+                object.__setattr__(self, name, object.__getattribute__(scratch, name))
+            self._loader = None
+
+    def _holding_databases(self):
+        """
+        Returns the databases whose locks guard this league (see model.rw_lock).
+
+        :return: A list of databases.
+        """
+        return list(self._databases)
+
+    def _build_index(self, name, check):
+        """
+        Builds one of the indexes derived from the teams and competitions, in their order.
+
+        :param name: "_team_names", "_member_teams" or "_team_competitions".
+        :param check: Unused; these indexes cannot disagree with the data they are built from.
+        :return: The new index.
+        """
+        if name == "_team_names":
+            index = NameIndex()
+            index.add_all(self._teams.values())
+            return index
+        index = {}
+        if name == "_member_teams":
+            for team in self._teams.values():
+                for member in team.iter_members():
+                    index.setdefault(member, {})[team.oid] = team
+        else:
+            for competition in self._competitions.values():
+                for team in competition.teams_competing:
+                    index.setdefault(team, {})[competition.oid] = competition
+        return index
+
+    def __getstate__(self):
+        """
+        Returns the attribute dictionary to pickle, reading a deferred league's contents first.
+
+        :return: The attribute dictionary.
+        """
+        if self._loader is not None:
+            self._load_contents()
+        state = super().__getstate__()
+        state.pop("_loader", None)
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores a pickled league.
+
+        :param state: The pickled attribute dictionary.
+        """
+        super().__setstate__(state)
+        self._loader = None
+
+    def _index_team(self, team):
+        """
+        Records the team in the oid and name indexes and registers this league with the team.
+
+        :param team: The team to index.
+        """
+        self._teams[team.oid] = team
+        self._team_oids.claim(team.oid)
+        self._team_names.add(team.name, team)
+        for member in team.iter_members():
+            self._member_added(team, member)
+        if not any(league is self for league in team._leagues):
+            team._leagues.append(self)
+
+    def _index_competition(self, competition):
+        """
+        Records the competition in the oid index and in the reverse index of each competing team.
+
+        :param competition: The competition to index.
+        """
+        self._competitions[competition.oid] = competition
+        for team in competition.teams_competing:
+            self._team_competitions.setdefault(team, {})[competition.oid] = competition
+        leagues = getattr(competition, "_leagues", ())
+        if not any(league is self for league in leagues):
+            competition._leagues = leagues + (self,)
+
+    def _changed(self, op, *args):
+        """
+        Reports a change to this league, or to one of its teams, members or competitions,
+        to the databases holding it.
+
+        :param op: The kind of change, e.g. "team.add".
+        :param args: The details of the change; this league's oid is put in front of them.
+        """
+        for database in self._databases:
+            database._league_changed(self, (op, self.oid) + args)
+
+    def _member_added(self, team, member):
+        """
+        Records that the member now plays on the team. Called by Team.add_member.
+
+        :param team: The team the member joined.
+        :param member: The member that joined.
+        """
+        self._member_teams.setdefault(member, {})[team.oid] = team
+
+    def _member_removed(self, team, member):
+        """
+        Records that the member no longer plays on the team. Called by Team.remove_member.
+
+        :param team: The team the member left.
+        :param member: The member that left.
+        """
+        teams = self._member_teams.get(member)
+        if teams is not None and teams.get(team.oid) is team:
+            del teams[team.oid]
+            if not teams:
+                del self._member_teams[member]
+
+    def _team_renamed(self, team, old_name):
+        """
+        Moves the team's entry in the name index after its name changed.
+
+        :param team: The team whose name changed.
+        :param old_name: The name the team had before the change.
+        """
+        self._team_names.rename(old_name, team.name, team)
 
     @property
     def name(self):
@@ -30,6 +244,7 @@ class League(IdentifiedObject):
         return self._name
 
     @name.setter
+    @mutator
     def name(self, new_name):
         """
         Setter for the league name property.
@@ -37,28 +252,62 @@ class League(IdentifiedObject):
         :param new_name: The new name for the league.
         """
         # [prop] -- the league name
+        old_name = self._name
+        self._name = new_name
+        for database in self._databases:
+            database._league_renamed(self, old_name)
+        self._changed("league.set", "name", new_name)
+
+    def _batched_name(self, batch, new_name):
+        # the name setter inside a batch: the databases' name indexes are rebuilt when it ends (see model.batch)
+        batch.undo(setattr, self, "_name", self._name)
         self._name = new_name
+        for database in self._databases:
+            batch.stale(database, ("_league_names",))
+        self._changed("league.set", "name", new_name)
 
     @property
     def teams(self):
         """
         Read-only property representing the list of teams participating in this league.
 
-        :return: List of teams participating in this league.
+        :return: A read-only view of the teams participating in this league (not a copy).
         """
         # [r/o prop] -- list of teams participating in this league
-        return self._teams[:]
+        return CollectionView(self._teams)
+
+    @property
+    def team_count(self):
+        """
+        Read-only property representing the number of teams in this league. Answered
+        without loading the teams of a league that is still in its store.
+
+        :return: The number of teams.
+        """
+        if self._loader is not None:
+            return self._loader.team_count(self)
+        return len(self._teams)
+
+    def iter_teams(self):
+        """
+        Iterates over the teams without allocating a view or a copy.
+        The league must not be modified while the iteration is in progress.
+
+        :return: An iterator over the teams.
+        """
+        return iter(self._teams.values())
 
     @property
     def competitions(self):
         """
         Read-only property representing the list of competitions (games) associated with this league.
 
-        :return: List of competitions associated with this league.
+        :return: A read-only view of the competitions associated with this league (not a copy).
         """
         #[r/o prop] -- list of competitions (games)
-        return self._competitions
+        return CollectionView(self._competitions)
 
+    @mutator
     def add_team(self, team):
         """
         Adds a team to the teams collection unless it is already present.
@@ -67,11 +316,30 @@ class League(IdentifiedObject):
         :raises DuplicateOid: If the team's OID already exists.
         """
         #add team to the teams collection unless they are already in it (in which case do nothing)
-        if team not in self.teams:
-            self._teams.append(team)
+        if team.oid not in self._teams:
+            self._index_team(team)
+            self._changed("team.add", team)
         else:
             raise DuplicateOid(team.oid)
 
+    def _batched_add_team(self, batch, team):
+        # add_team inside a batch: the indexes are rebuilt when it ends (see model.batch)
+        if team.oid in self._teams:
+            raise DuplicateOid(team.oid)
+        self._teams[team.oid] = team
+        batch.undo(self._unbatch_add_team, team, team._leagues, self._team_oids.claim(team.oid))
+        if not any(league is self for league in team._leagues):
+            team._leagues = team._leagues + [self]
+        batch.stale(self, ("_team_names", "_member_teams"))
+        self._changed("team.add", team)
+
+    def _unbatch_add_team(self, team, leagues, reserved):
+        # undoes _batched_add_team
+        del self._teams[team.oid]
+        self._team_oids.unclaim(team.oid, reserved)
+        team._leagues = leagues
+
+    @mutator
     def remove_team(self, team):
         """
         Removes a team from the teams collection if it's not participating in any competition.
@@ -80,28 +348,69 @@ class League(IdentifiedObject):
         :raises ValueError: If the team is competing in a competition.
         """
         #Ensure that the team being removed is not competing or throw a value error.
-        for competition in self.competitions:
-            if team in competition.teams_competing:
-                raise ValueError(f"{team.name} in competition and cannot be removed!")
+        if self._team_competitions.get(team):
+            raise ValueError(f"{team.name} in competition and cannot be removed!")
 
         # remove the team if they are in the teams list, otherwise do nothing
         if team in self.teams:
-            self._teams.remove(team)
+            removed = self._teams.pop(team.oid)
+            self._team_names.discard(removed.name, removed)
+            self._team_oids.release(removed.oid)
+            for member in removed.iter_members():
+                self._member_removed(removed, member)
+            removed._leagues = [league for league in removed._leagues if league is not self]
+            self._changed("team.remove", removed.oid)
+
+    def _batched_remove_team(self, batch, team):
+        # remove_team inside a batch: the indexes are rebuilt when it ends (see model.batch)
+        if self._team_competitions.get(team):
+            raise ValueError(f"{team.name} in competition and cannot be removed!")
+        if team in self.teams:
+            batch.keep_order(self._teams)
+            removed = self._teams.pop(team.oid)
+            self._team_oids.release(removed.oid)
+            batch.undo(self._unbatch_remove_team, removed, removed._leagues)
+            removed._leagues = [league for league in removed._leagues if league is not self]
+            batch.orphan(itertools.chain((removed,), removed.iter_members()))
+            batch.stale(self, ("_team_names", "_member_teams"))
+            self._changed("team.remove", removed.oid)
+
+    def _unbatch_remove_team(self, team, leagues):
+        # undoes _batched_remove_team; the batch puts the team back in its place in _teams afterwards
+        self._teams[team.oid] = team
+        team._leagues = leagues
 
     def find_free_team_oid(self):
-        # gather the used oid's in the collection of leagues.
-        used_oids = {team.oid for team in self._teams}
+        # return the smallest oid not used by a team in this league
+        return self._team_oids.peek()
+
+    @mutator
+    def reserve_team_oids(self, count):
+        """
+        Reserves free team oids for a bulk insert. Oids that end up unused must be
+        handed back with release_team_oid.
+
+        :param count: The number of oids to reserve.
+        :return: A list of the reserved oids in ascending order.
+        """
+        return self._team_oids.reserve_block(count)
+
+    def _batched_reserve_team_oids(self, batch, count):
+        oids = self._team_oids.reserve_block(count)
+        batch.undo(self._team_oids.release_block, oids)
+        return oids
 
-        # Start with oid 1 and count up to the length of the number of teams
-        # in the list. If there are 4 teams, and there are oid gaps, at least
-        # one oid will be missing. So, the algorithm will return the missing oid.
+    @mutator
+    def release_team_oid(self, oid):
+        """
+        Hands back a team oid reserved with reserve_team_oids that was not used.
+
+        :param oid: The oid to release.
+        """
+        self._team_oids.release(oid)
 
-        # If there are no gaps, we allow an additional couple of indexes
-        # and will select the oid that exceeds the last known oid.
-        for oid in range(1, len(self._teams) + 2):
-            if oid not in used_oids:
-                return oid
-        return None  # If no free oid is found
+    def _batched_release_team_oid(self, batch, oid):
+        batch.undo(self._team_oids.unrelease, oid, self._team_oids.release(oid))
 
 
     def team_named(self, team_name):
@@ -112,11 +421,9 @@ class League(IdentifiedObject):
         :return: The team with the specified name or None if not found.
         """
         # return the team in this league whose name equals team_name (case sensitive) or None if no such team exists
-        for team in self.teams:
-            if team.name == team_name:
-                return team
-        return None
+        return self._team_names.first(team_name)
 
+    @mutator
     def add_competition(self, competition):
         """
         Adds a competition to the competitions collection if all participating teams belong to the league.
@@ -130,11 +437,32 @@ class League(IdentifiedObject):
                 raise ValueError(f"{team.name} not in league")
 
         # add competition to the competitions collection
-        if  competition not in self.competitions:
-            self._competitions.append(competition);
+        if competition.oid not in self._competitions:
+            self._index_competition(competition)
+            self._changed("competition.add", competition)
         else:
             raise DuplicateOid(competition.oid)
 
+    def _batched_add_competition(self, batch, competition):
+        # add_competition inside a batch: the reverse index is rebuilt when it ends (see model.batch)
+        for team in competition.teams_competing:
+            if not self.team_named(team.name):
+                raise ValueError(f"{team.name} not in league")
+        if competition.oid in self._competitions:
+            raise DuplicateOid(competition.oid)
+        self._competitions[competition.oid] = competition
+        leagues = getattr(competition, "_leagues", ())
+        batch.undo(self._unbatch_add_competition, competition, leagues)
+        if not any(league is self for league in leagues):
+            competition._leagues = leagues + (self,)
+        batch.stale(self, ("_team_competitions",))
+        self._changed("competition.add", competition)
+
+    def _unbatch_add_competition(self, competition, leagues):
+        # undoes _batched_add_competition
+        del self._competitions[competition.oid]
+        competition._leagues = leagues
+
     def teams_for_member(self, member):
         """
         Retrieves a list of teams for which the member plays.
@@ -143,13 +471,7 @@ class League(IdentifiedObject):
         :return: A list of teams for which the member plays.
         """
         # return a list of all teams for which member plays
-        teams = []
-        for team in self.teams:
-            if member in team.members:
-                if team not in teams:
-                    teams.append(team)
-
-        return teams
+        return list(self._member_teams.get(member, {}).values())
 
     def competitions_for_team(self, team):
         """
@@ -158,12 +480,7 @@ class League(IdentifiedObject):
         :param team: The team to retrieve competitions for.
         """
         # return a list of all competitions in which team is participating
-        return_competitions = []
-        for competition in self.competitions:
-            if team in competition.teams_competing:
-                if competition not in return_competitions:
-                    return_competitions.append(competition)
-        return return_competitions
+        return list(self._team_competitions.get(team, {}).values())
 
 
     def competitions_for_member(self, member):
@@ -174,13 +491,10 @@ class League(IdentifiedObject):
         :type member: Member
         """
         # return a list of all competitions for which member played on one of the competing teams
-        return_competitions = []
-        for competition in self.competitions:
-            for team in competition.teams_competing:
-                if member in team.members:
-                    if competition not in return_competitions:
-                        return_competitions.append(competition)
-        return return_competitions
+        return_competitions = {}
+        for team in self._member_teams.get(member, {}).values():
+            return_competitions.update(self._team_competitions.get(team, {}))
+        return list(return_competitions.values())
 
     def export_league_team(self, team, file_name):
         """
@@ -193,10 +507,11 @@ class League(IdentifiedObject):
         # Team name, Member name, Member email
         # If an error occurs while writing a league, display a message on the console.
         try:
-            with open(file_name, 'w', newline='', encoding='utf-8') as file:
+            with open(file_name, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER) as file, \
+                    read_locked(self._databases):
                 writer = csv.writer(file)
                 writer.writerow(['Team name', 'Member name', 'Member email'])
-                for member in team.members:
+                for member in team.iter_members():
                     writer.writerow([team.name, member.name, member.email])
         except Exception as e:
             print(f"Error exporting league team: {e}")
@@ -204,57 +519,85 @@ class League(IdentifiedObject):
     def import_league_team(self, file_name):
         """
         Loads the teams and team members in a league from a CSV formatted file.
+        Teams that are not in the league yet are created. Rows naming a member that is
+        already on the team are left alone; rows that cannot be imported are reported.
 
-        :param league: The league to load teams into.
         :param file_name: The name of the CSV file to import.
+        :return: An ImportResult with the row counts and per-row errors.
         """
-        try:
-
-            with open(file_name, newline='', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                next(reader)  # skip header
-
-                for row in reader:
-                    # Read the row
-                    team_name, member_name, member_email = row
+        return RosterImporter(self).import_file(file_name)
 
-                    # Determine if the team is in the league
-                    team = self.team_named(team_name)
+    def import_league_team_files(self, file_names, max_workers=None, progress=None):
+        """
+        Loads teams and team members from many CSV files at once. The files are read and
+        their teams built in parallel worker processes, then merged in the order given.
 
-                    # If the team is not in the league, we will create it
-                    if not team:
-                        new_oid = self.find_free_team_oid()
-                        team = Team(new_oid, team_name)
-                        self.add_team(team)
+        :param file_names: The names of the CSV files to import.
+        :param max_workers: Optional. The number of worker processes (defaults to the number of CPUs).
+        :param progress: Optional. A function (files merged, number of files) called after each file.
+        :return: A combined ImportResult; each error names the file it came from.
+        """
+        return import_roster_files(self, file_names, max_workers, progress)
 
-                    team = self.team_named(team_name)
-                    if team:
-                        member = team.member_named(member_name)
+    def send_email(self, emailer, subject, message):
+        """
+        Sends an email to every member of the league, once per address however many teams they are on.
 
-                        # if there is not a member or the new member email is different than the
-                        # member email in the team, we'll create a new member and add it to the
-                        # team.
-                        if not member or member.email.tolower() != member_email.tolower():
-                            new_oid = team.find_free_member_oid()
-                            member = TeamMember(new_oid, member_name, member_email)
-                            team.add_member(member)
+        :param emailer: The emailer object used to send the email (an EmailOutbox returns at once).
+        :param subject: The subject of the email.
+        :param message: The message content of the email.
+        :return: A list of what the emailer returned, one entry per batch of recipients (see model.broadcast).
+        """
+        return broadcast(emailer, self.iter_teams, subject, message, self._databases)
 
+    def send_email_on_date(self, emailer, date, subject, message):
+        """
+        Sends an email to every member of the teams with a competition in this league on a given day.
 
-        except Exception as e:
-            print(f"Error import_league_teams: {e}")
+        :param emailer: The emailer object used to send the email (an EmailOutbox returns at once).
+        :param date: The day, as a datetime.date (or a datetime, whose date is used).
+        :param subject: The subject of the email.
+        :param message: The message content of the email.
+        :return: A list of what the emailer returned, one entry per batch of recipients.
+        """
+        return broadcast(emailer, lambda: teams_playing_on([self], date), subject, message, self._databases)
 
+    def send_email_to_teams(self, emailer, teams, subject, message):
+        """
+        Sends an email to every member of the selected teams, once per address.
 
+        :param emailer: The emailer object used to send the email (an EmailOutbox returns at once).
+        :param teams: An iterable of teams of this league.
+        :param subject: The subject of the email.
+        :param message: The message content of the email.
+        :return: A list of what the emailer returned, one entry per batch of recipients.
+        """
+        return broadcast(emailer, lambda: teams, subject, message, self._databases)
 
     def __str__(self):
         """
         Returns a string representation of the league.
         """
         # return a string resembling the following: "League Name: N teams, M competitions" where N and M are replaced by the obvious values
-        team_count = 0
-        unique_teams = []
-        for competition in self.competitions:
-            for team in competition.teams_competing:
-                if team.name not in unique_teams:
-                    unique_teams.append(team.name)
-        team_count += len(unique_teams)
-        return f"League {self.name}: {team_count} teams, {len(self.competitions)} competitions"
\ No newline at end of file
+        unique_teams = {team.name for competition in self._competitions.values() for team in competition.teams_competing}
+        team_count = len(unique_teams)
+        return f"League {self.name}: {team_count} teams, {len(self.competitions)} competitions"
+
+
+@migration("League", 1)
+def _key_collections_by_oid(league, state):
+    # leagues pickled before the collections were keyed by oid stored them as plain lists
+    teams = state["_teams"]
+    if isinstance(teams, list):
+        state["_teams"] = league._teams = {}
+        state["_team_names"] = league._team_names = NameIndex()
+        state["_team_oids"] = league._team_oids = OidAllocator(league._teams)
+        state["_member_teams"] = league._member_teams = {}
+        state["_team_competitions"] = league._team_competitions = {}
+        state["_databases"] = league._databases = []
+        for team in teams:
+            league._index_team(team)
+        competitions = state["_competitions"]
+        state["_competitions"] = league._competitions = {}
+        for competition in competitions:
+            league._index_competition(competition)
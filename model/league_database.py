@@ -1,21 +1,303 @@
+import contextlib
 import csv
+import io
+import itertools
 import os
 import pickle
-from model.custom_exceptions import DuplicateOid
+import threading
+from model import schema
+from model.atomic_file import atomic_write
+from model.batch import Batch
+from model.backup_ring import BackupRing, ChecksumReader, ChecksumWriter, DEFAULT_GENERATIONS
+from model.broadcast import broadcast, teams_playing_on
+from model.change_journal import ChangeJournal, GENERATION_SIZE, apply_record, journal_file_name, read_records
+from model.collection_view import CollectionView
+from model.custom_exceptions import DamagedFile, DuplicateOid
+from model.name_index import NameIndex
+from model.oid_allocator import OidAllocator
+from model.league_export import LeagueExporter, WRITE_BUFFER
+from model.league_shards import ShardStore, is_shard_directory
+from model.roster_import import BulkRosterLoader
+from model.rw_lock import ReadWriteLock, mutator, rebuild_index
+from model.sectioned_file import SectionedReader, is_sectioned, read_sections, upgrade_sections, write_sections
+from model.snapshot import SnapshotStore, is_snapshot_file, write_snapshot
+from model.sqlite_store import SqliteStore, is_sqlite_file
 class LeagueDatabase():
     """
     A singleton class for managing leagues.
+
+    The database may be shared between threads. Changes to it and to the leagues,
+    teams, members and competitions it holds take its write lock; code that reads
+    several things that must agree holds the read lock with reading(). See model.rw_lock.
     """
 
     _sole_instance = None
+    _sole_instance_lock = threading.Lock()  # guards creating and replacing the sole instance
 
     def __init__(self):
         """
         Initializes the LeagueDatabase instance.
         """
         self._last_oid = 0 #private variable holding the last id number that was supplied (see methods below)
-        self._leagues = []
+        self._leagues = {}  # oid -> league, kept in insertion order
+        self._league_names = NameIndex()
+        self._league_oids = OidAllocator(self._leagues)
+        self._journal_mode = False  # when True, save() appends changes to a journal instead of rewriting the file
+        self._journal_generation = None  # token shared by the last snapshot written and its journal
+        self._journal = None  # ChangeJournal attached to the file last saved or loaded (not pickled)
+        self._saved_to = None  # real path of the file last saved or loaded (not pickled)
+        self._dirty_leagues = set()  # oids of the leagues changed since then (not pickled)
+        self._change_count = 0  # number of changes reported so far (not pickled)
+        self._backup_generations = DEFAULT_GENERATIONS  # backups kept by save(); see model.backup_ring
+        self._backup_compression = None
+        self._lock = ReadWriteLock()  # not pickled
+        self._batch = None  # the Batch in progress, if any (not pickled)
+
+    def __getstate__(self):
+        """
+        Returns the attribute dictionary to pickle, without the attached journal or the lock.
+
+        :return: The attribute dictionary.
+        """
+        state = self.__dict__.copy()
+        state["_league_names"] = self._league_names  # rebuilt first if a batch left it out of date
+        state.pop("_lock", None)
+        state.pop("_batch", None)
+        state["_journal"] = None
+        state["_saved_to"] = None
+        state["_dirty_leagues"] = set()
+        state["_change_count"] = 0
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores a pickled database, upgrading it first if it was written with an
+        older schema (see model.schema).
+
+        :param state: The pickled attribute dictionary.
+        """
+        self.__dict__.update(schema.upgrade(self, state))
+        self.__dict__.setdefault("_journal_mode", False)
+        self.__dict__.setdefault("_journal_generation", None)
+        self.__dict__.setdefault("_backup_generations", DEFAULT_GENERATIONS)
+        self.__dict__.setdefault("_backup_compression", None)
+        self._journal = None
+        self._saved_to = None
+        self._dirty_leagues = set()
+        self._change_count = 0
+        self._lock = ReadWriteLock()
+        self._batch = None
+
+    def __getattr__(self, name):
+        """
+        Rebuilds the league name index left out of date by a batch in progress the first
+        time it is read (see model.batch). Only called for attributes that are not set.
+
+        :param name: The name of the attribute.
+        :return: The attribute value.
+        """
+        if name != "_league_names" or "_leagues" not in self.__dict__:
+            raise AttributeError(name)
+        return rebuild_index(self, name)
+
+    def _build_index(self, name, check):
+        """
+        Builds the league name index, in league order.
+
+        :param name: "_league_names".
+        :param check: Unused; league names need not be unique.
+        :return: The new index.
+        """
+        index = NameIndex()
+        index.add_all(self._leagues.values())
+        return index
+
+    def _index_league(self, league):
+        """
+        Records the league in the oid and name indexes and registers this database with the league.
+
+        :param league: The league to index.
+        """
+        self._leagues[league.oid] = league
+        self._league_oids.claim(league.oid)
+        self._league_names.add(league.name, league)
+        if not any(database is self for database in league._databases):
+            league._databases.append(self)
+
+    def _holding_databases(self):
+        # the database guards itself (see model.rw_lock)
+        return [self]
+
+    def reading(self):
+        """
+        Holds the read lock of this database for the duration of a with block, so that
+        no other thread changes it or its leagues meanwhile. Changing the database from
+        inside the block raises RuntimeError; use writing() for that.
+
+        :return: A context manager.
+        """
+        return self._lock.read()
+
+    def writing(self):
+        """
+        Holds the write lock of this database for the duration of a with block, so that
+        several changes are seen by other threads all at once.
+
+        :return: A context manager.
+        """
+        return self._lock.write()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Makes the changes in a with block take effect together or not at all. Other
+        threads see none of them until the block ends. Dirty marking, the change count
+        and journal records are brought up to date once, at the end. If the block raises,
+        the database and every league, team, member and competition changed in it are
+        put back as they were and the exception propagates. A batch opened inside
+        another one is part of it.
+
+        The name, email and reverse indexes are rebuilt once, at the end, which is also
+        when duplicate emails are found: DuplicateEmail is raised from the end of the
+        block, not from the call that caused it. See model.batch.
+
+        :return: A context manager yielding the Batch.
+        :raises DuplicateEmail: If the changes leave two members of a team with the same email address.
+        """
+        with self._lock.write():
+            if self._batch is not None:
+                yield self._batch
+                return
+            batch = self._batch = Batch(self)
+            try:
+                yield batch
+                batch.validate()
+            except BaseException:
+                self._batch = None
+                batch.rollback()
+                raise
+            self._batch = None
+            batch.commit()
+
+    def _league_renamed(self, league, old_name):
+        """
+        Moves the league's entry in the name index after its name changed.
+
+        :param league: The league whose name changed.
+        :param old_name: The name the league had before the change.
+        """
+        self._league_names.rename(old_name, league.name, league)
+
+    def _league_changed(self, league, change):
+        """
+        Receives a change reported by one of the leagues (or by this database), marks the
+        league dirty and records the change in the journal, if one is attached.
+
+        :param league: The league that changed.
+        :param change: A tuple describing the change; see model.change_journal.
+        """
+        if self._batch is not None:
+            self._batch.changed(league, change)
+            return
+        self._dirty_leagues.add(league.oid)
+        self._change_count += 1
+        if self._journal is not None:
+            self._journal.record(change)
+
+    @property
+    def is_dirty(self):
+        """
+        Read-only property that is True if a league was added, removed or changed (through
+        its own setters, add_* and remove_* methods or those of its teams, members and
+        competitions) since the database was last saved or loaded.
+
+        :return: True if there are unsaved changes.
+        """
+        return bool(self._dirty_leagues)
+
+    @property
+    def dirty_leagues(self):
+        """
+        Read-only property representing the leagues with unsaved changes. Leagues that were
+        removed are not included, although their removal is unsaved too.
+
+        :return: A list of the changed leagues that are still in the database.
+        """
+        return [self._leagues[oid] for oid in list(self._dirty_leagues) if oid in self._leagues]
 
+    @property
+    def change_count(self):
+        """
+        Read-only property representing the number of changes reported since the database
+        was created or loaded. It only grows, so comparing two readings tells whether
+        anything changed in between.
+
+        :return: The number of changes.
+        """
+        return self._change_count
+
+    @property
+    def journal_mode(self):
+        """
+        Property that is True if save() appends changes to a journal next to the file
+        instead of rewriting the whole database. See model.change_journal.
+
+        :return: True if journal mode is on.
+        """
+        return self._journal_mode
+
+    @journal_mode.setter
+    def journal_mode(self, enabled):
+        """
+        Turns journal mode on or off. The next save() after a change writes a full snapshot.
+
+        :param enabled: True to turn journal mode on.
+        """
+        self._journal_mode = bool(enabled)
+        self._journal = None
+
+    @property
+    def backup_generations(self):
+        """
+        Property representing the number of earlier versions save() keeps of a pickle file.
+
+        :return: The number of backups kept.
+        """
+        return self._backup_generations
+
+    @backup_generations.setter
+    def backup_generations(self, generations):
+        """
+        Sets the number of backups kept. Backups beyond the new number are dropped from the
+        index at the next save.
+
+        :param generations: The number of backups to keep (0 keeps none).
+        """
+        if generations < 0:
+            raise ValueError("backup_generations must not be negative")
+        self._backup_generations = generations
+
+    @property
+    def backup_compression(self):
+        """
+        Property representing the compression of the backups save() writes: None, "gzip" or "lzma".
+
+        :return: The backup compression.
+        """
+        return self._backup_compression
+
+    @backup_compression.setter
+    def backup_compression(self, compression):
+        """
+        Sets the compression of backups written from now on.
+
+        :param compression: None, "gzip" or "lzma".
+        """
+        BackupRing("", compression=compression)  # validates the name
+        self._backup_compression = compression
+
+    def _backup_ring(self, file_name):
+        return BackupRing(file_name, self._backup_generations, self._backup_compression)
 
     @classmethod
     def instance(cls):
@@ -23,18 +305,47 @@ class LeagueDatabase():
         Returns the sole instance of this database, creating one if it doesn't exist yet.
         """
         # returns the sole instance of this database, creating one if it doesn't exist yet
-        if cls._sole_instance is None:
-            cls._sole_instance = cls()
-        return cls._sole_instance
+        instance = cls._sole_instance
+        if instance is None:
+            with LeagueDatabase._sole_instance_lock:
+                if cls._sole_instance is None:
+                    cls._sole_instance = cls()
+                instance = cls._sole_instance
+        return instance
+
+    @classmethod
+    def _set_sole_instance(cls, instance):
+        """
+        Replaces the sole instance, e.g. with a database just loaded. Snapshot files
+        mapped by the database it replaces are closed, so leagues of the old database
+        that were never opened can no longer be.
+
+        :param instance: The new sole instance.
+        """
+        with LeagueDatabase._sole_instance_lock:
+            replaced, cls._sole_instance = cls._sole_instance, instance
+        if replaced is not None and replaced is not instance:
+            replaced._close_stores()
+
+    def _close_stores(self):
+        """
+        Closes the stores still holding the contents of deferred leagues, if they hold a
+        resource (a snapshot's memory map); stores that open the file per read are left alone.
+        """
+        for league in self._leagues.values():
+            close = getattr(league._loader, "close", None)
+            if close is not None:
+                close()
 
     @property
     def leagues(self):
         """
-        [r/o prop] -- list of the leagues being managed
+        [r/o prop] -- read-only view of the leagues being managed (not a copy)
         """
         # [r/o prop] -- list of the leagues being managed
-        return self._leagues
+        return CollectionView(self._leagues)
 
+    @mutator
     def add_league(self, league):
         """
          Adds the specified league to the database.
@@ -43,11 +354,30 @@ class LeagueDatabase():
          """
         # add the specified league to the leagues list.
 
-        if league not in self.leagues:
-            self.leagues.append(league)
+        if league.oid not in self._leagues:
+            self._index_league(league)
+            self._league_changed(league, ("league.add", league))
         else:
             raise DuplicateOid(league.oid)
 
+    def _batched_add_league(self, batch, league):
+        # add_league inside a batch: the name index is rebuilt when it ends (see model.batch)
+        if league.oid in self._leagues:
+            raise DuplicateOid(league.oid)
+        self._leagues[league.oid] = league
+        batch.undo(self._unbatch_add_league, league, league._databases, self._league_oids.claim(league.oid))
+        if not any(database is self for database in league._databases):
+            league._databases = league._databases + [self]
+        batch.stale(self, ("_league_names",))
+        self._league_changed(league, ("league.add", league))
+
+    def _unbatch_add_league(self, league, databases, reserved):
+        # undoes _batched_add_league
+        del self._leagues[league.oid]
+        self._league_oids.unclaim(league.oid, reserved)
+        league._databases = databases
+
+    @mutator
     def remove_league(self, league):
         """
         Removes the specified league from the database.
@@ -59,21 +389,62 @@ class LeagueDatabase():
         # If league is not in the leagues list, simply do
         # nothing (not an error).
         if league in self.leagues:
-            self.leagues.remove(league)
+            removed = self._leagues.pop(league.oid)
+            self._league_names.discard(removed.name, removed)
+            self._league_oids.release(removed.oid)
+            removed._databases = [database for database in removed._databases if database is not self]
+            self._league_changed(removed, ("league.remove", removed.oid))
+
+    def _batched_remove_league(self, batch, league):
+        # remove_league inside a batch: the name index is rebuilt when it ends (see model.batch)
+        if league in self.leagues:
+            batch.keep_order(self._leagues)
+            removed = self._leagues.pop(league.oid)
+            self._league_oids.release(removed.oid)
+            batch.undo(self._unbatch_remove_league, removed, removed._databases)
+            removed._databases = [database for database in removed._databases if database is not self]
+            # loads a deferred league: its contents must not change outside the batch either
+            batch.orphan(itertools.chain((removed,), removed.iter_teams(), removed.competitions,
+                                         (member for team in removed.iter_teams() for member in team.iter_members())))
+            batch.stale(self, ("_league_names",))
+            self._league_changed(removed, ("league.remove", removed.oid))
+
+    def _unbatch_remove_league(self, league, databases):
+        # undoes _batched_remove_league; the batch puts the league back in its place in _leagues afterwards
+        self._leagues[league.oid] = league
+        league._databases = databases
 
     def find_free_league_oid(self):
-        #gather the used oid's in the collection of leagues.
-        used_oids = {league.oid for league in self._leagues}
-        # Start with oid 1 and count up to the length of the number of leagues
-        # in the list. If there are 4 leagues, and there are oid gaps, at least
-        # one oid will be missing. So, the algorithm will return the missing oid.
+        # return the smallest oid not used by a league in this database
+        return self._league_oids.peek()
+
+    @mutator
+    def reserve_league_oids(self, count):
+        """
+        Reserves free league oids for a bulk insert. Oids that end up unused must be
+        handed back with release_league_oid.
+
+        :param count: The number of oids to reserve.
+        :return: A list of the reserved oids in ascending order.
+        """
+        return self._league_oids.reserve_block(count)
+
+    def _batched_reserve_league_oids(self, batch, count):
+        oids = self._league_oids.reserve_block(count)
+        batch.undo(self._league_oids.release_block, oids)
+        return oids
 
-        # If there are no gaps, we allow an additional couple of indexes
-        # and will select the oid that exceeds the last known oid.
-        for oid in range(1, len(self._leagues) + 2):
-            if oid not in used_oids:
-                return oid
-        return None  # If no free oid is found
+    @mutator
+    def release_league_oid(self, oid):
+        """
+        Hands back a league oid reserved with reserve_league_oids that was not used.
+
+        :param oid: The oid to release.
+        """
+        self._league_oids.release(oid)
+
+    def _batched_release_league_oid(self, batch, oid):
+        batch.undo(self._league_oids.unrelease, oid, self._league_oids.release(oid))
 
 
 
@@ -84,11 +455,9 @@ class LeagueDatabase():
         :param name: The name of the league to retrieve.
         :return: Returns a league object if the league is found, otherwise None.
         """
-        for league in self.leagues:
-            if league.name == name:
-                return league
-        return None
+        return self._league_names.first(name)
 
+    @mutator
     def next_oid(self):
         """
        Increments _last_id and return its new value
@@ -99,13 +468,20 @@ class LeagueDatabase():
         self._last_oid += 1
         return self._last_oid
 
+    def _batched_next_oid(self, batch):
+        batch.undo(setattr, self, "_last_oid", self._last_oid)
+        self._last_oid += 1
+        return self._last_oid
+
     def load(self, file_name):
         """
         Loads a LeagueDatabase from the specified file.
-        If file_name does not exist or an error occurs when reading it, display an error message
-        and loads the file from the backup (if it exists).
+        If file_name does not exist or an error occurs when reading it (including a pickle file
+        whose checksum does not match the one save() recorded), display an error message
+        and load the newest valid backup instead (if there is one).
 
         :param file_name: The name of the file to load.
+        :return: True if file_name itself was loaded, False if an error occurred (even if a backup was loaded instead).
         """
         # loads a LeagueDatabase from the specified file and stores it in
         # _sole_instance.  If file_name does not exist or an error occurs
@@ -115,99 +491,329 @@ class LeagueDatabase():
         # See save() for information on the backup file.
         file_loaded = False
         try:
-            with open(file_name, 'rb') as league_file:
-                #self.__class__._sole_instance = pickle.load(league_file)
-                loaded_instance = pickle.load(league_file)
-                loaded_instance.__class__._sole_instance = loaded_instance
-                # loaded_instance._leagues = loaded_instance._leagues  # Reassign _leagues
-                file_loaded = True
+            loaded_instance = self.read(file_name)
+            loaded_instance._set_sole_instance(loaded_instance)
+            file_loaded = True
         except FileNotFoundError:
             print(f"ERRROR! File Not Found! Could not load filename: {file_name}")
         except Exception as e:
             print(f"ERROR! - {e}")
         if not file_loaded:
-            backup_file_name = file_name + ".backup"
-            if os.path.exists(backup_file_name):
-                self.load(backup_file_name)
+            loaded_instance = self._read_newest_backup(file_name)
+            if loaded_instance is not None:
+                loaded_instance._set_sole_instance(loaded_instance)
+        return file_loaded
+
+    @classmethod
+    def read(cls, file_name, max_workers=1):
+        """
+        Reads a database from a pickle file, a SQLite store, a snapshot or a shard directory
+        without making it the sole instance. Leagues read from a store or a snapshot load
+        their teams and competitions on first use.
+
+        :param file_name: The name of the file (or shard directory) to read.
+        :param max_workers: Optional. The number of threads reading the files of a shard directory
+            ahead of the unpickling (None for the executor's default). Unpickling holds the GIL and
+            is done on the calling thread, so more than one only helps when the reads are slow,
+            as on a cold cache or a network drive; the default reads the shards serially.
+        :return: The database read.
+        """
+        if is_shard_directory(file_name):
+            loaded_instance = ShardStore(file_name).load(cls(), max_workers)
+        elif is_snapshot_file(file_name):
+            loaded_instance = SnapshotStore(file_name).load(cls())
+        elif is_sqlite_file(file_name):
+            loaded_instance = SqliteStore(file_name).load(cls())
+        else:
+            loaded_instance = cls._read_pickle(file_name, None, BackupRing(file_name).read_index()["primary"],
+                                               cls._league_from_backups(file_name))
+            if loaded_instance._journal_mode:
+                dirty_leagues = loaded_instance._dirty_leagues
+                loaded_instance._replay_journal(file_name)
+                loaded_instance._dirty_leagues = dirty_leagues  # the replayed changes are already in the file
+        loaded_instance._saved_to = os.path.realpath(file_name)
+        return loaded_instance
+
+    @classmethod
+    def _read_pickle(cls, file_name, compression, checksum, find_replacement=None):
+        """
+        Reads a database written by save(), or a plain pickle written by earlier versions.
+
+        A sectioned file (see model.sectioned_file) checks each section on its own; a
+        league whose section is damaged is taken from find_replacement, or left out, and
+        a message says so. A plain pickle is checked against the checksum save() recorded.
+        Either way, objects pickled with an older schema are upgraded as they are read.
+
+        :param file_name: The name of the file.
+        :param compression: The compression of the file (None for the live file).
+        :param checksum: The recorded checksum of a plain pickle, or None if there is none to check.
+        :param find_replacement: Optional. A function (league oid, database) -> (league, source) or None.
+        :return: The database read.
+        :raises DamagedFile: If the file fails its checks.
+        """
+        with BackupRing.open(file_name, compression) as league_file:
+            if compression is not None:
+                league_file = io.BytesIO(league_file.read())  # sections are read out of order
+            if is_sectioned(league_file):
+                loaded_instance = cls()
+                problems = read_sections(loaded_instance, SectionedReader(league_file, file_name), find_replacement)
+                for oid, source in problems:
+                    if source is None:
+                        print(f"ERROR! League {oid} in {file_name} is damaged and was left out")
+                    else:
+                        print(f"ERROR! League {oid} in {file_name} is damaged and was restored from {source}")
+                        loaded_instance._dirty_leagues.add(oid)  # the next save writes the repaired league
+                return loaded_instance
+            reader = ChecksumReader(league_file)
+            with schema.reading(schema.FIRST_VERSION):
+                loaded_instance = pickle.load(reader)
+            if not reader.matches(checksum):
+                raise DamagedFile(file_name, "its checksum does not match the one recorded when saved")
+        return loaded_instance
+
+    @staticmethod
+    def _league_from_backups(file_name):
+        """
+        Returns a function that finds an intact copy of a league in the newest backup of
+        file_name that has one. Used to repair a damaged league section.
+
+        :param file_name: The name of the live file.
+        :return: A function (league oid, database) -> (league, backup file name) or None.
+        """
+        def find_replacement(oid, database):
+            for backup_file_name, compression, _ in BackupRing(file_name).backups():
+                try:
+                    with BackupRing.open(backup_file_name, compression) as backup_file:
+                        if compression is not None:
+                            backup_file = io.BytesIO(backup_file.read())
+                        if not is_sectioned(backup_file):
+                            continue
+                        reader = SectionedReader(backup_file, backup_file_name)
+                        entry = reader.league_entry(oid)
+                        league = None if entry is None else reader.read_league(entry, database)
+                    if league is not None:
+                        return league, backup_file_name
+                except Exception:
+                    continue  # try the next older backup
+            return None
+        return find_replacement
+
+    @classmethod
+    def upgrade_file(cls, file_name):
+        """
+        Rewrites a pickle file written with an older schema (see model.schema) in the
+        current one. The leagues of a sectioned file are read, upgraded and written one
+        at a time, so the database is never held in memory as a whole. The old file is
+        kept in the backup ring, as by save().
+
+        :param file_name: The name of the pickle file.
+        :return: True if the file was rewritten, False if it was already current.
+        :raises DamagedFile: If the file fails its checks; load() it to repair it first.
+        """
+        with open(file_name, 'rb') as league_file:
+            sectioned = is_sectioned(league_file)
+            if sectioned and SectionedReader(league_file, file_name).schema_version == schema.SCHEMA_VERSION:
+                return False
+        if not sectioned:
+            # a plain pickle from before sections cannot be read piecemeal
+            cls._read_pickle(file_name, None, BackupRing(file_name).read_index()["primary"])._write_pickle(file_name)
+            return True
+        database = cls()
+        with atomic_write(file_name) as dump_file:
+            writer = ChecksumWriter(dump_file)
+            with open(file_name, 'rb') as league_file:
+                upgrade_sections(SectionedReader(league_file, file_name), writer, database)
+            database._backup_ring(file_name).rotate(writer.checksum)
+        return True
+
+    @staticmethod
+    def verify_file(file_name):
+        """
+        Checks the sections of a file written by save() without unpickling anything.
+
+        :param file_name: The name of the file.
+        :return: The oids of the leagues whose sections are damaged.
+        :raises DamagedFile: If the file is not a sectioned file or its structure is damaged.
+        """
+        with open(file_name, 'rb') as league_file:
+            if not is_sectioned(league_file):
+                raise DamagedFile(file_name, "it is not a sectioned file")
+            reader = SectionedReader(league_file, file_name)
+            reader.read_settings()
+            return reader.damaged_leagues()
+
+    @classmethod
+    def _read_newest_backup(cls, file_name):
+        """
+        Reads the newest backup of a pickle file that is intact, as listed by its backup index.
+        A ".backup" file written before backups were indexed is used if the index lists none.
+
+        :param file_name: The name of the pickle file.
+        :return: The database read, or None if no backup could be read.
+        """
+        backups = BackupRing(file_name).backups()
+        if not backups and os.path.exists(file_name + ".backup"):
+            backups = [(file_name + ".backup", None, None)]
+        for backup_file_name, compression, checksum in backups:
+            try:
+                return cls._read_pickle(backup_file_name, compression, checksum)
+            except Exception as e:
+                print(f"ERROR! - {e}")
+        return None
+
+    def _replay_journal(self, file_name):
+        """
+        Applies the journal written after the snapshot that was just loaded, then attaches
+        it so later saves keep appending to it.
+
+        :param file_name: The name of the snapshot file.
+        """
+        generation = self._journal_generation
+        if generation is None or len(generation) != GENERATION_SIZE:
+            return
+        try:
+            if not os.path.exists(journal_file_name(file_name)):
+                self._journal = ChangeJournal.start(file_name, generation)
+                return
+            for record in read_records(file_name, generation):
+                apply_record(self, record)
+            self._journal = ChangeJournal(file_name, generation, os.path.getsize(file_name),
+                                          os.path.getsize(journal_file_name(file_name)))
+        except Exception as e:
+            # the next save writes a full snapshot rather than appending to a journal we could not follow
+            print(f"ERROR! Could not replay journal for {file_name} - {e}")
 
     def save(self, file_name):
         """
-        Saves this database on the specified file. Before saving, it checks if the file exists
-        and if it does, renames it to file_name with ".backup" added.
+        Saves this database on the specified file. The new contents are written to a
+        temporary file, synced to disk and renamed over file_name, so a crash leaves
+        either the old or the new file in place. The old file is kept as a backup in a
+        ring of backup_generations slots (file_name + ".backup1" ... , compressed if
+        backup_compression is set) listed in file_name + ".backups"; see model.backup_ring.
+
+        In journal mode, once a snapshot has been written to file_name, later saves only
+        append the changes made since the previous save to file_name + ".journal". The
+        journal is folded into a new snapshot when it grows large (see compact()).
+
+        A file_name ending in .sqlite, .sqlite3 or .db (or an existing SQLite file) is
+        written as a SQLite store instead, updated in place in one transaction; see
+        model.sqlite_store. A file_name ending in .snapshot (or an existing snapshot) is
+        rewritten as a read-only snapshot for fast opening; see model.snapshot. A
+        file_name ending in .shards (or an existing directory) is saved as one file per
+        league, rewriting only the leagues changed since the last save to that
+        directory; see model.league_shards.
+
+        Nothing is written if the database has not changed since it was last saved to (or
+        loaded from) file_name. Other threads wait to change the database until the file
+        is written, so the file holds one consistent state.
 
         :param file_name: The name of the file to save.
+        :return: True if the database is now saved in file_name, False if an error occurred.
         """
-        # save this database on the specified file.  Before saving, check if
-        # the file exists and if it does, rename it to file_name with
-        # ".backup" added.
-        try:
-            # Rename the pre-existing file if it exists.
-            if os.path.exists(file_name):
-                backup_file_index = 0  # specifies an index for the filename
-                backup_file_name = file_name + ".backup"
-                filename_found = False  # indicates a suitable filename was found
-
-                # The 'backup' filename will be indexed if it is already present
-                if os.path.exists(backup_file_name):
-                    while not filename_found:
-                        filename_found = False  # indicates a suitable filename was found
-                        backup_file_index += 1
-                        backup_file_name = file_name + ".backup" + str(backup_file_index)
-                        if not os.path.exists(backup_file_name):
-                            filename_found = True
-                os.rename(file_name, backup_file_name)
-
-            # Open a new file to serialize the league database.
-            with open(file_name, 'wb') as dump_file:
-                pickle.dump(self.__class__._sole_instance, dump_file)
+        path = os.path.realpath(file_name)
+        if not self._dirty_leagues and path == self._saved_to and os.path.exists(file_name):
+            return True
+        with self._lock.read():
+            try:
+                self._write(file_name, path)
+            except Exception as e:
+                print(f"ERROR! - {e}")
+                return False
+            self._saved_to = path
+            self._dirty_leagues = set()
+        return True
+
+    def _write(self, file_name, path):
+        """
+        Writes this database to file_name in the format its name selects (see save()).
+
+        :param file_name: The name of the file to save.
+        :param path: The real path of file_name.
+        """
+        if is_shard_directory(file_name):
+            ShardStore(file_name).save(self, set(self._dirty_leagues) if path == self._saved_to else None)
+        elif is_snapshot_file(file_name):
+            write_snapshot(self, file_name)
+        elif is_sqlite_file(file_name):
+            SqliteStore(file_name).save(self)
+        else:
+            journal = self._journal
+            if journal is not None and journal.file_name == file_name and os.path.exists(file_name):
+                journal.flush()
+                if journal.should_compact:
+                    self._save_snapshot(file_name)
+            else:
+                self._save_snapshot(file_name)
+
+    def compact(self, file_name):
+        """
+        Writes a full snapshot of this database to file_name and starts an empty journal,
+        discarding the changes the snapshot now contains.
 
+        :param file_name: The name of the file to save.
+        """
+        try:
+            with self._lock.read():
+                self._save_snapshot(file_name)
         except Exception as e:
             print(f"ERROR! - {e}")
 
+    def _save_snapshot(self, file_name):
+        """
+        Writes the whole database to the specified file.
+
+        :param file_name: The name of the file to save.
+        """
+        self._journal = None
+        self._journal_generation = os.urandom(GENERATION_SIZE) if self._journal_mode else None
+        self._write_pickle(file_name)
+        if self._journal_mode:
+            self._journal = ChangeJournal.start(file_name, self._journal_generation)
+
+    def _write_pickle(self, file_name):
+        """
+        Writes this database as a sectioned file (one checksummed pickle per league; see
+        model.sectioned_file) to a temporary file, keeps the current file in the backup
+        ring, then renames the temporary file over it.
+
+        :param file_name: The name of the file to save.
+        """
+        ring = self._backup_ring(file_name)
+        with atomic_write(file_name) as dump_file:
+            writer = ChecksumWriter(dump_file)
+            write_sections(self, writer)
+            # the index must list the new checksum (and the backup of the old file) before the rename
+            ring.rotate(writer.checksum)
+
     def load_backup(self, file_name):
         """
-        Loads the backup file.
+        Loads the newest intact backup of the specified file.
 
         :param file_name: The name of the file to load backup from.
         """
-        backup_file = file_name + ".backup"
-        try:
-            with open(backup_file, 'rb') as file:
-                self._sole_instance = pickle.load(file)
-        except FileNotFoundError:
+        loaded_instance = self._read_newest_backup(file_name)
+        if loaded_instance is None:
             print("Backup file not found.")
-        except Exception as e:
-            print(f"Error loading backup: {e}")
+        else:
+            loaded_instance._set_sole_instance(loaded_instance)
 
 
-    def import_league_teams(self, league, file_name):
+    def import_league_teams(self, league, file_name, dry_run=False):
         """
         Loads the teams and team members in a league from a CSV formatted file.
 
+        The file has three columns: team name, team member name, email, after a header
+        line. It is UTF-8 encoded and may contain non-ASCII text. The whole file is
+        validated before anything is added: rows whose email is already used on the
+        team (by an existing member or an earlier row) are reported and skipped, and
+        the remaining rows are applied in one pass. Teams that do not exist yet are created.
+
         :param league: The league to load teams into.
         :param file_name: The name of the CSV file to import.
+        :param dry_run: Optional. If True, only report what would change.
+        :return: An ImportResult with the row counts and per-row errors.
         """
-
-        # load the teams and team members in a league from a CSV formatted file. (The Python
-        # standard library has a nice CSV module Links to an external site.).
-        # The file will contain three columns: team name, team member name, email.  The first
-        # line of the file will be a "header" line and should be ignored.  The file will be
-        # UTF-8 encoded and may contain non-ASCII text. Note that the first argument to this
-        # method must be a league object, not the name of a league.  If an error occurs while
-        # loading a league, display a message on the console.  Here is a sample file.
-        try:
-            with open(file_name, newline='', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                next(reader)  # skip header
-                for row in reader:
-                    team_name, member_name, email = row
-                    team = league.get_team_by_name(team_name)
-                    if team:
-                        team.add_member(member_name, email)
-                    else:
-                        print(f"Team '{team_name}' not found in league '{league.name}'.")
-        except Exception as e:
-            print(f"Error import_league_teams: {e}")
+        return BulkRosterLoader(league).load_file(file_name, dry_run)
 
     def export_league_teams(self, league, file_name):
         """
@@ -220,12 +826,102 @@ class LeagueDatabase():
         # Team name, Member name, Member email
         # If an error occurs while writing a league, display a message on the console.
         try:
-            with open(file_name, 'w', newline='', encoding='utf-8') as file:
+            with open(file_name, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER) as file, \
+                    self._lock.read():
                 writer = csv.writer(file)
                 writer.writerow(['Team name', 'Member name', 'Member email'])
-                for team in league.teams:
-                    for member in team.members:
+                for team in league.iter_teams():
+                    for member in team.iter_members():
                         writer.writerow([team.name, member.name, member.email])
         except Exception as e:
             print(f"Error exporting league teams: {e}")
 
+    def send_email(self, emailer, subject, message, leagues=None):
+        """
+        Sends an email to every member of every league (or of the specified leagues),
+        once per address however many teams and leagues they are on.
+
+        :param emailer: The emailer object used to send the email (an EmailOutbox returns at once).
+        :param subject: The subject of the email.
+        :param message: The message content of the email.
+        :param leagues: Optional. The leagues whose members to email; defaults to all.
+        :return: A list of what the emailer returned, one entry per batch of recipients (see model.broadcast).
+        """
+        def teams():
+            for league in self._leagues.values() if leagues is None else leagues:
+                yield from league.iter_teams()
+
+        return broadcast(emailer, teams, subject, message, [self])
+
+    def send_email_on_date(self, emailer, date, subject, message):
+        """
+        Sends an email to every member of the teams with a competition on a given day, in any league.
+
+        :param emailer: The emailer object used to send the email (an EmailOutbox returns at once).
+        :param date: The day, as a datetime.date (or a datetime, whose date is used).
+        :param subject: The subject of the email.
+        :param message: The message content of the email.
+        :return: A list of what the emailer returned, one entry per batch of recipients.
+        """
+        return broadcast(emailer, lambda: teams_playing_on(self._leagues.values(), date), subject, message, [self])
+
+    def send_email_to_teams(self, emailer, teams, subject, message):
+        """
+        Sends an email to every member of the selected teams, of any league, once per address.
+
+        :param emailer: The emailer object used to send the email (an EmailOutbox returns at once).
+        :param teams: An iterable of teams.
+        :param subject: The subject of the email.
+        :param message: The message content of the email.
+        :return: A list of what the emailer returned, one entry per batch of recipients.
+        """
+        return broadcast(emailer, lambda: teams, subject, message, [self])
+
+    def export_league(self, league, target, compression=None):
+        """
+        Writes the whole league (teams, members and competitions) to a file or stream.
+        See model.league_export for the record format.
+
+        :param league: The league to export.
+        :param target: A file name, or a writable binary stream (left open).
+        :param compression: Optional. None, "gzip" or "lzma".
+        :return: The number of rows written.
+        """
+        return LeagueExporter(league).export(target, compression)
+
+
+@schema.migration("LeagueDatabase", 1)
+def _key_leagues_by_oid(database, state):
+    # databases pickled before the leagues were keyed by oid stored them as a plain list
+    leagues = state["_leagues"]
+    if isinstance(leagues, list):
+        state["_leagues"] = database._leagues = {}
+        state["_league_names"] = database._league_names = NameIndex()
+        state["_league_oids"] = database._league_oids = OidAllocator(database._leagues)
+        for league in leagues:
+            database._index_league(league)
+
+
+def convert_database_file(source_file_name, target_file_name):
+    """
+    Copies a database from one file to another, converting between a pickle file, a
+    SQLite store, a snapshot and a shard directory according to the file names (see
+    LeagueDatabase.save). The sole
+    instance is not changed.
+
+    :param source_file_name: The name of the file to read.
+    :param target_file_name: The name of the file to write; a .sqlite, .sqlite3 or .db name gives a SQLite
+        store, a .snapshot name a snapshot and a .shards name (or a directory) a shard directory.
+    :return: The number of leagues converted.
+    """
+    database = LeagueDatabase.read(source_file_name)
+    database._journal_mode = False
+    if is_shard_directory(target_file_name):
+        ShardStore(target_file_name).save(database)
+    elif is_snapshot_file(target_file_name):
+        write_snapshot(database, target_file_name)
+    elif is_sqlite_file(target_file_name):
+        SqliteStore(target_file_name).save(database)
+    else:
+        database._write_pickle(target_file_name)
+    return len(database.leagues)
@@ -0,0 +1,125 @@
+"""
+Streams a whole league (teams, members and competitions) to CSV.
+
+Every row starts with a record type:
+
+    league,<oid>,<name>
+    team,<oid>,<name>
+    member,<team oid>,<oid>,<name>,<email>
+    competition,<oid>,<location>,<ISO date/time or empty>,<team oid>,<team oid>,...
+
+The league row comes first, then each team followed by its members, then the
+competitions. Output may be gzip or lzma compressed.
+"""
+import csv
+import gzip
+import io
+import lzma
+from model.rw_lock import read_locked
+
+WRITE_BUFFER = 1 << 20  # bytes collected before each write to the underlying stream
+COMPRESSIONS = (None, "gzip", "lzma")
+
+
+def _compressed(stream, compression):
+    """
+    Wraps a binary stream in a compressor.
+
+    :param stream: The writable binary stream.
+    :param compression: None, "gzip" or "lzma".
+    :return: The stream to write uncompressed bytes to.
+    """
+    if compression is None:
+        return stream
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="wb", compresslevel=6)
+    if compression == "lzma":
+        return lzma.LZMAFile(stream, mode="wb", preset=1)
+    raise ValueError(f"unknown compression {compression!r}; expected one of {COMPRESSIONS}")
+
+
+class LeagueExporter:
+    """
+    Writes a league in the record format described in this module, in constant memory.
+    """
+    def __init__(self, league):
+        """
+        Initializes an exporter for the specified league.
+
+        :param league: The league to export.
+        """
+        self._league = league
+
+    def export(self, target, compression=None):
+        """
+        Writes the league to a file or stream.
+
+        :param target: A file name, or a writable binary stream (left open).
+        :param compression: Optional. None, "gzip" or "lzma".
+        :return: The number of rows written.
+        """
+        if isinstance(target, (str, bytes)) or hasattr(target, "__fspath__"):
+            with open(target, "wb") as stream:
+                return self._export_stream(stream, compression)
+        return self._export_stream(target, compression)
+
+    def _export_stream(self, stream, compression):
+        compressor = _compressed(stream, compression)
+        buffered = io.BufferedWriter(_Unclosable(compressor), WRITE_BUFFER)
+        text = io.TextIOWrapper(buffered, encoding="utf-8", newline="")
+        try:
+            rows = self.write_rows(csv.writer(text))
+        finally:
+            text.flush()
+            text.detach()
+            buffered.flush()
+            if compressor is not stream:
+                compressor.close()  # writes the compressed trailer; the target stream stays open
+        return rows
+
+    def write_rows(self, writer):
+        """
+        Writes the league records with a csv writer. The league cannot change meanwhile,
+        since the read lock of its database is held (see model.rw_lock).
+
+        :param writer: A csv writer (or any object with writerow).
+        :return: The number of rows written.
+        """
+        with read_locked(self._league._databases):
+            return self._write_rows(writer)
+
+    def _write_rows(self, writer):
+        league = self._league
+        writerow = writer.writerow
+        writerow(("league", league.oid, league.name))
+        rows = 1
+        for team in league.iter_teams():
+            team_oid = team.oid
+            writerow(("team", team_oid, team.name))
+            rows += 1
+            for member in team.iter_members():
+                writerow(("member", team_oid, member.oid, member.name, member.email))
+            rows += len(team.members)
+        for competition in league.competitions:
+            date_time = competition.date_time
+            writerow(("competition", competition.oid, competition.location,
+                      "" if date_time is None else date_time.isoformat(),
+                      *(team.oid for team in competition.teams_competing)))
+            rows += 1
+        return rows
+
+
+class _Unclosable(io.RawIOBase):
+    """
+    A raw stream that forwards writes but keeps the wrapped stream open when closed,
+    so a caller's stream survives the buffered and text layers put on top of it.
+    """
+    def __init__(self, stream):
+        self._stream = stream
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._stream.write(data)
+        return len(data)
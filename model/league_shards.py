@@ -0,0 +1,169 @@
+"""
+Sharded on-disk layout for LeagueDatabase: a directory holding a manifest and one
+pickle file per league.
+
+    manifest.json     {"version": 1, "last_oid": n,
+                       "leagues": [{"oid": 1, "name": "...", "file": "league-1.pkl", "schema_version": 2}, ...]}
+    league-<oid>.pkl  the pickled League, with its teams, members and competitions
+
+The manifest lists the leagues in database order, each with the schema version it
+was pickled with (see model.schema); shards written with an older one are upgraded
+as they are read, and rewritten in the current one the next time they change. Saving rewrites only the shards of
+leagues that changed since the database was last saved to (or loaded from) the
+directory, then replaces the manifest, then deletes the shards of removed leagues;
+every file is written under a temporary name and renamed into place, so an
+interrupted save leaves the previous manifest pointing at complete shards.
+
+Loading reads and unpickles the shards one after another by default. Unpickling
+holds the GIL, so threads cannot share that work; with max_workers above 1 a thread
+pool reads the shard files' bytes ahead while the loading thread unpickles them in
+order, which only pays when the reads themselves are slow (a cold cache or a network
+drive).
+"""
+import io
+import json
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from model import schema
+from model.atomic_file import atomic_write
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+SHARD_SUFFIX = ".shards"
+
+
+def is_shard_directory(file_name):
+    """
+    Returns True if the name refers to a sharded database: an existing directory, or a
+    new name ending in .shards.
+
+    :param file_name: The name of the directory.
+    :return: True for a sharded database.
+    """
+    return os.path.isdir(file_name) or (not os.path.exists(file_name) and file_name.endswith(SHARD_SUFFIX))
+
+
+def shard_file_name(league_oid):
+    """
+    Returns the name of the shard file of a league, relative to the directory.
+
+    :param league_oid: The oid of the league.
+    :return: The file name.
+    """
+    return f"league-{league_oid}.pkl"
+
+
+class LeaguePickler(pickle.Pickler):
+    """
+    Pickles a league without the database that holds it; the database is written as a
+    reference and resolved to the loading database by LeagueUnpickler. Used for shards
+    and for the league sections of model.sectioned_file.
+    """
+    def __init__(self, file, database):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._database = database
+
+    def persistent_id(self, obj):
+        return "database" if obj is self._database else None
+
+
+class LeagueUnpickler(pickle.Unpickler):
+    """
+    Unpickles a league written by LeaguePickler into the specified database.
+    """
+    def __init__(self, file, database):
+        super().__init__(file)
+        self._database = database
+
+    def persistent_load(self, pid):
+        if pid != "database":
+            raise pickle.UnpicklingError(f"unknown reference {pid!r}")
+        return self._database
+
+
+class ShardStore:
+    """
+    Reads and writes a LeagueDatabase as a directory of per-league shards.
+    """
+    def __init__(self, directory):
+        """
+        Initializes a store for the specified directory.
+
+        :param directory: The name of the directory.
+        """
+        self.directory = directory
+
+    def _read_bytes(self, entry):
+        with open(os.path.join(self.directory, entry["file"]), "rb") as file:
+            return file.read()
+
+    def load(self, database, max_workers=1):
+        """
+        Reads every league shard into a database.
+
+        :param database: An empty LeagueDatabase to fill in.
+        :param max_workers: Optional. The number of threads reading shard files ahead of
+            the unpickling, which stays on the calling thread; None uses the executor's default.
+        :return: The database.
+        """
+        with open(os.path.join(self.directory, MANIFEST), encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"{self.directory}: unsupported manifest version {manifest.get('version')}")
+        database._last_oid = manifest["last_oid"]
+        entries = manifest["leagues"]
+        if max_workers == 1 or len(entries) < 2:
+            self._index_shards(database, entries, map(self._read_bytes, entries))
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                self._index_shards(database, entries, executor.map(self._read_bytes, entries))
+        return database
+
+    @staticmethod
+    def _index_shards(database, entries, shards):
+        for entry, data in zip(entries, shards):
+            with schema.reading(entry.get("schema_version", schema.FIRST_VERSION)):
+                database._index_league(LeagueUnpickler(io.BytesIO(data), database).load())
+
+    def save(self, database, dirty_leagues=None):
+        """
+        Writes a database to the directory, creating it if needed.
+
+        :param database: The LeagueDatabase to write.
+        :param dirty_leagues: Optional. The oids of the leagues changed since the database was last
+            saved to this directory; other leagues whose shard exists are not rewritten. None rewrites all.
+        :return: The number of shards written.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        manifest_name = os.path.join(self.directory, MANIFEST)
+        try:
+            with open(manifest_name, encoding="utf-8") as file:
+                stored = {entry["file"]: entry.get("schema_version", schema.FIRST_VERSION)
+                          for entry in json.load(file)["leagues"]}
+        except FileNotFoundError:
+            stored = {}
+
+        entries = []
+        written = 0
+        for league in database.leagues:
+            file_name = shard_file_name(league.oid)
+            entry = {"oid": league.oid, "name": league.name, "file": file_name}
+            entries.append(entry)
+            if dirty_leagues is not None and league.oid not in dirty_leagues and file_name in stored:
+                entry["schema_version"] = stored[file_name]
+                continue
+            with atomic_write(os.path.join(self.directory, file_name)) as file:
+                LeaguePickler(file, database).dump(league)
+            entry["schema_version"] = schema.SCHEMA_VERSION
+            written += 1
+
+        manifest = {"version": MANIFEST_VERSION, "last_oid": database._last_oid, "leagues": entries}
+        with atomic_write(manifest_name) as file:
+            file.write(json.dumps(manifest, indent=1).encode("utf-8"))
+        for file_name in stored.keys() - {entry["file"] for entry in entries}:
+            try:
+                os.unlink(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                pass
+        return written
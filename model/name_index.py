@@ -0,0 +1,75 @@
+class NameIndex:
+    """
+    Maps names to the identified objects that carry them.
+
+    Names are not required to be unique, so each name keeps its objects in the
+    order they were indexed under it and first() returns the earliest one.
+    """
+    __slots__ = ("_buckets",)
+
+    def __init__(self):
+        """
+        Initializes an empty index.
+        """
+        self._buckets = {}  # name -> {oid: object}
+
+    def add(self, name, obj):
+        """
+        Indexes the object under the specified name.
+
+        :param name: The name to index the object under.
+        :param obj: The object to index.
+        """
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            self._buckets[name] = bucket = {}
+        bucket[obj.oid] = obj
+
+    def add_all(self, objects):
+        """
+        Indexes each object under its own name, in order; faster than calling add for each.
+
+        :param objects: An iterable of objects with a name property.
+        """
+        buckets = self._buckets
+        for obj in objects:
+            bucket = buckets.get(obj.name)
+            if bucket is None:
+                buckets[obj.name] = bucket = {}
+            bucket[obj.oid] = obj
+
+    def discard(self, name, obj):
+        """
+        Removes the object from the specified name, if it is indexed there.
+
+        :param name: The name the object was indexed under.
+        :param obj: The object to remove.
+        """
+        bucket = self._buckets.get(name)
+        if bucket is not None and bucket.get(obj.oid) is obj:
+            del bucket[obj.oid]
+            if not bucket:
+                del self._buckets[name]
+
+    def rename(self, old_name, new_name, obj):
+        """
+        Moves the object from one name to another.
+
+        :param old_name: The name the object was indexed under.
+        :param new_name: The name to index the object under.
+        :param obj: The object being renamed.
+        """
+        self.discard(old_name, obj)
+        self.add(new_name, obj)
+
+    def first(self, name):
+        """
+        Returns the first object indexed under the specified name.
+
+        :param name: The name to look up (case sensitive).
+        :return: The object or None if no object has that name.
+        """
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            return None
+        return next(iter(bucket.values()))
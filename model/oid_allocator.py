@@ -0,0 +1,121 @@
+import heapq
+
+
+class OidAllocator:
+    """
+    Hands out the smallest free oid of an oid-keyed collection.
+
+    The allocator does not copy the collection's oids. It reads the owner's
+    oid -> object dictionary for membership and keeps two pieces of state of its
+    own: a high-water mark below which every oid is known to be either used or
+    released, and a min-heap of the released oids. Finding the smallest free oid
+    is therefore O(log n) amortized instead of a scan of the collection.
+
+    Oids handed out by allocate() or reserve_block() stay reserved until the
+    owner adds an object with that oid (claim) or hands the oid back (release).
+    """
+    __slots__ = ("_used", "_reserved", "_released", "_next")
+
+    def __init__(self, used):
+        """
+        Initializes an allocator for the specified collection.
+
+        :param used: The owner's oid -> object dictionary (anything supporting `in`).
+        """
+        self._used = used
+        self._reserved = set()  # oids handed out but not yet claimed by an object
+        self._released = []  # min-heap of oids below _next that were released; may hold stale entries
+        self._next = 1  # every oid below _next is used, reserved or in _released
+
+    def _taken(self, oid):
+        return oid in self._used or oid in self._reserved
+
+    def peek(self):
+        """
+        Returns the smallest free oid without reserving it.
+
+        :return: The smallest positive oid not used by the collection.
+        """
+        released = self._released
+        while released and self._taken(released[0]):
+            heapq.heappop(released)
+        while self._taken(self._next):
+            self._next += 1
+        if released and released[0] < self._next:
+            return released[0]
+        return self._next
+
+    def allocate(self):
+        """
+        Reserves and returns the smallest free oid.
+
+        :return: The reserved oid.
+        """
+        oid = self.peek()
+        self._reserved.add(oid)
+        return oid
+
+    def reserve_block(self, count):
+        """
+        Reserves the specified number of free oids for a bulk insert, smallest first.
+
+        :param count: The number of oids to reserve.
+        :return: A list of the reserved oids in ascending order.
+        """
+        return [self.allocate() for _ in range(count)]
+
+    def claim(self, oid):
+        """
+        Records that an object with the specified oid was added to the collection.
+
+        :param oid: The oid now used by the collection.
+        :return: True if the oid was reserved.
+        """
+        reserved = oid in self._reserved
+        self._reserved.discard(oid)
+        return reserved
+
+    def unclaim(self, oid, reserved):
+        """
+        Undoes claim() once the object has been taken out of the collection again (see model.batch).
+
+        :param oid: The oid claimed.
+        :param reserved: What claim() returned.
+        """
+        self.release(oid)
+        if reserved:
+            self._reserved.add(oid)
+
+    def release(self, oid):
+        """
+        Makes the specified oid available again, either because its object was
+        removed from the collection or because a reservation was not used.
+
+        :param oid: The oid to release.
+        :return: True if the oid was reserved.
+        """
+        reserved = oid in self._reserved
+        self._reserved.discard(oid)
+        if isinstance(oid, int) and 0 < oid < self._next and oid not in self._used:
+            heapq.heappush(self._released, oid)
+        return reserved
+
+    def unrelease(self, oid, reserved):
+        """
+        Undoes release() (see model.batch). An object put back in the collection needs
+        nothing: the oid left in the heap of released oids is skipped as taken.
+
+        :param oid: The oid released.
+        :param reserved: What release() returned.
+        """
+        if reserved:
+            self._reserved.add(oid)
+
+    def release_block(self, oids):
+        """
+        Hands back oids reserved with reserve_block, e.g. to undo the reservation.
+
+        :param oids: The reserved oids.
+        """
+        for oid in oids:
+            self.release(oid)
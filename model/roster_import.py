@@ -0,0 +1,452 @@
+import copyreg
+import csv
+import io
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from model.custom_exceptions import DuplicateEmail, DuplicateOid
+from model.rw_lock import write_locked
+from model.team import Team
+from model.team_member import TeamMember
+
+CHUNK_ROWS = 4096  # rows handled per batch
+OID_BLOCK = 256  # most oids reserved at a time for new teams or for one team's new members
+READ_BUFFER = 1 << 20  # bytes read from the file at a time
+
+
+class RowError:
+    """
+    A problem found in one row of a roster file.
+    """
+    __slots__ = ("line", "message", "source")
+
+    def __init__(self, line, message, source=None):
+        """
+        Initializes a RowError.
+
+        :param line: The line number in the file (None for problems with the file itself).
+        :param message: A description of the problem.
+        :param source: Optional. The name of the file the row came from, when several files are imported together.
+        """
+        self.line = line
+        self.message = message
+        self.source = source
+
+    def __str__(self):
+        location = "" if self.line is None else f"line {self.line}: "
+        if self.source is not None:
+            location = f"{os.path.basename(self.source)}: {location}"
+        return location + self.message
+
+
+class ImportResult:
+    """
+    The outcome of importing a roster file into a league.
+    """
+    def __init__(self):
+        """
+        Initializes an empty result.
+        """
+        self.rows_read = 0
+        self.teams_created = 0
+        self.members_created = 0
+        self.members_unchanged = 0  # rows naming a member that was already on the team
+        self.errors = []  # RowError objects, in file order
+        self.dry_run = False  # True if the counts describe changes that were not applied
+
+    @property
+    def ok(self):
+        """
+        Read-only property that is True if every row was imported.
+
+        :return: True if no errors were recorded.
+        """
+        return not self.errors
+
+    def __str__(self):
+        created = "would be created" if self.dry_run else "created"
+        return (f"{self.rows_read} rows: {self.teams_created} teams and {self.members_created} members {created}, "
+                f"{self.members_unchanged} unchanged, {len(self.errors)} errors")
+
+
+def read_roster_rows(file_name, result):
+    """
+    Streams the data rows of a roster CSV file. The file has a header line followed by
+    rows of: team name, member name, member email. Rows with the wrong number of columns
+    or a blank team or member name are recorded in result and skipped.
+
+    :param file_name: The name of the CSV file to read.
+    :param result: The ImportResult that receives row counts and errors.
+    :return: A generator of (line number, team name, member name, member email) tuples.
+    """
+    try:
+        with open(file_name, newline='', encoding='utf-8', buffering=READ_BUFFER) as file:
+            reader = csv.reader(file)
+            next(reader, None)  # skip header
+            for row in reader:
+                result.rows_read += 1
+                if len(row) != 3:
+                    result.errors.append(RowError(reader.line_num, f"expected 3 columns, found {len(row)}"))
+                    continue
+                team_name, member_name, member_email = row
+                if not team_name or not member_name:
+                    result.errors.append(RowError(reader.line_num, "team name and member name are required"))
+                    continue
+                yield reader.line_num, team_name, member_name, member_email
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        result.errors.append(RowError(None, f"{file_name}: {e}"))
+
+
+class RosterImporter:
+    """
+    Adds the teams and members listed in roster rows to a league in a single pass.
+
+    Teams are resolved through a per-import name map, existing members through each
+    team's email index, and new oids are reserved in blocks rather than searched for
+    per row. Rows are consumed in chunks, so memory does not depend on the size of
+    the input beyond the objects the import creates.
+    """
+    def __init__(self, league):
+        """
+        Initializes an importer for the specified league.
+
+        :param league: The league to import into.
+        """
+        self._league = league
+        self._teams = {}  # team name -> team, for this import
+        self._team_oids = []  # reserved team oids not used yet, largest first
+        self._member_oids = {}  # team oid -> reserved member oids not used yet, largest first
+        self._block_sizes = {}  # team oid (None for the league) -> size of the next reservation
+
+    def import_file(self, file_name):
+        """
+        Imports a roster CSV file.
+
+        :param file_name: The name of the CSV file to import.
+        :return: An ImportResult describing what was imported.
+        """
+        result = ImportResult()
+        self.import_rows(read_roster_rows(file_name, result), result)
+        # rows are parsed a chunk ahead of being applied, so put the two kinds of errors back in file order
+        result.errors.sort(key=lambda error: -1 if error.line is None else error.line)
+        return result
+
+    def import_rows(self, rows, result=None):
+        """
+        Imports roster rows.
+
+        :param rows: An iterable of (line number, team name, member name, member email) tuples.
+        :param result: Optional. The ImportResult to update; a new one is created if omitted.
+        :return: The ImportResult.
+        """
+        if result is None:
+            result = ImportResult()
+        rows = iter(rows)
+        try:
+            while True:
+                chunk = list(islice(rows, CHUNK_ROWS))
+                if not chunk:
+                    break
+                # readers on other threads get their turn between chunks
+                with write_locked(self._league._holding_databases()):
+                    for line, team_name, member_name, member_email in chunk:
+                        self._import_row(line, team_name, member_name, member_email, result)
+        finally:
+            self._release_unused_oids()
+        return result
+
+    def merge_teams(self, teams, lines, result):
+        """
+        Adds teams built outside the league (see build_roster_file). A team whose name
+        is new to the league (and to this import) is added as it is, with its members,
+        under an oid from the league; the members of a team the league already has are
+        checked against it by email and added one at a time, as rows would be.
+
+        :param teams: The teams, with oids that are only provisional.
+        :param lines: For each team, the line number of each of its members, in member order.
+        :param result: The ImportResult to update.
+        :return: The ImportResult.
+        """
+        try:
+            for team, team_lines in zip(teams, lines):
+                # readers on other threads get their turn between teams
+                with write_locked(self._league._holding_databases()):
+                    self._merge_team(team, team_lines, result)
+        finally:
+            self._release_unused_oids()
+        return result
+
+    def _merge_team(self, team, lines, result):
+        name = team.name
+        target = self._teams.get(name)
+        if target is None:
+            target = self._league.team_named(name)
+        if target is None:
+            team._oid = self._next_team_oid()  # the team is in no collection yet, so its oid can still change
+            self._league.add_team(team)
+            self._teams[name] = team
+            result.teams_created += 1
+            result.members_created += len(lines)
+            return
+        self._teams[name] = target
+        for member, line in zip(team.iter_members(), lines):
+            self._import_row(line, name, member.name, member.email, result)
+
+    def _import_row(self, line, team_name, member_name, member_email, result):
+        team = self._teams.get(team_name)
+        if team is None:
+            team = self._league.team_named(team_name)
+            if team is None:
+                team = Team(self._next_team_oid(), team_name)
+                self._league.add_team(team)
+                result.teams_created += 1
+            self._teams[team_name] = team
+
+        existing = team.member_with_email(member_email)
+        if existing is not None and existing.name == member_name:
+            result.members_unchanged += 1
+            return
+        if existing is not None:
+            result.errors.append(RowError(line, f"email {member_email} is already used by {existing.name} "
+                                                f"on team {team_name}"))
+            return
+        try:
+            team.add_member(TeamMember(self._next_member_oid(team), member_name, member_email))
+            result.members_created += 1
+        except (DuplicateEmail, DuplicateOid) as e:
+            result.errors.append(RowError(line, f"{type(e).__name__}: {e}"))
+
+    def _block_size(self, key):
+        # start small so teams with a handful of members do not reserve a full block, then double
+        size = self._block_sizes.get(key, 8)
+        self._block_sizes[key] = min(size * 2, OID_BLOCK)
+        return size
+
+    def _next_team_oid(self):
+        if not self._team_oids:
+            # reversed so that pop() hands the smallest oid out first
+            self._team_oids = self._league.reserve_team_oids(self._block_size(None))[::-1]
+        return self._team_oids.pop()
+
+    def _next_member_oid(self, team):
+        oids = self._member_oids.get(team.oid)
+        if not oids:
+            oids = self._member_oids[team.oid] = team.reserve_member_oids(self._block_size(team.oid))[::-1]
+        return oids.pop()
+
+    def _release_unused_oids(self):
+        for oid in self._team_oids:
+            self._league.release_team_oid(oid)
+        self._team_oids = []
+        if self._member_oids:  # called once per file of a batch import, so skip the teams when nothing is reserved
+            for team in self._teams.values():
+                for oid in self._member_oids.pop(team.oid, ()):
+                    team.release_member_oid(oid)
+
+
+class BulkRosterLoader:
+    """
+    Loads a whole roster file into a league in two phases.
+
+    The first phase reads every row and validates the batch against the league and
+    against itself: duplicate emails on a team (case-insensitive) are rejected
+    whether they clash with an existing member or with another row. The second phase
+    reserves the oids for all new teams and members in one block per collection and
+    applies the accepted rows in a single pass. In dry-run mode only the first phase
+    runs, so the league is left untouched.
+    """
+    def __init__(self, league):
+        """
+        Initializes a loader for the specified league.
+
+        :param league: The league to load into.
+        """
+        self._league = league
+
+    def load_file(self, file_name, dry_run=False):
+        """
+        Loads a roster CSV file.
+
+        :param file_name: The name of the CSV file to load.
+        :param dry_run: Optional. If True, report what would change without changing the league.
+        :return: An ImportResult describing what was (or would be) imported.
+        """
+        result = ImportResult()
+        self.load_rows(read_roster_rows(file_name, result), result, dry_run)
+        return result
+
+    def load_rows(self, rows, result=None, dry_run=False):
+        """
+        Loads roster rows.
+
+        :param rows: An iterable of (line number, team name, member name, member email) tuples.
+        :param result: Optional. The ImportResult to update; a new one is created if omitted.
+        :param dry_run: Optional. If True, report what would change without changing the league.
+        :return: The ImportResult.
+        """
+        if result is None:
+            result = ImportResult()
+        result.dry_run = dry_run
+        plan = self._plan(rows, result)
+        result.errors.sort(key=lambda error: -1 if error.line is None else error.line)
+        if not dry_run:
+            self._apply(plan, result)
+        return result
+
+    def _plan(self, rows, result):
+        """
+        Validates the rows and returns the accepted additions grouped by team name.
+
+        :return: A dict of team name -> (existing team or None, list of (line, member name, email)).
+        """
+        plan = {}
+        planned_emails = {}  # team name -> {casefolded email: member name}
+        for line, team_name, member_name, member_email in rows:
+            entry = plan.get(team_name)
+            if entry is None:
+                team = self._league.team_named(team_name)
+                entry = plan[team_name] = (team, [])
+                planned_emails[team_name] = {}
+                if team is None:
+                    result.teams_created += 1
+            team, additions = entry
+
+            existing = None if team is None else team.member_with_email(member_email)
+            existing_name = None if existing is None else existing.name
+            email_key = member_email.casefold()
+            if existing_name is None:
+                existing_name = planned_emails[team_name].get(email_key)
+            if existing_name == member_name:
+                result.members_unchanged += 1
+            elif existing_name is not None:
+                result.errors.append(RowError(line, f"email {member_email} is already used by {existing_name} "
+                                                    f"on team {team_name}"))
+            else:
+                planned_emails[team_name][email_key] = member_name
+                additions.append((line, member_name, member_email))
+                result.members_created += 1
+        return plan
+
+    def _apply(self, plan, result):
+        with write_locked(self._league._holding_databases()):
+            self._apply_locked(plan, result)
+
+    def _apply_locked(self, plan, result):
+        league = self._league
+        new_team_names = [team_name for team_name, (team, _) in plan.items() if team is None]
+        for team_name, oid in zip(new_team_names, league.reserve_team_oids(len(new_team_names))):
+            team = Team(oid, team_name)
+            league.add_team(team)
+            plan[team_name] = (team, plan[team_name][1])
+
+        for team, additions in plan.values():
+            oids = team.reserve_member_oids(len(additions))
+            for (line, member_name, member_email), oid in zip(additions, oids):
+                try:
+                    team.add_member(TeamMember(oid, member_name, member_email))
+                except (DuplicateEmail, DuplicateOid) as e:
+                    # only possible if the team changed between validation and apply
+                    team.release_member_oid(oid)
+                    result.members_created -= 1
+                    result.errors.append(RowError(line, f"{type(e).__name__}: {e}"))
+
+
+def build_roster_file(file_name):
+    """
+    Reads a roster file and builds its teams and members, checking the rows against
+    each other as RosterImporter would. Runs in a worker process during a batch import.
+    The teams belong to no league yet, and their oids are provisional.
+
+    :param file_name: The name of the CSV file to read.
+    :return: A (teams, lines, result) tuple: the teams in order of first appearance, for each
+        team the line number of each member in member order, and an ImportResult with the rows
+        read, the rows naming a member already listed and the errors found in the file.
+    """
+    result = ImportResult()
+    teams = {}  # team name -> team
+    lines = {}  # team name -> line number of each member
+    for line, team_name, member_name, member_email in read_roster_rows(file_name, result):
+        team = teams.get(team_name)
+        if team is None:
+            team = teams[team_name] = Team(len(teams) + 1, team_name)
+            lines[team_name] = []
+        existing = team.member_with_email(member_email)
+        if existing is None:
+            team_lines = lines[team_name]
+            team.add_member(TeamMember(len(team_lines) + 1, member_name, member_email))
+            team_lines.append(line)
+        elif existing.name == member_name:
+            result.members_unchanged += 1
+        else:
+            result.errors.append(RowError(line, f"email {member_email} is already used by {existing.name} "
+                                                f"on team {team_name}"))
+    return list(teams.values()), list(lines.values()), result
+
+
+def _reduce_team(team):
+    return Team._with_members, (team.oid, team.name,
+                                [(member.oid, member.name, member.email) for member in team.iter_members()])
+
+
+class _TeamPickler(pickle.Pickler):
+    """
+    Pickles the teams built by a worker as their members' values. Unpickled attribute
+    by attribute, a team costs the parent more than building it did; from its values
+    it is rebuilt without repeating the checks the worker made.
+    """
+    dispatch_table = copyreg.dispatch_table.copy()
+    dispatch_table[Team] = _reduce_team
+
+
+def _build_for_transfer(file_name):
+    # what build_roster_file returns, pickled in the worker for the parent
+    stream = io.BytesIO()
+    _TeamPickler(stream, pickle.HIGHEST_PROTOCOL).dump(build_roster_file(file_name))
+    return stream.getvalue()
+
+
+def import_roster_files(league, file_names, max_workers=None, progress=None):
+    """
+    Imports many roster files into a league. Worker processes read the files in
+    parallel and build each file's teams and members, checking its rows against each
+    other; the league then takes the teams in the order the files are given, one file
+    after another, so the outcome does not depend on which worker finishes first. A
+    team new to the league is added whole; only the members of teams the league (or an
+    earlier file) already has are checked one by one. Conflicts between files (for
+    example the same email under two names on one team) are reported against the
+    later row.
+
+    :param league: The league to import into.
+    :param file_names: The names of the CSV files, in merge order.
+    :param max_workers: Optional. The number of worker processes (defaults to the number of CPUs).
+    :param progress: Optional. A function (files merged, number of files) called after each file.
+    :return: A single ImportResult for all files; each error names its file.
+    """
+    file_names = list(file_names)
+    result = ImportResult()
+    if len(file_names) > 1 and max_workers != 1:
+        executor = ProcessPoolExecutor(max_workers=min(max_workers or os.cpu_count() or 1, len(file_names)))
+        built = map(pickle.loads, executor.map(_build_for_transfer, file_names))
+    else:
+        executor = None
+        built = map(build_roster_file, file_names)
+
+    importer = RosterImporter(league)
+    try:
+        for done, (file_name, (teams, lines, file_result)) in enumerate(zip(file_names, built), 1):
+            importer.merge_teams(teams, lines, file_result)
+            file_result.errors.sort(key=lambda error: -1 if error.line is None else error.line)
+            for error in file_result.errors:
+                error.source = file_name
+            result.rows_read += file_result.rows_read
+            result.teams_created += file_result.teams_created
+            result.members_created += file_result.members_created
+            result.members_unchanged += file_result.members_unchanged
+            result.errors.extend(file_result.errors)
+            if progress is not None:
+                progress(done, len(file_names))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return result
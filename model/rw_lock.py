@@ -0,0 +1,254 @@
+"""
+Reader/writer locking for the model.
+
+Every LeagueDatabase owns a ReadWriteLock. Methods that change a league, team, member
+or competition are decorated with @mutator, which takes the write lock of every
+database holding the object (found through the back-references the model keeps:
+member -> teams -> leagues -> databases) for the duration of the change. Threads
+that read several things that must agree, such as an export or a save, hold the
+read lock (LeagueDatabase.reading()); single reads need no lock.
+
+Objects that are not in a database yet are not shared, so changing them takes no
+lock: a thread may build a league in private and add it when it is complete.
+"""
+import contextlib
+import functools
+import threading
+
+_orphans = {}  # id(object) -> (object, batch) for objects a batch in progress took out of its database
+
+
+class ReadWriteLock:
+    """
+    A lock that lets many threads read at once or one thread write. Waiting writers
+    go before new readers, so a steady stream of readers cannot starve them.
+
+    Both sides are reentrant: a thread that holds the write lock may take it again or
+    take the read lock, and a thread that holds the read lock may take it again. A
+    thread that holds only the read lock cannot take the write lock; that raises
+    RuntimeError rather than waiting for itself forever.
+    """
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0  # read holds of all threads
+        self._writer = None  # ident of the thread holding the write lock
+        self._writes = 0  # write holds of that thread
+        self._waiting_writers = 0
+        self._local = threading.local()  # .reads: read holds of the current thread
+
+    def acquire_read(self):
+        """
+        Takes the read lock, waiting while another thread writes or waits to write.
+        """
+        reads = getattr(self._local, "reads", 0)
+        with self._condition:
+            if reads == 0 and self._writer != threading.get_ident():
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+            self._readers += 1
+        self._local.reads = reads + 1
+
+    def release_read(self):
+        """
+        Releases one hold of the read lock.
+        """
+        self._local.reads -= 1
+        with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        """
+        Takes the write lock, waiting until no other thread reads or writes.
+
+        :raises RuntimeError: If the current thread holds the read lock but not the write lock.
+        """
+        me = threading.get_ident()
+        if self._writer == me:
+            self._writes += 1  # only this thread changes the count while it writes
+            return
+        if getattr(self._local, "reads", 0):
+            raise RuntimeError("cannot take the write lock while holding the read lock")
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writes = 1
+
+    def release_write(self):
+        """
+        Releases one hold of the write lock.
+        """
+        if self._writes > 1:
+            self._writes -= 1
+            return
+        with self._condition:
+            self._writes = 0
+            self._writer = None
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def read(self):
+        """
+        Holds the read lock for the duration of a with block.
+
+        :return: A context manager.
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextlib.contextmanager
+    def write(self):
+        """
+        Holds the write lock for the duration of a with block.
+
+        :return: A context manager.
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+@contextlib.contextmanager
+def write_locked(databases):
+    """
+    Holds the write locks of several databases, taken in a fixed order so that two
+    threads locking the same databases cannot deadlock.
+
+    :param databases: The databases to lock (duplicates are allowed).
+    :return: A context manager.
+    """
+    locks = sorted({id(database._lock): database._lock for database in databases}.items())
+    with contextlib.ExitStack() as stack:
+        for _, lock in locks:
+            stack.enter_context(lock.write())
+        yield
+
+
+@contextlib.contextmanager
+def read_locked(databases):
+    """
+    Holds the read locks of several databases, taken in the same fixed order as write_locked.
+
+    :param databases: The databases to lock (duplicates are allowed).
+    :return: A context manager.
+    """
+    locks = sorted({id(database._lock): database._lock for database in databases}.items())
+    with contextlib.ExitStack() as stack:
+        for _, lock in locks:
+            stack.enter_context(lock.read())
+        yield
+
+
+def mutator(method):
+    """
+    Decorates a method (or property setter) that changes a model object so that it runs
+    under the write lock of every database holding the object. While a batch is in
+    progress on one of them, the object's _batched_<method name>(batch, ...) runs
+    instead (see model.batch). The object must provide _holding_databases().
+
+    :param method: The method to decorate.
+    :return: The decorated method.
+    """
+    batched_name = "_batched_" + method.__name__
+
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        while True:
+            databases = self._holding_databases()
+            if not databases:
+                orphan = _orphans.get(id(self)) if _orphans else None
+                if orphan is None:
+                    return method(self, *args, **kwargs)
+                # taken out of a database by a batch still in progress: the change is part of the batch
+                batch = orphan[1]
+                with batch._database._lock.write():
+                    if _orphans.get(id(self)) is orphan:
+                        return getattr(self, batched_name)(batch, *args, **kwargs)
+                continue
+            if len(databases) == 1:
+                # the usual case, without the bookkeeping of write_locked
+                database = databases[0]
+                lock = database._lock
+                if lock._writer == threading.get_ident():
+                    # this thread writes already (e.g. in a batch), so nobody can move the object meanwhile
+                    if database._batch is not None:
+                        return getattr(self, batched_name)(database._batch, *args, **kwargs)
+                    return method(self, *args, **kwargs)
+                lock.acquire_write()
+                try:
+                    # another thread may have added or removed the object while we waited
+                    if self._holding_databases() == databases:
+                        return method(self, *args, **kwargs)
+                finally:
+                    lock.release_write()
+                continue
+            with write_locked(databases):
+                if self._holding_databases() == databases:
+                    for database in databases:
+                        if database._batch is not None:
+                            # the first batch found undoes the change if it rolls back
+                            return getattr(self, batched_name)(database._batch, *args, **kwargs)
+                    return method(self, *args, **kwargs)
+    return locked
+
+
+def adopt_orphans(batch, objects):
+    """
+    Makes changes to objects that a batch took out of its database part of the batch
+    until it ends, so that they are undone with it (see model.batch).
+
+    :param batch: The batch in progress.
+    :param objects: An iterable of model objects no database holds any more.
+    :return: A list of the keys to hand to release_orphans when the batch ends.
+    """
+    keys = []
+    for obj in objects:
+        _orphans[id(obj)] = (obj, batch)
+        keys.append(id(obj))
+    return keys
+
+
+def release_orphans(keys):
+    """
+    Ends what adopt_orphans started.
+
+    :param keys: The keys adopt_orphans returned.
+    """
+    for key in keys:
+        _orphans.pop(key, None)
+
+
+def rebuild_index(obj, name):
+    """
+    Rebuilds an index that a batch in progress left out of date (see model.batch), on
+    first use. Called from the __getattr__ of the classes that keep indexes, whose
+    _build_index(name, check) builds it. Other threads wait for the batch to end and
+    then usually find the index rebuilt by its commit.
+
+    :param obj: The object whose index is read.
+    :param name: The attribute name of the index.
+    :return: The index.
+    """
+    databases = obj._holding_databases()
+    with write_locked(databases):
+        try:
+            return object.__getattribute__(obj, name)  # rebuilt while this thread waited
+        except AttributeError:
+            pass
+        index = obj._build_index(name, False)  # the batch checks the index when it ends
+        object.__setattr__(obj, name, index)
+        for database in databases:
+            if database._batch is not None:
+                database._batch._rebuilt.add((id(obj), name))
+        return index
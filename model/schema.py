@@ -0,0 +1,92 @@
+"""
+Schema versions of the pickled model classes and the migrations between them.
+
+Pickle files and shard directories record the SCHEMA_VERSION of the classes that
+wrote them; files written before versions were recorded are FIRST_VERSION. While an
+older file is read, every League, Team, TeamMember and Competition is upgraded as it
+is unpickled: IdentifiedObject.__setstate__ passes the pickled attribute dictionary
+through the migrations registered for its class, from the file's version up to
+SCHEMA_VERSION, before any attribute is set (LeagueDatabase.__setstate__ does the
+same). Leagues are read one at a time, so an upgrade never holds more than the
+league being read in its old form.
+
+To change the attributes of a model class, raise SCHEMA_VERSION and register a
+migration for the version being left, for example:
+
+    @migration("Team", 2)
+    def _add_skip(team, state):
+        state["_skip"] = None
+
+A migration is passed the object being restored, with none of its attributes set
+yet, so that it can register the object with the objects it holds.
+
+Versions:
+
+    1   collections may be plain lists (files from before they were keyed by oid)
+    2   teams, leagues and databases keep their collections in oid-keyed dictionaries
+
+The version being read is kept per thread by reading(), so shard loader threads can
+read shards of different versions at the same time.
+"""
+import contextlib
+import threading
+
+SCHEMA_VERSION = 2
+FIRST_VERSION = 1  # the version of files written before versions were recorded
+_migrations = {}  # (class name, version) -> functions upgrading an attribute dictionary from version to version + 1
+_reading = threading.local()
+
+
+def migration(class_name, version):
+    """
+    Registers a function that upgrades the pickled attribute dictionary of a class from
+    the specified version to the next one. The function is called with the object being
+    restored and the dictionary, and changes the dictionary in place.
+
+    :param class_name: The name of the model class, such as "Team".
+    :param version: The version the function upgrades from.
+    :return: A decorator registering the function.
+    """
+    def register(function):
+        _migrations.setdefault((class_name, version), []).append(function)
+        return function
+    return register
+
+
+@contextlib.contextmanager
+def reading(version):
+    """
+    Unpickles the model objects read inside the block as written with the specified version.
+
+    :param version: The schema version of the data being read.
+    :return: A context manager.
+    :raises ValueError: If the data was written with a newer schema than this program knows.
+    """
+    if version > SCHEMA_VERSION:
+        raise ValueError(f"the data uses schema version {version}, newer than this program's {SCHEMA_VERSION}")
+    previous = getattr(_reading, "version", None)
+    _reading.version = version
+    try:
+        yield
+    finally:
+        _reading.version = previous
+
+
+def upgrade(obj, state):
+    """
+    Upgrades the pickled attribute dictionary of an object to the current schema.
+    Outside reading() the data is taken to be current and returned as it is.
+
+    :param obj: The object being unpickled.
+    :param state: The pickled attribute dictionary.
+    :return: The upgraded dictionary.
+    """
+    version = getattr(_reading, "version", None)
+    if version is None:
+        return state
+    class_name = type(obj).__name__
+    while version < SCHEMA_VERSION:
+        for function in _migrations.get((class_name, version), ()):
+            function(obj, state)
+        version += 1
+    return state
@@ -0,0 +1,267 @@
+"""
+Integrity-checked container for a pickled LeagueDatabase.
+
+The file is split into sections, each with its own length and CRC-32, so damage is
+found by checksumming the bytes before anything is unpickled, and a damaged league
+costs only that league:
+
+    magic            8 bytes
+    sections         the database settings, then one pickled League per league
+    section table    one entry per section: kind, league oid, offset, length, CRC-32
+    footer           offset of the table, number of sections, CRC-32 of the table, magic
+
+The settings record the schema version the leagues were pickled with (see
+model.schema); leagues written with an older one are upgraded as they are read.
+The table sits at the end so the file can be written in one pass. A damaged footer,
+table or settings section makes the whole file unreadable; a damaged league section
+is reported so the league can be taken from a backup or left out.
+"""
+import io
+import pickle
+import struct
+import zlib
+from model import schema
+from model.custom_exceptions import DamagedFile
+from model.league_shards import LeaguePickler, LeagueUnpickler
+
+MAGIC = b"CLDBSEC1"
+FOOTER = struct.Struct("<QII8s")
+ENTRY = struct.Struct("<BqQQI")
+SETTINGS_SECTION = 0
+LEAGUE_SECTION = 1
+# LeagueDatabase attributes rebuilt from the league sections instead of stored in the settings
+DATABASE_INDEXES = ("_leagues", "_league_names", "_league_oids")
+SCHEMA_VERSION_KEY = "schema_version"  # settings entry holding the schema version of the league sections
+
+
+def is_sectioned(stream):
+    """
+    Returns True if a binary stream holds a sectioned file. The stream is left at its start.
+
+    :param stream: A seekable binary stream positioned at the start of the file.
+    :return: True if the stream starts with the container's magic.
+    """
+    magic = stream.read(len(MAGIC))
+    stream.seek(0)
+    return magic == MAGIC
+
+
+class SectionWriter:
+    """
+    Writes a sectioned file one section at a time: the settings first, then the leagues.
+    """
+    def __init__(self, stream):
+        """
+        Starts a sectioned file on a binary stream.
+
+        :param stream: The writable binary stream.
+        """
+        self._stream = stream
+        self._offset = len(MAGIC)
+        self._entries = []
+        stream.write(MAGIC)
+
+    def _write_section(self, kind, oid, data):
+        self._stream.write(data)
+        self._entries.append(ENTRY.pack(kind, oid, self._offset, len(data), zlib.crc32(data)))
+        self._offset += len(data)
+
+    def write_settings(self, settings):
+        """
+        Writes the database settings section, stamped with the current schema version.
+
+        :param settings: The dictionary of database attributes, without DATABASE_INDEXES.
+        """
+        settings = dict(settings, **{SCHEMA_VERSION_KEY: schema.SCHEMA_VERSION})
+        self._write_section(SETTINGS_SECTION, 0, pickle.dumps(settings, pickle.HIGHEST_PROTOCOL))
+
+    def write_league(self, league, database):
+        """
+        Writes a league section.
+
+        :param league: The league to write.
+        :param database: The LeagueDatabase holding the league.
+        """
+        data = io.BytesIO()
+        LeaguePickler(data, database).dump(league)
+        self._write_section(LEAGUE_SECTION, league.oid, data.getbuffer())
+
+    def finish(self):
+        """
+        Writes the section table and the footer.
+        """
+        table = b"".join(self._entries)
+        self._stream.write(table)
+        self._stream.write(FOOTER.pack(self._offset, len(self._entries), zlib.crc32(table), MAGIC))
+
+
+def database_settings(database):
+    """
+    Returns the attributes of a database that are stored in the settings section.
+
+    :param database: The LeagueDatabase.
+    :return: The attribute dictionary, without the league indexes.
+    """
+    return {name: value for name, value in database.__getstate__().items() if name not in DATABASE_INDEXES}
+
+
+def write_sections(database, stream):
+    """
+    Writes a database to a binary stream as a sectioned file.
+
+    :param database: The LeagueDatabase to write.
+    :param stream: The writable binary stream.
+    """
+    writer = SectionWriter(stream)
+    writer.write_settings(database_settings(database))
+    for league in database.leagues:
+        writer.write_league(league, database)
+    writer.finish()
+
+
+class SectionedReader:
+    """
+    Reads the section table of a sectioned file and hands out sections whose checksum matches.
+    """
+    def __init__(self, stream, file_name):
+        """
+        Reads and checks the footer and the section table.
+
+        :param stream: A seekable binary stream holding the file.
+        :param file_name: The name of the file, for error messages.
+        :raises DamagedFile: If the footer or the table is damaged.
+        """
+        self._stream = stream
+        self.file_name = file_name
+        size = stream.seek(0, io.SEEK_END)
+        if size < len(MAGIC) + FOOTER.size:
+            raise DamagedFile(file_name, "the file is too short")
+        stream.seek(size - FOOTER.size)
+        table_offset, count, table_crc, magic = FOOTER.unpack(stream.read(FOOTER.size))
+        if magic != MAGIC or table_offset + count * ENTRY.size != size - FOOTER.size:
+            raise DamagedFile(file_name, "the section table cannot be found")
+        stream.seek(table_offset)
+        table = stream.read(count * ENTRY.size)
+        if zlib.crc32(table) != table_crc:
+            raise DamagedFile(file_name, "the section table fails its checksum")
+        self.entries = [ENTRY.unpack_from(table, i * ENTRY.size) for i in range(count)]
+        if not self.entries or self.entries[0][0] != SETTINGS_SECTION:
+            raise DamagedFile(file_name, "the settings section is missing")
+        self._schema_version = None
+
+    def read(self, entry):
+        """
+        Reads a section and checks it.
+
+        :param entry: An entry of the section table.
+        :return: The section's bytes, or None if they fail the checksum.
+        """
+        _, _, offset, length, crc = entry
+        self._stream.seek(offset)
+        data = self._stream.read(length)
+        return data if len(data) == length and zlib.crc32(data) == crc else None
+
+    def damaged_leagues(self):
+        """
+        Checksums every league section without unpickling anything.
+
+        :return: The oids of the leagues whose sections are damaged.
+        """
+        return [entry[1] for entry in self.entries[1:] if self.read(entry) is None]
+
+    def league_entry(self, oid):
+        """
+        Returns the table entry of a league.
+
+        :param oid: The oid of the league.
+        :return: The entry, or None if the file holds no such league.
+        """
+        return next((entry for entry in self.entries[1:] if entry[0] == LEAGUE_SECTION and entry[1] == oid), None)
+
+    def read_settings(self):
+        """
+        Reads the database settings section.
+
+        :return: The dictionary of database attributes.
+        :raises DamagedFile: If the section is damaged.
+        """
+        data = self.read(self.entries[0])
+        if data is None:
+            raise DamagedFile(self.file_name, "the settings section fails its checksum")
+        settings = pickle.loads(data)
+        self._schema_version = settings.pop(SCHEMA_VERSION_KEY, schema.FIRST_VERSION)
+        return settings
+
+    @property
+    def schema_version(self):
+        """
+        Read-only property representing the schema version the leagues were written with.
+
+        :return: The schema version.
+        :raises DamagedFile: If the settings section is damaged.
+        """
+        if self._schema_version is None:
+            self.read_settings()
+        return self._schema_version
+
+    def read_league(self, entry, database):
+        """
+        Reads a league section into a database (the league is not added to it),
+        upgrading it to the current schema.
+
+        :param entry: The table entry of the league.
+        :param database: The LeagueDatabase the league will belong to.
+        :return: The league, or None if the section is damaged.
+        """
+        data = self.read(entry)
+        if data is None:
+            return None
+        with schema.reading(self.schema_version):
+            return LeagueUnpickler(io.BytesIO(data), database).load()
+
+
+def read_sections(database, reader, find_replacement=None):
+    """
+    Reads a sectioned file into a new, empty database. A league whose section is damaged
+    is taken from find_replacement if it can supply one, and left out otherwise.
+
+    :param database: An empty LeagueDatabase to fill in.
+    :param reader: The SectionedReader of the file.
+    :param find_replacement: Optional. A function (league oid, database) -> (league, source) or None.
+    :return: A list of (league oid, source) for the damaged leagues; source is None if the league was left out.
+    """
+    database.__dict__.update(reader.read_settings())
+    problems = []
+    for entry in reader.entries[1:]:
+        league = reader.read_league(entry, database)
+        if league is None:
+            replacement = find_replacement(entry[1], database) if find_replacement is not None else None
+            league, source = replacement if replacement is not None else (None, None)
+            problems.append((entry[1], source))
+            if league is None:
+                continue
+        database._index_league(league)
+    return problems
+
+
+def upgrade_sections(reader, stream, database):
+    """
+    Copies a sectioned file to a stream with every league upgraded to the current schema.
+    The leagues are read and written one at a time, so only one is in memory at once.
+
+    :param reader: The SectionedReader of the file to upgrade.
+    :param stream: The writable binary stream.
+    :param database: An empty LeagueDatabase that takes the settings; the leagues are not added to it.
+    :return: The number of leagues copied.
+    :raises DamagedFile: If a section is damaged.
+    """
+    database.__dict__.update(reader.read_settings())
+    writer = SectionWriter(stream)
+    writer.write_settings(database_settings(database))
+    for entry in reader.entries[1:]:
+        league = reader.read_league(entry, database)
+        if league is None:
+            raise DamagedFile(reader.file_name, f"the section of league {entry[1]} fails its checksum")
+        writer.write_league(league, database)
+    writer.finish()
+    return len(reader.entries) - 1
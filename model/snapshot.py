@@ -0,0 +1,300 @@
+"""
+Read-only binary snapshot of a LeagueDatabase, opened with mmap.
+
+A snapshot is a header followed by a string table and tables of fixed-width
+little-endian records for leagues, teams, members and competitions. Opening one
+maps the file and reads only the league records, so it takes the same few
+milliseconds whatever the size of the file. Each league is created with
+League.deferred and materializes its teams, members and competitions from the
+mapped records the first time it is used; leagues nobody opens cost nothing beyond
+their record. The file stays mapped until every league has been materialized, or
+until the store is closed (LeagueDatabase.load closes the stores of the database it
+replaces).
+
+Changes are made to the model as usual. Saving to a snapshot rewrites the whole
+file (into a temporary file that then replaces it), so the format suits files that
+are written rarely and opened often, such as a scoreboard's copy of the league.
+
+Layout (all offsets are from the start of the file):
+
+    header          magic, version, last oid, then (offset, count) for each table
+    string offsets  one more offset into the string data than there are strings
+    string data     UTF-8 text of every distinct string
+    leagues         oid, name, then (first, count) of its teams, members and competitions
+    teams           oid, name, (first, count) of its entries in team members
+    members         oid, name, email
+    team members    index of a member record
+    competitions    oid, location, date/time (ISO text), (first, count) of its entries in competition teams
+    competition teams  index of a team record
+
+Strings are indexes into the string table; NO_STRING stands for None. Oids must be
+integers.
+"""
+import mmap
+import struct
+from datetime import datetime
+from model.atomic_file import atomic_write
+from model.competition import Competition
+from model.league import League
+from model.team import Team
+from model.team_member import TeamMember
+
+MAGIC = b"CLSNAP\x00\x01"
+VERSION = 1
+SNAPSHOT_SUFFIXES = (".snapshot",)
+NO_STRING = 0xFFFFFFFF
+
+TABLES = ("string_offsets", "string_data", "leagues", "teams", "members", "team_members",
+          "competitions", "competition_teams")
+HEADER = struct.Struct("<8sIxxxxq" + "QQ" * len(TABLES))
+STRING_OFFSET = struct.Struct("<Q")
+LEAGUE = struct.Struct("<qIIIIIII")
+TEAM = struct.Struct("<qIII")
+MEMBER = struct.Struct("<qII")
+INDEX = struct.Struct("<I")
+COMPETITION = struct.Struct("<qIIII")
+
+RECORD_SIZES = {"string_offsets": STRING_OFFSET.size, "string_data": 1, "leagues": LEAGUE.size,
+                "teams": TEAM.size, "members": MEMBER.size, "team_members": INDEX.size,
+                "competitions": COMPETITION.size, "competition_teams": INDEX.size}
+
+
+def is_snapshot_file(file_name):
+    """
+    Returns True if the file should be read or written as a snapshot: an existing file
+    is recognized by its header, a new one by its suffix.
+
+    :param file_name: The name of the file.
+    :return: True for a snapshot.
+    """
+    try:
+        with open(file_name, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return file_name.lower().endswith(SNAPSHOT_SUFFIXES)
+
+
+class SnapshotStore:
+    """
+    A snapshot file mapped into memory. Serves the contents of the leagues it created
+    until each of them has been materialized, then unmaps the file. Can be used as a
+    context manager, which closes it on exit.
+    """
+    def __init__(self, file_name):
+        """
+        Maps the specified snapshot file and checks its header.
+
+        :param file_name: The name of the snapshot file.
+        :raises ValueError: If the file is not a snapshot this version can read.
+        """
+        self.file_name = file_name
+        with open(file_name, "rb") as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = {}
+        self._counts = {}
+        self._league_records = {}  # league oid -> index of its league record
+        self._team_counts = {}  # league oid -> number of teams, for leagues not materialized yet
+        try:
+            self._read_header()
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_header(self):
+        if len(self._buffer) < HEADER.size:
+            raise ValueError(f"{self.file_name}: not a league snapshot")
+        magic, version, self.last_oid, *sections = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.file_name}: not a league snapshot (version {version})")
+        for i, table in enumerate(TABLES):
+            offset, count = sections[2 * i], sections[2 * i + 1]
+            if offset + count * RECORD_SIZES[table] > len(self._buffer):
+                raise ValueError(f"{self.file_name}: {table} table runs past the end of the file")
+            self._offsets[table] = offset
+            self._counts[table] = count
+
+    @property
+    def closed(self):
+        """
+        Read-only property that is True once the file has been unmapped.
+
+        :return: True if the store can no longer serve league contents.
+        """
+        return self._buffer is None
+
+    def close(self):
+        """
+        Unmaps the file. Leagues it created that have not been materialized can no longer
+        be; closing a closed store does nothing.
+        """
+        buffer, self._buffer = self._buffer, None
+        if buffer is not None:
+            buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _string(self, index):
+        if index == NO_STRING:
+            return None
+        offsets = self._offsets["string_offsets"] + index * STRING_OFFSET.size
+        start, = STRING_OFFSET.unpack_from(self._buffer, offsets)
+        end, = STRING_OFFSET.unpack_from(self._buffer, offsets + STRING_OFFSET.size)
+        data = self._offsets["string_data"]
+        return self._buffer[data + start:data + end].decode("utf-8")
+
+    def _records(self, table, record, first, count):
+        start = self._offsets[table] + first * record.size
+        return record.iter_unpack(self._buffer[start:start + count * record.size])
+
+    def load(self, database):
+        """
+        Reads the league records into a database. The leagues' contents are read on first use.
+
+        :param database: An empty LeagueDatabase to fill in.
+        :return: The database.
+        """
+        database._last_oid = self.last_oid
+        records = self._records("leagues", LEAGUE, 0, self._counts["leagues"])
+        for index, (oid, name, _, team_count, *_) in enumerate(records):
+            league = League.deferred(oid, self._string(name), self)
+            self._league_records[oid] = index
+            self._team_counts[oid] = team_count
+            database._index_league(league)
+        if not self._team_counts:
+            self.close()  # no leagues to serve
+        return database
+
+    def team_count(self, league):
+        """
+        Returns the number of teams of a league that has not been materialized.
+
+        :param league: The deferred league.
+        :return: The number of teams.
+        """
+        return self._team_counts[league.oid]
+
+    def load_league_contents(self, league):
+        """
+        Materializes the teams, members and competitions of a deferred league. Called by the league on first use.
+
+        :param league: The league to fill in.
+        :raises ValueError: If the store has been closed.
+        """
+        if self._buffer is None:
+            raise ValueError(f"{self.file_name}: snapshot closed before league {league.oid} was read")
+        index = self._league_records[league.oid]
+        _, _, first_team, team_count, first_member, member_count, first_competition, competition_count = \
+            LEAGUE.unpack_from(self._buffer, self._offsets["leagues"] + index * LEAGUE.size)
+        string = self._string
+
+        members = [TeamMember(oid, string(name), string(email))
+                   for oid, name, email in self._records("members", MEMBER, first_member, member_count)]
+        teams = []
+        for oid, name, first_entry, entry_count in self._records("teams", TEAM, first_team, team_count):
+            team = Team(oid, string(name))
+            for member_index, in self._records("team_members", INDEX, first_entry, entry_count):
+                team.add_member(members[member_index - first_member])
+            teams.append(team)
+        for team in teams:
+            league._index_team(team)
+
+        for oid, location, date_time, first_entry, entry_count in self._records(
+                "competitions", COMPETITION, first_competition, competition_count):
+            competing = [teams[team_index - first_team]
+                         for team_index, in self._records("competition_teams", INDEX, first_entry, entry_count)]
+            date_time = string(date_time)
+            date_time = None if date_time is None else datetime.fromisoformat(date_time)
+            league._index_competition(Competition(oid, competing, string(location), date_time))
+        self._team_counts.pop(league.oid, None)
+        if not self._team_counts:
+            self.close()  # every league has been materialized
+
+
+class _StringTable:
+    """
+    Assigns each distinct string an index while a snapshot is written.
+    """
+    def __init__(self):
+        self._indexes = {}
+        self.offsets = bytearray(STRING_OFFSET.pack(0))
+        self.data = bytearray()
+
+    def index(self, text):
+        if text is None:
+            return NO_STRING
+        index = self._indexes.get(text)
+        if index is None:
+            index = self._indexes[text] = len(self._indexes)
+            self.data += text.encode("utf-8")
+            self.offsets += STRING_OFFSET.pack(len(self.data))
+        return index
+
+
+def write_snapshot(database, file_name):
+    """
+    Writes a database to a snapshot file. The file is written under a temporary name
+    and then replaces file_name, so readers never see a partly written snapshot.
+
+    :param database: The LeagueDatabase to write.
+    :param file_name: The name of the snapshot file.
+    """
+    strings = _StringTable()
+    string = strings.index
+    tables = {table: bytearray() for table in TABLES[2:]}
+    counts = dict.fromkeys(TABLES[2:], 0)
+
+    for league in database.leagues:
+        first_team, first_member, first_competition = counts["teams"], counts["members"], counts["competitions"]
+        team_indexes = {}  # team oid -> team record index
+        member_indexes = {}  # id(member) -> member record index, so a member on several teams is written once
+        for team in league.iter_teams():
+            team_indexes[team.oid] = counts["teams"]
+            first_entry = counts["team_members"]
+            for member in team.iter_members():
+                member_index = member_indexes.get(id(member))
+                if member_index is None:
+                    member_index = member_indexes[id(member)] = counts["members"]
+                    tables["members"] += MEMBER.pack(member.oid, string(member.name), string(member.email))
+                    counts["members"] += 1
+                tables["team_members"] += INDEX.pack(member_index)
+                counts["team_members"] += 1
+            tables["teams"] += TEAM.pack(team.oid, string(team.name), first_entry, counts["team_members"] - first_entry)
+            counts["teams"] += 1
+
+        for competition in league.competitions:
+            first_entry = counts["competition_teams"]
+            for team in competition.teams_competing:
+                tables["competition_teams"] += INDEX.pack(team_indexes[team.oid])
+                counts["competition_teams"] += 1
+            date_time = competition.date_time
+            tables["competitions"] += COMPETITION.pack(
+                competition.oid, string(competition.location),
+                string(None if date_time is None else date_time.isoformat()),
+                first_entry, counts["competition_teams"] - first_entry)
+            counts["competitions"] += 1
+
+        tables["leagues"] += LEAGUE.pack(
+            league.oid, string(league.name), first_team, counts["teams"] - first_team,
+            first_member, counts["members"] - first_member,
+            first_competition, counts["competitions"] - first_competition)
+        counts["leagues"] += 1
+
+    tables["string_offsets"] = strings.offsets
+    tables["string_data"] = strings.data
+    counts["string_offsets"] = len(strings.offsets) // STRING_OFFSET.size  # one more than the number of strings
+    counts["string_data"] = len(strings.data)
+
+    sections = []
+    offset = HEADER.size
+    for table in TABLES:
+        sections += (offset, counts[table])
+        offset += len(tables[table])
+
+    with atomic_write(file_name) as file:
+        file.write(HEADER.pack(MAGIC, VERSION, database._last_oid, *sections))
+        for table in TABLES:
+            file.write(tables[table])
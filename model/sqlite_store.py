@@ -0,0 +1,226 @@
+"""
+SQLite storage for LeagueDatabase.
+
+A store holds one row per league, team, member and competition. Loading reads only
+the league rows; each league's teams, members and competitions are read the first
+time the league is used (see League.deferred), so opening a file costs the same
+whatever the size of the leagues in it. Saving updates the file in place inside one
+transaction: leagues that were never read are left as they are, and the others are
+rewritten.
+
+Members are numbered per league (member_id) so that a member playing on several
+teams is stored once and comes back as a single object.
+"""
+import errno
+import os
+import sqlite3
+from datetime import datetime
+from model.competition import Competition
+from model.league import League
+from model.team import Team
+from model.team_member import TeamMember
+
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+SQLITE_HEADER = b"SQLite format 3\x00"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS leagues (
+    oid INTEGER PRIMARY KEY, position INTEGER NOT NULL, name TEXT);
+CREATE TABLE IF NOT EXISTS teams (
+    league_oid INTEGER NOT NULL, oid INTEGER NOT NULL, position INTEGER NOT NULL, name TEXT,
+    PRIMARY KEY (league_oid, oid));
+CREATE TABLE IF NOT EXISTS members (
+    league_oid INTEGER NOT NULL, member_id INTEGER NOT NULL, oid INTEGER NOT NULL, name TEXT, email TEXT,
+    PRIMARY KEY (league_oid, member_id));
+CREATE TABLE IF NOT EXISTS team_members (
+    league_oid INTEGER NOT NULL, team_oid INTEGER NOT NULL, position INTEGER NOT NULL, member_id INTEGER NOT NULL,
+    PRIMARY KEY (league_oid, team_oid, position));
+CREATE TABLE IF NOT EXISTS competitions (
+    league_oid INTEGER NOT NULL, oid INTEGER NOT NULL, position INTEGER NOT NULL, location TEXT, date_time TEXT,
+    PRIMARY KEY (league_oid, oid));
+CREATE TABLE IF NOT EXISTS competition_teams (
+    league_oid INTEGER NOT NULL, competition_oid INTEGER NOT NULL, position INTEGER NOT NULL, team_oid INTEGER NOT NULL,
+    PRIMARY KEY (league_oid, competition_oid, position));
+"""
+
+# tables holding the contents of a league, keyed by league_oid
+CONTENT_TABLES = ("teams", "members", "team_members", "competitions", "competition_teams")
+
+
+def is_sqlite_file(file_name):
+    """
+    Returns True if the file should be read or written as a SQLite store: an existing
+    file is recognized by its header, a new one by its suffix.
+
+    :param file_name: The name of the file.
+    :return: True for a SQLite store.
+    """
+    try:
+        with open(file_name, "rb") as file:
+            return file.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except FileNotFoundError:
+        return file_name.lower().endswith(SQLITE_SUFFIXES)
+
+
+class SqliteStore:
+    """
+    Reads and writes a LeagueDatabase in a SQLite file.
+    """
+    def __init__(self, file_name):
+        """
+        Initializes a store for the specified file.
+
+        :param file_name: The name of the SQLite file.
+        """
+        self.file_name = file_name
+        self._path = os.path.realpath(file_name)
+        self._team_counts = {}  # league oid -> number of teams, as of load()
+
+    def _connect(self):
+        return sqlite3.connect(self.file_name)
+
+    def holds(self, league):
+        """
+        Returns True if the league's contents have not been read yet and are stored in this file.
+
+        :param league: The league to check.
+        :return: True if saving to this file can leave the league's contents alone.
+        """
+        loader = league._loader
+        return isinstance(loader, SqliteStore) and loader._path == self._path
+
+    def load(self, database):
+        """
+        Reads the league rows into a database. The leagues' contents are read on first use.
+
+        :param database: An empty LeagueDatabase to fill in.
+        :return: The database.
+        """
+        if not os.path.exists(self.file_name):
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), self.file_name)
+        connection = self._connect()
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+            version = int(meta.get("schema_version", 0))
+            if version != SCHEMA_VERSION:
+                raise ValueError(f"{self.file_name}: unsupported store version {version}")
+            database._last_oid = int(meta.get("last_oid", 0))
+            self._team_counts = dict(connection.execute("SELECT league_oid, COUNT(*) FROM teams GROUP BY league_oid"))
+            for oid, name in connection.execute("SELECT oid, name FROM leagues ORDER BY position"):
+                database._index_league(League.deferred(oid, name, self))
+        finally:
+            connection.close()
+        return database
+
+    def team_count(self, league):
+        """
+        Returns the number of teams of a league whose contents have not been read yet.
+
+        :param league: The deferred league.
+        :return: The number of teams.
+        """
+        return self._team_counts.get(league.oid, 0)
+
+    def load_league_contents(self, league):
+        """
+        Reads the teams, members and competitions of a deferred league. Called by the league on first use.
+
+        :param league: The league to fill in.
+        """
+        connection = self._connect()
+        try:
+            key = (league.oid,)
+            teams = connection.execute(
+                "SELECT oid, name FROM teams WHERE league_oid = ? ORDER BY position", key).fetchall()
+            members = connection.execute(
+                "SELECT member_id, oid, name, email FROM members WHERE league_oid = ?", key).fetchall()
+            team_members = connection.execute(
+                "SELECT team_oid, member_id FROM team_members WHERE league_oid = ? ORDER BY team_oid, position",
+                key).fetchall()
+            competitions = connection.execute(
+                "SELECT oid, location, date_time FROM competitions WHERE league_oid = ? ORDER BY position",
+                key).fetchall()
+            competition_teams = connection.execute(
+                "SELECT competition_oid, team_oid FROM competition_teams WHERE league_oid = ? "
+                "ORDER BY competition_oid, position", key).fetchall()
+        finally:
+            connection.close()
+
+        members = {member_id: TeamMember(oid, name, email) for member_id, oid, name, email in members}
+        teams = {oid: Team(oid, name) for oid, name in teams}
+        for team_oid, member_id in team_members:
+            teams[team_oid].add_member(members[member_id])
+        for team in teams.values():
+            league._index_team(team)
+
+        competing = {}
+        for competition_oid, team_oid in competition_teams:
+            competing.setdefault(competition_oid, []).append(teams[team_oid])
+        for oid, location, date_time in competitions:
+            date_time = None if date_time is None else datetime.fromisoformat(date_time)
+            league._index_competition(Competition(oid, competing.get(oid, []), location, date_time))
+
+    def save(self, database):
+        """
+        Writes a database to the file in a single transaction, creating the file if needed.
+        Leagues whose contents were never read from this file keep their stored contents.
+
+        :param database: The LeagueDatabase to write.
+        """
+        connection = self._connect()
+        try:
+            connection.executescript(SCHEMA)
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                       (("schema_version", SCHEMA_VERSION), ("last_oid", database._last_oid)))
+                stored = {oid for oid, in connection.execute("SELECT oid FROM leagues")}
+                for oid in stored.difference(database._leagues):
+                    self._delete_league(connection, oid)
+                for position, league in enumerate(database.leagues):
+                    connection.execute("INSERT OR REPLACE INTO leagues (oid, position, name) VALUES (?, ?, ?)",
+                                       (league.oid, position, league.name))
+                    if league.oid in stored and self.holds(league):
+                        continue
+                    self._delete_league_contents(connection, league.oid)
+                    self._insert_league_contents(connection, league)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _delete_league_contents(connection, league_oid):
+        for table in CONTENT_TABLES:
+            connection.execute(f"DELETE FROM {table} WHERE league_oid = ?", (league_oid,))
+
+    def _delete_league(self, connection, league_oid):
+        connection.execute("DELETE FROM leagues WHERE oid = ?", (league_oid,))
+        self._delete_league_contents(connection, league_oid)
+
+    @staticmethod
+    def _insert_league_contents(connection, league):
+        league_oid = league.oid
+        member_ids = {}  # id(member) -> member_id, so a member on several teams is stored once
+        team_rows, member_rows, team_member_rows = [], [], []
+        for team_position, team in enumerate(league.iter_teams()):
+            team_rows.append((league_oid, team.oid, team_position, team.name))
+            for position, member in enumerate(team.iter_members()):
+                member_id = member_ids.get(id(member))
+                if member_id is None:
+                    member_id = member_ids[id(member)] = len(member_ids) + 1
+                    member_rows.append((league_oid, member_id, member.oid, member.name, member.email))
+                team_member_rows.append((league_oid, team.oid, position, member_id))
+
+        competition_rows, competition_team_rows = [], []
+        for competition_position, competition in enumerate(league.competitions):
+            date_time = competition.date_time
+            competition_rows.append((league_oid, competition.oid, competition_position, competition.location,
+                                     None if date_time is None else date_time.isoformat()))
+            for position, team in enumerate(competition.teams_competing):
+                competition_team_rows.append((league_oid, competition.oid, position, team.oid))
+
+        connection.executemany("INSERT INTO teams VALUES (?, ?, ?, ?)", team_rows)
+        connection.executemany("INSERT INTO members VALUES (?, ?, ?, ?, ?)", member_rows)
+        connection.executemany("INSERT INTO team_members VALUES (?, ?, ?, ?)", team_member_rows)
+        connection.executemany("INSERT INTO competitions VALUES (?, ?, ?, ?, ?)", competition_rows)
+        connection.executemany("INSERT INTO competition_teams VALUES (?, ?, ?, ?)", competition_team_rows)
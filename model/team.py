@@ -1,6 +1,15 @@
 from model.identified_object import IdentifiedObject
+from model.collection_view import CollectionView
+from model.name_index import NameIndex
+from model.oid_allocator import OidAllocator
 from model.custom_exceptions import DuplicateEmail,DuplicateOid
+from model.rw_lock import mutator, rebuild_index
+from model.schema import migration
+from model.team_member import TeamMember
 class Team(IdentifiedObject):
+    __slots__ = ("_name", "_members", "_member_emails", "_member_names", "_member_oids", "_leagues")
+    _INDEXES = frozenset(("_member_emails", "_member_names"))  # slots derived from _members (see _build_index)
+
     def __init__(self, oid, name):
         """
         Initializes a Team object with the specified OID and name.
@@ -9,8 +18,12 @@ class Team(IdentifiedObject):
         :param name: The name of the team.
         """
         super().__init__(oid)
-        self._members = []
-        self.name = name
+        self._members = {}  # oid -> member, kept in insertion order
+        self._member_emails = {}  # casefolded email -> member
+        self._member_names = NameIndex()
+        self._member_oids = OidAllocator(self._members)
+        self._leagues = []  # leagues this team belongs to, kept by League so its indexes follow our changes
+        self._name = name
 
     """
     A class representing a team.
@@ -25,6 +38,7 @@ class Team(IdentifiedObject):
         #[prop]
         return self._name
     @name.setter
+    @mutator
     def name(self, new_name):
         """
          Setter for the team name property.
@@ -32,19 +46,39 @@ class Team(IdentifiedObject):
          :param new_name: The new name for the team.
          """
         #[prop]
+        old_name = self._name
+        self._name = new_name
+        for league in self._leagues:
+            league._team_renamed(self, old_name)
+        self._changed("team.set", "name", new_name)
+
+    def _batched_name(self, batch, new_name):
+        # the name setter inside a batch: the leagues' name indexes are rebuilt when it ends (see model.batch)
+        batch.undo(setattr, self, "_name", self._name)
         self._name = new_name
+        for league in self._leagues:
+            batch.stale(league, ("_team_names",))
+        batch.team_changed(self, "team.set", "name", new_name)
 
     @property
     def members(self):
         """
         Read-only property representing the list of team members.
 
-        :return: List of team members.
+        :return: A read-only view of the team members (not a copy).
         """
         #[r/o prop] -- list of team members
-        # return all members to the caller
-        return self._members[:]
+        # return a live, read-only view so callers never pay for a copy
+        return CollectionView(self._members)
+
+    def iter_members(self):
+        """
+        Iterates over the team members without allocating a view or a copy.
+        The team must not be modified while the iteration is in progress.
 
+        :return: An iterator over the team members.
+        """
+        return iter(self._members.values())
 
 
     def __str__(self):
@@ -54,8 +88,160 @@ class Team(IdentifiedObject):
         :return: A string representation of the team.
         """
         #  return a string like the following: "Team Name: N members"
-        return f"Team {self.name}: {len(self.members)} members"
+        return f"Team {self.name}: {len(self._members)} members"
+
+    def _holding_databases(self):
+        """
+        Returns the databases whose locks guard this team (see model.rw_lock).
+
+        :return: A list of databases.
+        """
+        return [database for league in self._leagues for database in league._databases]
+
+    def __getattr__(self, name):
+        """
+        Rebuilds an index left out of date by a batch in progress the first time it is
+        read (see model.batch). Only called for attributes that are not set.
+
+        :param name: The name of the attribute.
+        :return: The attribute value.
+        """
+        if name not in Team._INDEXES:
+            raise AttributeError(name)
+        return rebuild_index(self, name)
+
+    def _build_index(self, name, check):
+        """
+        Builds one of the indexes derived from the members, in member order.
+
+        :param name: "_member_emails" or "_member_names".
+        :param check: If True, raises DuplicateEmail for an address used by two members.
+        :return: The new index.
+        """
+        if name == "_member_names":
+            index = NameIndex()
+            index.add_all(self._members.values())
+            return index
+        index = {}
+        for member in self._members.values():
+            email_key = self._email_key(member.email)
+            if email_key is not None:
+                if check and email_key in index:
+                    raise DuplicateEmail(member.email)
+                index[email_key] = member
+        return index
+
+    def _changed(self, op, *args):
+        """
+        Reports a change to this team or one of its members to the leagues holding it.
+
+        :param op: The kind of change, e.g. "member.add".
+        :param args: The details of the change; this team's oid is put in front of them.
+        """
+        for league in self._leagues:
+            league._changed(op, self.oid, *args)
+
+    @staticmethod
+    def _email_key(email):
+        """
+        Returns the key used to index an email address, or None if the address is not indexed.
+
+        :param email: The email address.
+        :return: The casefolded email address or None.
+        """
+        return None if email is None else email.casefold()
+
+    def _index_member(self, member):
+        """
+        Records the member in the oid and email indexes and registers this team with the member.
+
+        :param member: The member to index.
+        """
+        self._members[member.oid] = member
+        self._member_oids.claim(member.oid)
+        email_key = self._email_key(member.email)
+        if email_key is not None:
+            self._member_emails[email_key] = member
+        self._member_names.add(member.name, member)
+        teams = getattr(member, "_teams", ())
+        if not any(team is self for team in teams):
+            member._teams = teams + (self,)
+
+    @classmethod
+    def _with_members(cls, oid, name, members):
+        """
+        Creates a team holding new members built from their values, without checking
+        them against each other. Used for teams whose members were checked already, such
+        as those a roster import worker sends back (see model.roster_import).
+
+        :param oid: The unique identifier of the team.
+        :param name: The name of the team.
+        :param members: (oid, name, email) tuples with distinct oids and emails.
+        :return: The new team.
+        """
+        team = cls(oid, name)
+        members = [TeamMember(*values) for values in members]
+        team._members.update({member.oid: member for member in members})
+        email_key = cls._email_key
+        team._member_emails.update({email_key(member.email): member for member in members
+                                    if member.email is not None})
+        team._member_names.add_all(members)
+        teams = (team,)
+        for member in members:
+            member._teams = teams
+        return team
+
+    def check_email_available(self, email, member=None):
+        """
+        Raises DuplicateEmail if another member of this team already uses the email address.
+
+        :param email: The email address to check (case-insensitive).
+        :param member: Optional. A member that is allowed to hold the address (e.g. the member being updated).
+        :raises DuplicateEmail: If the email address is used by another member.
+        """
+        email_key = self._email_key(email)
+        if email_key is None:
+            return
+        owner = self._member_emails.get(email_key)
+        if owner is not None and owner is not member:
+            raise DuplicateEmail(email)
+
+    def _member_email_changed(self, member, old_email):
+        """
+        Moves the member's entry in the email index after its email address changed.
+
+        :param member: The member whose email changed.
+        :param old_email: The email address the member had before the change.
+        """
+        old_key = self._email_key(old_email)
+        if old_key is not None and self._member_emails.get(old_key) is member:
+            del self._member_emails[old_key]
+        new_key = self._email_key(member.email)
+        if new_key is not None:
+            self._member_emails[new_key] = member
+        self._changed("member.set", member.oid, "email", member.email)
+
+    def member_with_email(self, email):
+        """
+        Retrieves the member of this team whose email address equals email (case-insensitive).
+
+        :param email: The email address to look up.
+        :return: The member using the address or None if no such member exists.
+        """
+        email_key = self._email_key(email)
+        return None if email_key is None else self._member_emails.get(email_key)
 
+    def _member_renamed(self, member, old_name):
+        """
+        Moves the member's entry in the name index after its name changed.
+
+        :param member: The member whose name changed.
+        :param old_name: The name the member had before the change.
+        """
+        self._member_names.rename(old_name, member.name, member)
+        self._changed("member.set", member.oid, "name", member.name)
+
+    @mutator
     def add_member(self, member):
         """
         Adds a member to the team unless they are already a member.
@@ -67,29 +253,70 @@ class Team(IdentifiedObject):
         #ignore request to add team member that is already in members
         if member is None:
             return
-        if member not in self.members:
-            email_values = [_member.email.lower() for _member in self._members[:]]
-            if member.email == None or not member.email.lower() in email_values:
-                self._members.append(member)
-            else:
-                raise DuplicateEmail(member.email)
-        else:
+        if member.oid in self._members:
             raise DuplicateOid(member.oid)
+        self.check_email_available(member.email)
+        self._index_member(member)
+        for league in self._leagues:
+            league._member_added(self, member)
+        self._changed("member.add", member)
+
+    def _batched_add_member(self, batch, member):
+        # add_member inside a batch: the email is checked and the indexes rebuilt when it ends (see model.batch)
+        if member is None:
+            return
+        if member.oid in self._members:
+            raise DuplicateOid(member.oid)
+        self._members[member.oid] = member
+        teams = getattr(member, "_teams", ())
+        batch.undo(self._unbatch_add_member, member, teams, self._member_oids.claim(member.oid))
+        for team in teams:
+            if team is self:
+                break
+        else:
+            member._teams = teams + (self,)
+        batch.stale(self, ("_member_emails", "_member_names"))
+        for league in self._leagues:
+            batch.stale(league, ("_member_teams",))
+        batch.team_changed(self, "member.add", member)
+
+    def _unbatch_add_member(self, member, teams, reserved):
+        # undoes _batched_add_member
+        del self._members[member.oid]
+        self._member_oids.unclaim(member.oid, reserved)
+        member._teams = teams
 
     def find_free_member_oid(self):
-        # gather the used oid's in the collection of members.
-        used_oids = {member.oid for member in self._members}
+        # return the smallest oid not used by a member of this team
+        return self._member_oids.peek()
+
+    @mutator
+    def reserve_member_oids(self, count):
+        """
+        Reserves free member oids for a bulk insert. Oids that end up unused must be
+        handed back with release_member_oid.
+
+        :param count: The number of oids to reserve.
+        :return: A list of the reserved oids in ascending order.
+        """
+        return self._member_oids.reserve_block(count)
+
+    def _batched_reserve_member_oids(self, batch, count):
+        oids = self._member_oids.reserve_block(count)
+        batch.undo(self._member_oids.release_block, oids)
+        return oids
 
-        # Start with oid 1 and count up to the length of the number of teams
-        # in the list. If there are 4 teams, and there are oid gaps, at least
-        # one oid will be missing. So, the algorithm will return the missing oid.
+    @mutator
+    def release_member_oid(self, oid):
+        """
+        Hands back a member oid reserved with reserve_member_oids that was not used.
+
+        :param oid: The oid to release.
+        """
+        self._member_oids.release(oid)
 
-        # If there are no gaps, we allow an additional couple of indexes
-        # and will select the oid that exceeds the last known oid.
-        for oid in range(1, len(self._members) + 2):
-            if oid not in used_oids:
-                return oid
-        return None  # If no free oid is found
+    def _batched_release_member_oid(self, batch, oid):
+        batch.undo(self._member_oids.unrelease, oid, self._member_oids.release(oid))
 
     def member_named(self, s):
         """
@@ -99,12 +326,10 @@ class Team(IdentifiedObject):
         :return: The member with the specified name or None if not found.
         """
         #return the member of this team whose name equals s (case sensitive) or None if no such member exists
-        for member in self.members:
-            if member.name == s:
-                return member
-                break
+        return self._member_names.first(s)
 
 
+    @mutator
     def remove_member(self, member):
         """
         Removes the specified member from this team.
@@ -112,22 +337,69 @@ class Team(IdentifiedObject):
         :param member: The member to remove.
         """
         #remove the specified member from this team
-        if member in self._members:
-            self._members.remove(member)
+        if member is None:
+            return
+        removed = self._members.pop(member.oid, None)
+        if removed is None:
+            return
+        email_key = self._email_key(removed.email)
+        if email_key is not None and self._member_emails.get(email_key) is removed:
+            del self._member_emails[email_key]
+        self._member_names.discard(removed.name, removed)
+        self._member_oids.release(removed.oid)
+        removed._teams = tuple(team for team in removed._teams if team is not self)
+        for league in self._leagues:
+            league._member_removed(self, removed)
+        self._changed("member.remove", removed.oid)
+
+    def _batched_remove_member(self, batch, member):
+        # remove_member inside a batch: the indexes are rebuilt when it ends (see model.batch)
+        if member is None or member.oid not in self._members:
+            return
+        batch.keep_order(self._members)
+        removed = self._members.pop(member.oid)
+        self._member_oids.release(removed.oid)
+        batch.undo(self._unbatch_remove_member, removed, removed._teams)
+        removed._teams = tuple(team for team in removed._teams if team is not self)
+        batch.orphan((removed,))
+        batch.stale(self, ("_member_emails", "_member_names"))
+        for league in self._leagues:
+            batch.stale(league, ("_member_teams",))
+        batch.team_changed(self, "member.remove", removed.oid)
+
+    def _unbatch_remove_member(self, member, teams):
+        # undoes _batched_remove_member; the batch puts the member back in its place in _members afterwards
+        self._members[member.oid] = member
+        member._teams = teams
 
     def send_email(self, emailer, subject, message):
         """
         Sends an email to all members of the team.
 
-        :param emailer: The emailer object used to send the email.
+        :param emailer: The emailer object used to send the email (an EmailOutbox returns at once).
         :param subject: The subject of the email.
         :param message: The message content of the email.
+        :return: What the emailer returns (a DeliveryResult, or an OutgoingEmail from an outbox).
         """
         # use the emailer argument to send an email to all members of a team except those whose email address is None.
         # This method should send a single email so if the team has N members, the recipient list will have N elements.
         recipient_list = []
-        for member in self.members:
+        for member in self._members.values():
             if member.email is not None:
                 recipient_list.append(member.email)
 
-        emailer.send_plain_email(recipient_list, subject, message)
+        return emailer.send_plain_email(recipient_list, subject, message)
+
+
+@migration("Team", 1)
+def _key_members_by_oid(team, state):
+    # teams pickled before the member indexes existed stored their members as a plain list
+    members = state["_members"]
+    if isinstance(members, list):
+        state["_members"] = team._members = {}
+        state["_member_emails"] = team._member_emails = {}
+        state["_member_names"] = team._member_names = NameIndex()
+        state["_member_oids"] = team._member_oids = OidAllocator(team._members)
+        state["_leagues"] = team._leagues = []
+        for member in members:
+            team._index_member(member)
@@ -1,34 +1,80 @@
 from model.identified_object import IdentifiedObject
+from model.rw_lock import mutator
 class TeamMember(IdentifiedObject):
+    __slots__ = ("_name", "_email", "_teams")
 
     def __init__(self, oid, name, email):
         # initialization method that sets the oid, name and email properties as specified in the arguments (note: should call superclass constructor)
         super().__init__(oid)
         self._name = name
         self._email = email
+        self._teams = ()  # teams this member belongs to, kept by Team so its indexes follow our changes
+
+    def _holding_databases(self):
+        # the databases whose locks guard this member (see model.rw_lock)
+        return [database for team in getattr(self, "_teams", ()) for league in team._leagues
+                for database in league._databases]
 
     @property
     def name(self):
         #[prop]
         return self._name
     @name.setter
+    @mutator
     def name(self, new_name):
         # [prop]
+        old_name = self._name
+        self._name = new_name
+        for team in getattr(self, "_teams", ()):
+            team._member_renamed(self, old_name)
+
+    def _batched_name(self, batch, new_name):
+        # the name setter inside a batch: the teams' name indexes are rebuilt when it ends (see model.batch)
+        batch.undo(setattr, self, "_name", self._name)
         self._name = new_name
+        for team in self._teams:
+            batch.stale(team, ("_member_names",))
+            batch.team_changed(team, "member.set", self.oid, "name", new_name)
+
     @property
     def email(self):
         return self._email
 
+    def check_email_available(self, email):
+        """
+        Raises DuplicateEmail if another member of any team this member plays on already uses the email address.
+
+        :param email: The email address to check (case-insensitive).
+        :raises DuplicateEmail: If the email address is used by another member.
+        """
+        for team in getattr(self, "_teams", ()):
+            team.check_email_available(email, self)
+
     @email.setter
+    @mutator
     def email(self, new_email):
+        # every team this member plays on must accept the new address before any index is touched
+        self.check_email_available(new_email)
+        teams = getattr(self, "_teams", ())
+        old_email = self._email
+        self._email = new_email
+        for team in teams:
+            team._member_email_changed(self, old_email)
+
+    def _batched_email(self, batch, new_email):
+        # the email setter inside a batch: the teams check the address when it ends (see model.batch)
+        batch.undo(setattr, self, "_email", self._email)
         self._email = new_email
+        for team in self._teams:
+            batch.stale(team, ("_member_emails",))
+            batch.team_changed(team, "member.set", self.oid, "email", new_email)
 
 
 
 
     def send_email(self, emailer, subject, message):
         # use the emailer argument to send an email to to this member
-        emailer.send_plain_email([self.email], subject, message)
+        return emailer.send_plain_email([self.email], subject, message)
 
     def __str__(self):
         # return a string like the following: "Name<Email>"
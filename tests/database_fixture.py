@@ -0,0 +1,64 @@
+import io
+import tempfile
+import unittest
+from datetime import datetime
+from model.competition import Competition
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.team import Team
+from model.team_member import TeamMember
+
+
+def build_database():
+    """
+    Builds the sample database the storage tests save and read back: Bedrock League,
+    where Barney plays on both Stones and Brooms and the second competition has no
+    location or date, and Slaté League, whose name is not ASCII and whose Stones
+    shares its name with a Bedrock team. The last oid handed out is 1.
+    """
+    db = LeagueDatabase()
+    db.next_oid()
+    bedrock = League(1, "Bedrock League")
+    stones = Team(1, "Stones")
+    brooms = Team(2, "Brooms")
+    barney = TeamMember(2, "Barney", "barney@bedrock")
+    stones.add_member(TeamMember(1, "Fred", "fred@bedrock"))
+    stones.add_member(barney)
+    brooms.add_member(TeamMember(1, "Wilma", "wilma@bedrock"))
+    brooms.add_member(barney)
+    bedrock.add_team(stones)
+    bedrock.add_team(brooms)
+    bedrock.add_competition(Competition(1, [stones, brooms], "Rink", datetime(2024, 3, 30, 18, 0)))
+    bedrock.add_competition(Competition(2, [brooms, stones], None, None))
+    db.add_league(bedrock)
+    slate = League(2, "Slaté League")
+    slate.add_team(Team(1, "Gravel"))
+    slate.add_team(Team(2, "Stones"))
+    db.add_league(slate)
+    return db
+
+
+def contents(db):
+    """
+    Exports every league of a database; the whole-league export lists every team,
+    member and competition with its oid, so equal exports mean equal databases.
+    """
+    contents = []
+    for league in db.leagues:
+        stream = io.BytesIO()
+        db.export_league(league, stream)
+        contents.append(stream.getvalue())
+    return contents
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Gives each test a temporary directory and puts the sole LeagueDatabase back afterwards.
+    """
+    def setUp(self):
+        self.current = LeagueDatabase._sole_instance
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        LeagueDatabase._sole_instance = self.current
+        self.directory.cleanup()
@@ -0,0 +1,56 @@
+import smtplib
+import threading
+import time
+
+
+class FakeSmtp:
+    """
+    Stands in for a logged-in smtplib.SMTP connection and records what is sent through it.
+    """
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+
+    def sendmail(self, sender, recipients, data):
+        server = self.server
+        with server.lock:
+            server.sending += 1
+            server.most_sending = max(server.most_sending, server.sending)
+        try:
+            time.sleep(server.delay)
+            with server.lock:
+                if server.drop_next:
+                    server.drop_next -= 1
+                    raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+                refused = {recipient: (550, b"No such user") for recipient in recipients
+                           if recipient in server.unknown}
+                if len(refused) == len(recipients):
+                    raise smtplib.SMTPRecipientsRefused(refused)
+                server.sent.append((self, sender, list(recipients), data))
+                server.sent_times.append(time.monotonic())
+            return refused
+        finally:
+            with server.lock:
+                server.sending -= 1
+
+    def quit(self):
+        self.closed = True
+
+
+class FakeServer:
+    def __init__(self, unknown=(), delay=0.0):
+        self.unknown = set(unknown)
+        self.delay = delay  # seconds each sendmail takes
+        self.drop_next = 0
+        self.connections = []
+        self.sent = []
+        self.sent_times = []
+        self.sending = 0
+        self.most_sending = 0  # the most sendmail calls in progress at once
+        self.lock = threading.Lock()
+
+    def connect(self):
+        connection = FakeSmtp(self)
+        with self.lock:
+            self.connections.append(connection)
+        return connection
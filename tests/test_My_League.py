@@ -4,6 +4,8 @@ from model.league import League
 from model.team import Team
 from model.team_member import TeamMember
 import datetime
+from model.custom_exceptions import DuplicateOid
+from model import schema
 class TestLeague(unittest.TestCase):
     def test_create(self):
         league = League(1, "AL State Curling League")
@@ -77,6 +79,18 @@ class TestLeague(unittest.TestCase):
             league.add_competition(c)
         return league
 
+    def test_unpickles_list_based_league(self):
+        # leagues saved before the collections were keyed by oid kept plain lists
+        t1 = Team(1, "t1")
+        c1 = Competition(1, [t1, t1], "Here", None)
+        league = League.__new__(League)
+        with schema.reading(schema.FIRST_VERSION):
+            league.__setstate__({"_oid": 1, "_name": "Old league", "_teams": [t1], "_competitions": [c1]})
+        self.assertEqual([t1], league.teams)
+        self.assertIn(c1, league.competitions)
+        with self.assertRaises(DuplicateOid):
+            league.add_team(Team(1, "t1 again"))
+
     def test_team_named(self):
         league = self.build_league()
         t = league.team_named("t1")
@@ -86,6 +100,48 @@ class TestLeague(unittest.TestCase):
         t = league.team_named("bogus")
         self.assertIsNone(t)
 
+    def test_team_named_follows_renames(self):
+        league = self.build_league()
+        t1 = league.team_named("t1")
+        t1.name = "renamed"
+        self.assertIsNone(league.team_named("t1"))
+        self.assertIs(t1, league.team_named("renamed"))
+
+        # a removed team no longer updates the league's index
+        t4 = Team(4, "t4")
+        league.add_team(t4)
+        league.remove_team(t4)
+        t4.name = "t5"
+        self.assertIsNone(league.team_named("t4"))
+        self.assertIsNone(league.team_named("t5"))
+
+    def test_reverse_indexes_follow_membership_changes(self):
+        league = self.build_league()
+        t1 = league.team_named("t1")
+        t3 = league.team_named("t3")
+        fred = t1.member_named("Fred")
+        self.assertEqual([t1], league.teams_for_member(fred))
+
+        # joining a team that is already in the league updates the indexes
+        t3.add_member(fred)
+        self.assertEqual({t1, t3}, set(league.teams_for_member(fred)))
+        self.assertEqual(6, len(league.competitions_for_member(fred)))
+
+        t1.remove_member(fred)
+        self.assertEqual([t3], league.teams_for_member(fred))
+        self.assertEqual({"t3 vs t1", "t3 vs t2", "t2 vs t3", "t1 vs t3"},
+                         {c.location for c in league.competitions_for_member(fred)})
+
+        # a team that never played can be removed, and its members leave the index with it
+        t4 = Team(4, "t4")
+        dino = TeamMember(9, "Dino", "dino@bedrock")
+        t4.add_member(dino)
+        league.add_team(t4)
+        self.assertEqual([t4], league.teams_for_member(dino))
+        self.assertEqual([], league.competitions_for_team(t4))
+        league.remove_team(t4)
+        self.assertEqual([], league.teams_for_member(dino))
+
     def test_big_league(self):
         league = self.build_league()
         t = league.teams[0]
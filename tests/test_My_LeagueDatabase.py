@@ -1,6 +1,7 @@
 import unittest
 import random
 import os
+import pickle
 from model.league import League
 from model.team import Team
 from model.team_member import TeamMember
@@ -130,11 +131,47 @@ class TestLeagueDatabase(unittest.TestCase):
 
 
 
+    def test_league_named_follows_renames(self):
+        test_league = TestLeagueDatabase.build_league(3)
+        self.db.add_league(test_league)
+        test_league.name = "Renamed league"
+        self.assertIsNone(self.db.league_named("Some league"))
+        self.assertIs(test_league, self.db.league_named("Renamed league"))
+        self.db.remove_league(test_league)
+        self.assertIsNone(self.db.league_named("Renamed league"))
+        self.db = None
+
+    def test_loads_database_pickled_before_slots(self):
+        legacy_file = os.path.join(os.path.dirname(__file__), "data", "legacy_league_db.pkl")
+        current = LeagueDatabase._sole_instance
+        try:
+            self.assertTrue(self.db.load(legacy_file))
+            loaded = LeagueDatabase.instance()
+            league = loaded.league_named("Legacy league")
+            stones = league.team_named("Stones")
+            fred = stones.member_named("Fred")
+            self.assertEqual("fred@bedrock", fred.email)
+            barney = stones.member_named("Barney")
+            self.assertEqual([stones], league.teams_for_member(barney))
+            self.assertEqual(1, len(league.competitions_for_team(stones)))
+            self.assertEqual(2, loaded.find_free_league_oid())
+            self.assertEqual(3, stones.find_free_member_oid())
+            self.assertFalse(hasattr(fred, "__dict__"))
+
+            # the restored objects pickle again in the current layout
+            restored = pickle.loads(pickle.dumps(loaded))
+            fred = restored.league_named("Legacy league").team_named("Stones").member_named("Fred")
+            fred.email = "fred@slate.com"
+            self.assertEqual("fred@slate.com", fred.email)
+        finally:
+            LeagueDatabase._sole_instance = current
+
     def test_load_database_when_file_does_not_exist(self):
         if os.path.exists("d:\\test_db.pkl"):
             os.remove("d:\\test_db.pkl")
         new_db = LeagueDatabase.instance()
-        new_db.load("test_db.pkl")
+        self.assertFalse(new_db.load("test_db.pkl"))
+        self.assertIs(new_db, LeagueDatabase.instance())
 
     def test_import_export_teams(self):
         test_league = TestLeagueDatabase.build_league(3)
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from model.autosave import AutosaveService
+from model.competition import Competition
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.team import Team
+from model.team_member import TeamMember
+
+
+class TestDirtyTracking(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, "leagues.pkl")
+        self.db = LeagueDatabase()
+        self.bedrock = League(1, "Bedrock League")
+        self.slate = League(2, "Slate League")
+        self.stones = Team(1, "Stones")
+        self.brooms = Team(2, "Brooms")
+        self.fred = TeamMember(1, "Fred", "fred@bedrock")
+        self.stones.add_member(self.fred)
+        self.bedrock.add_team(self.stones)
+        self.bedrock.add_team(self.brooms)
+        self.game = Competition(1, [self.stones, self.brooms], "Rink", None)
+        self.bedrock.add_competition(self.game)
+        self.db.add_league(self.bedrock)
+        self.db.add_league(self.slate)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_mutations_mark_their_league_dirty(self):
+        self.assertTrue(self.db.is_dirty)
+        self.assertTrue(self.db.save(self.file_name))
+        self.assertFalse(self.db.is_dirty)
+        mutations = [
+            lambda: setattr(self.bedrock, "name", "Bedrock"),
+            lambda: setattr(self.stones, "name", "Rolling Stones"),
+            lambda: setattr(self.fred, "name", "Fred F."),
+            lambda: setattr(self.fred, "email", "fred@slate"),
+            lambda: setattr(self.game, "location", "Quarry"),
+            lambda: setattr(self.game, "date_time", datetime(2024, 3, 30)),
+            lambda: self.brooms.add_member(TeamMember(1, "Wilma", "wilma@bedrock")),
+            lambda: self.brooms.remove_member(self.brooms.member_named("Wilma")),
+            lambda: self.bedrock.add_team(Team(3, "Pebbles")),
+            lambda: self.bedrock.remove_team(self.bedrock.team_named("Pebbles")),
+        ]
+        for mutate in mutations:
+            mutate()
+            self.assertEqual([self.bedrock], self.db.dirty_leagues)
+            self.db.save(self.file_name)
+            self.assertFalse(self.db.is_dirty)
+
+        self.db.remove_league(self.slate)
+        self.assertTrue(self.db.is_dirty)
+
+    def test_save_without_changes_writes_nothing(self):
+        self.db.save(self.file_name)
+        modified = os.stat(self.file_name).st_mtime_ns
+        self.assertTrue(self.db.save(self.file_name))
+        self.assertEqual(modified, os.stat(self.file_name).st_mtime_ns)
+        self.assertFalse(os.path.exists(self.file_name + ".backup1"))
+
+        other = os.path.join(self.directory.name, "other.pkl")
+        self.db.save(other)
+        self.assertTrue(os.path.exists(other))
+
+    def test_loaded_database_is_clean(self):
+        self.db.save(self.file_name)
+        self.assertFalse(LeagueDatabase.read(self.file_name).is_dirty)
+
+
+class TestAutosaveService(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, "leagues.pkl")
+        self.db = LeagueDatabase()
+        self.db.save(self.file_name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def saved_league_names(self):
+        return [league.name for league in LeagueDatabase.read(self.file_name).leagues]
+
+    def test_saves_after_changes_stop(self):
+        service = AutosaveService(self.db, self.file_name, delay=0.05)
+        service.start()
+        try:
+            self.db.add_league(League(1, "Bedrock League"))
+            self.assertTrue(self.wait_for(lambda: service.saves == 1))
+            self.assertEqual(["Bedrock League"], self.saved_league_names())
+            self.assertFalse(self.db.is_dirty)
+        finally:
+            service.stop()
+
+    def test_waits_for_a_quiet_period(self):
+        service = AutosaveService(self.db, self.file_name, delay=0.1)
+        service.start()
+        try:
+            for oid in range(1, 11):
+                self.db.add_league(League(oid, f"League {oid}"))
+                time.sleep(0.02)
+            self.assertEqual(0, service.saves)
+            self.assertTrue(self.wait_for(lambda: service.saves == 1))
+            self.assertEqual(10, len(self.saved_league_names()))
+        finally:
+            service.stop()
+
+    def test_stop_flushes_pending_changes(self):
+        service = AutosaveService(self.db, self.file_name, delay=60)
+        service.start()
+        self.db.add_league(League(1, "Bedrock League"))
+        self.assertTrue(service.stop())
+        self.assertFalse(service.running)
+        self.assertEqual(["Bedrock League"], self.saved_league_names())
+
+
+if __name__ == '__main__':
+    unittest.main()
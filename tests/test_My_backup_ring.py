@@ -0,0 +1,85 @@
+import os
+import unittest
+from unittest import mock
+from model.backup_ring import BackupRing
+from model.league import League
+from model.league_database import LeagueDatabase
+from tests.database_fixture import DatabaseTestCase
+
+
+class TestBackupRing(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_name = os.path.join(self.directory.name, "leagues.pkl")
+
+    def save_versions(self, db, count):
+        # each save adds a league, so version n holds n leagues
+        for oid in range(len(db.leagues) + 1, len(db.leagues) + count + 1):
+            db.add_league(League(oid, f"League {oid}"))
+            db.save(self.file_name)
+
+    def loaded_league_count(self):
+        return len(LeagueDatabase.instance().leagues)
+
+    def test_ring_keeps_a_bounded_number_of_backups(self):
+        db = LeagueDatabase()
+        db.backup_generations = 3
+        self.save_versions(db, 7)
+        self.assertEqual(["leagues.pkl", "leagues.pkl.backup1", "leagues.pkl.backup2", "leagues.pkl.backup3",
+                          "leagues.pkl.backups"], sorted(os.listdir(self.directory.name)))
+        backups = BackupRing(self.file_name).backups()
+        self.assertEqual(3, len(backups))
+        self.assertEqual([6, 5, 4], [len(LeagueDatabase._read_pickle(*backup).leagues) for backup in backups])
+
+        LeagueDatabase().load_backup(self.file_name)
+        self.assertEqual(6, self.loaded_league_count())
+
+    def test_compressed_backups(self):
+        for compression, suffix in (("gzip", ".gz"), ("lzma", ".xz")):
+            with self.subTest(compression=compression):
+                db = LeagueDatabase()
+                db.backup_compression = compression
+                self.save_versions(db, 3)
+                self.assertTrue(all(name.endswith(suffix) for name, _, _ in BackupRing(self.file_name).backups()))
+                LeagueDatabase().load_backup(self.file_name)
+                self.assertEqual(2, self.loaded_league_count())
+                for name in os.listdir(self.directory.name):
+                    os.unlink(os.path.join(self.directory.name, name))
+
+    def test_damaged_file_falls_back_to_newest_intact_backup(self):
+        db = LeagueDatabase()
+        self.save_versions(db, 3)
+        newest_backup = BackupRing(self.file_name).backups()[0][0]
+        for damaged, expected in ((self.file_name, 2), (newest_backup, 1)):
+            with open(damaged, "r+b") as file:
+                file.seek(-3, os.SEEK_END)
+                file.write(b"\xff")
+            LeagueDatabase().load(self.file_name)
+            self.assertEqual(expected, self.loaded_league_count())
+
+    def test_failed_save_leaves_previous_file(self):
+        db = LeagueDatabase()
+        self.save_versions(db, 2)
+        files = sorted(os.listdir(self.directory.name))
+
+        def crash(database, file):
+            file.write(b"partial")
+            raise OSError("disk full")
+
+        db.add_league(League(3, "League 3"))
+        with mock.patch("model.league_database.write_sections", side_effect=crash):
+            db.save(self.file_name)
+        self.assertEqual(files, sorted(os.listdir(self.directory.name)))
+        LeagueDatabase().load(self.file_name)
+        self.assertEqual(2, self.loaded_league_count())
+
+    def test_backup_settings_are_validated(self):
+        db = LeagueDatabase()
+        with self.assertRaises(ValueError):
+            db.backup_generations = -1
+        with self.assertRaises(ValueError):
+            db.backup_compression = "zip"
+
+
+if __name__ == '__main__':
+    unittest.main()
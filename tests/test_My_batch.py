@@ -0,0 +1,170 @@
+import os
+import threading
+import unittest
+from model.change_journal import read_records
+from model.custom_exceptions import DuplicateEmail
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.team import Team
+from model.team_member import TeamMember
+from tests.database_fixture import DatabaseTestCase, build_database, contents
+
+
+class TestBatch(DatabaseTestCase):
+    def test_bookkeeping_waits_for_the_end_of_the_batch(self):
+        db = build_database()
+        db.save(os.path.join(self.directory.name, "leagues.pkl"))
+        count = db.change_count
+        stones = db.league_named("Bedrock League").team_named("Stones")
+        with db.batch() as batch:
+            stones.add_member(TeamMember(3, "Dino", "dino@bedrock"))
+            stones.name = "Stones United"
+            # the changes are visible inside the batch, the bookkeeping is not
+            self.assertIsNotNone(stones.member_with_email("dino@bedrock"))
+            self.assertEqual(2, batch.changes)
+            self.assertFalse(db.is_dirty)
+            self.assertEqual(count, db.change_count)
+        self.assertTrue(db.is_dirty)
+        self.assertEqual(count + 2, db.change_count)
+        self.assertIs(stones, db.league_named("Bedrock League").team_named("Stones United"))
+
+    def test_error_rolls_back_every_change(self):
+        db = build_database()
+        db.save(os.path.join(self.directory.name, "leagues.pkl"))
+        before = contents(db)
+        bedrock = db.league_named("Bedrock League")
+        stones = bedrock.team_named("Stones")
+        brooms = bedrock.team_named("Brooms")
+        fred = stones.member_named("Fred")
+        fred_teams = bedrock.teams_for_member(fred)
+        count = db.change_count
+
+        with self.assertRaises(DuplicateEmail):
+            with db.batch():
+                dino = TeamMember(3, "Dino", "dino@bedrock")
+                stones.add_member(dino)
+                brooms.add_member(dino)
+                stones.remove_member(fred)
+                fred.email = "fred@slate.com"
+                brooms.name = "Brooms FC"
+                bedrock.competitions[0].location = "Quarry"
+                bedrock.add_team(Team(3, "Gravel"))
+                db.next_oid()
+                db.add_league(League(3, "Granite League"))
+                stones.add_member(TeamMember(4, "Betty", "wilma@bedrock"))
+                brooms.add_member(TeamMember(5, "Pebbles", "dino@bedrock"))  # raises when the batch ends
+
+        self.assertEqual(before, contents(db))
+        self.assertFalse(db.is_dirty)
+        self.assertEqual(count, db.change_count)
+        self.assertEqual(2, db.next_oid())
+        self.assertIsNone(db.league_named("Granite League"))
+        # the objects are the same ones, with their indexes and back-references restored
+        self.assertIs(stones, bedrock.team_named("Stones"))
+        self.assertIs(fred, stones.member_with_email("fred@bedrock"))
+        self.assertEqual(fred_teams, bedrock.teams_for_member(fred))
+        self.assertIsNone(bedrock.team_named("Gravel"))
+        self.assertEqual((), dino._teams)
+        self.assertIsNone(brooms.member_with_email("dino@bedrock"))
+        self.assertEqual([bedrock], stones._leagues)
+        self.assertEqual([db], bedrock._databases)
+
+        # the rolled back database works as before
+        stones.add_member(TeamMember(3, "Dino", "dino@bedrock"))
+        self.assertTrue(db.is_dirty)
+
+    def test_emails_are_checked_when_the_batch_ends(self):
+        db = build_database()
+        stones = db.league_named("Bedrock League").team_named("Stones")
+        fred = stones.member_named("Fred")
+        with db.batch():
+            # a clash that the batch clears up before it ends is not an error
+            dino = TeamMember(3, "Dino", "fred@bedrock")
+            stones.add_member(dino)
+            fred.email = "fred@slate.com"
+            self.assertIs(dino, stones.member_with_email("fred@bedrock"))
+            self.assertIs(fred, stones.member_named("Fred"))
+        self.assertIs(dino, stones.member_with_email("FRED@bedrock"))
+        self.assertIs(fred, stones.member_with_email("fred@slate.com"))
+
+    def test_nested_batch_is_part_of_the_outer_one(self):
+        db = build_database()
+        stones = db.league_named("Bedrock League").team_named("Stones")
+        with self.assertRaises(ValueError):
+            with db.batch() as outer:
+                with db.batch() as inner:
+                    self.assertIs(outer, inner)
+                    stones.name = "Stones United"
+                raise ValueError("stop")
+        self.assertEqual("Stones", stones.name)
+
+    def test_batch_is_journaled_when_it_commits(self):
+        file_name = os.path.join(self.directory.name, "leagues.pkl")
+        db = build_database()
+        db.journal_mode = True
+        db.save(file_name)
+        bedrock = db.league_named("Bedrock League")
+        with db.batch():
+            for oid in range(3, 13):
+                bedrock.team_named("Brooms").add_member(TeamMember(oid, f"Member {oid}", f"m{oid}@bedrock"))
+            bedrock.team_named("Stones").member_named("Fred").email = "fred@slate.com"
+        with self.assertRaises(KeyError):
+            with db.batch():
+                bedrock.team_named("Stones").name = "Lost"
+                raise KeyError("stop")
+        db.save(file_name)
+        records = list(read_records(file_name, db._journal_generation))
+        self.assertEqual(["batch"], [record[0] for record in records])
+        self.assertEqual(11, len(records[0][1]))
+
+        LeagueDatabase().load(file_name)
+        self.assertEqual(contents(db), contents(LeagueDatabase.instance()))
+
+    def test_rollback_of_a_deferred_league(self):
+        file_name = os.path.join(self.directory.name, "leagues.sqlite")
+        build_database().save(file_name)
+        db = LeagueDatabase.read(file_name)
+        bedrock = db.league_named("Bedrock League")
+        self.assertFalse(bedrock.is_loaded)
+        with self.assertRaises(ValueError):
+            with db.batch():
+                bedrock.name = "Quarry League"
+                bedrock.team_named("Stones").name = "Stones United"
+                raise ValueError("stop")
+        self.assertEqual("Bedrock League", bedrock.name)
+        self.assertIs(bedrock, db.league_named("Bedrock League"))
+        # the league stays loaded (its store may have let go of it), with its contents as they were
+        self.assertTrue(bedrock.is_loaded)
+        self.assertIsNotNone(bedrock.team_named("Stones"))
+        self.assertIsNone(bedrock.team_named("Stones United"))
+
+    def test_batch_needs_the_write_lock(self):
+        db = build_database()
+        with db.reading():
+            with self.assertRaises(RuntimeError):
+                with db.batch():
+                    pass
+
+    def test_other_threads_see_the_batch_all_at_once(self):
+        db = build_database()
+        stones = db.league_named("Bedrock League").team_named("Stones")
+        seen = []
+        started = threading.Event()
+
+        def reader():
+            started.set()
+            with db.reading():
+                seen.append(len(stones.members))
+
+        with db.batch():
+            thread = threading.Thread(target=reader)
+            thread.start()
+            started.wait(5)
+            for oid in range(3, 8):
+                stones.add_member(TeamMember(oid, f"Member {oid}", f"m{oid}@bedrock"))
+        thread.join(5)
+        self.assertEqual([7], seen)
+
+
+if __name__ == '__main__':
+    unittest.main()
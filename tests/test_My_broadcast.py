@@ -0,0 +1,118 @@
+import unittest
+from datetime import date, datetime
+from model.broadcast import unique_recipients
+from model.competition import Competition
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.team import Team
+from model.team_member import TeamMember
+
+
+class RecordingEmailer:
+    def __init__(self):
+        self.calls = []
+
+    def send_plain_email(self, recipients, subject, message):
+        self.calls.append((list(recipients), subject, message))
+        return len(self.calls)
+
+    @property
+    def recipients(self):
+        return [recipient for call in self.calls for recipient in call[0]]
+
+
+class TestBroadcast(unittest.TestCase):
+    def setUp(self):
+        self.current = LeagueDatabase._sole_instance
+        self.db = LeagueDatabase()
+        self.bedrock = League(1, "Bedrock League")
+        self.stones = Team(1, "Stones")
+        self.brooms = Team(2, "Brooms")
+        self.rocks = Team(3, "Rocks")
+        self.fred = TeamMember(1, "Fred", "fred@bedrock")
+        barney = TeamMember(2, "Barney", "barney@bedrock")
+        for team in (self.stones, self.brooms, self.rocks):
+            team.add_member(self.fred)  # the same person on three teams
+        self.stones.add_member(barney)
+        self.brooms.add_member(TeamMember(3, "Wilma", "Wilma@Bedrock"))
+        self.rocks.add_member(TeamMember(4, "Wilma again", "wilma@bedrock"))  # same address, other spelling
+        self.rocks.add_member(TeamMember(5, "Dino", None))
+        for team in (self.stones, self.brooms, self.rocks):
+            self.bedrock.add_team(team)
+        self.bedrock.add_competition(Competition(1, [self.stones, self.brooms], "Rink", datetime(2024, 3, 30, 18, 0)))
+        self.bedrock.add_competition(Competition(2, [self.brooms, self.rocks], "Quarry", datetime(2024, 3, 31, 9, 0)))
+        self.bedrock.add_competition(Competition(3, [self.stones, self.rocks], "Pond", None))
+        self.db.add_league(self.bedrock)
+        slate = League(2, "Slate League")
+        gravel = Team(1, "Gravel")
+        gravel.add_member(TeamMember(1, "Fred", "FRED@bedrock"))
+        gravel.add_member(TeamMember(2, "Mr. Slate", "slate@quarry"))
+        slate.add_team(gravel)
+        slate.add_competition(Competition(1, [gravel, gravel], "Slate Rink", datetime(2024, 3, 30, 20, 0)))
+        self.db.add_league(slate)
+
+    def tearDown(self):
+        LeagueDatabase._sole_instance = self.current
+
+    def test_unique_recipients_casefolds_and_keeps_first_spelling(self):
+        self.assertEqual(["fred@bedrock", "barney@bedrock", "Wilma@Bedrock"],
+                         unique_recipients([self.stones, self.brooms, self.rocks]))
+
+    def test_league_broadcast_sends_each_address_once(self):
+        emailer = RecordingEmailer()
+        self.assertEqual([1], self.bedrock.send_email(emailer, "Bonspiel", "See you on the ice."))
+        self.assertEqual([(["fred@bedrock", "barney@bedrock", "Wilma@Bedrock"], "Bonspiel", "See you on the ice.")],
+                         emailer.calls)
+
+    def test_league_broadcast_on_date(self):
+        emailer = RecordingEmailer()
+        self.bedrock.send_email_on_date(emailer, date(2024, 3, 31), "Tomorrow", "9 am")
+        self.assertEqual(["fred@bedrock", "Wilma@Bedrock"], emailer.recipients)
+        emailer = RecordingEmailer()
+        self.bedrock.send_email_on_date(emailer, datetime(2024, 3, 30, 12, 0), "Tonight", "6 pm")
+        self.assertEqual(["fred@bedrock", "barney@bedrock", "Wilma@Bedrock"], emailer.recipients)
+        emailer = RecordingEmailer()
+        self.assertEqual([], self.bedrock.send_email_on_date(emailer, date(2024, 4, 1), "Nothing", ""))
+        self.assertEqual([], emailer.calls)
+
+    def test_league_broadcast_to_selected_teams(self):
+        emailer = RecordingEmailer()
+        self.bedrock.send_email_to_teams(emailer, [self.rocks, self.stones], "Practice", "Tuesday")
+        self.assertEqual(["fred@bedrock", "wilma@bedrock", "barney@bedrock"], emailer.recipients)
+
+    def test_database_broadcasts_span_leagues(self):
+        emailer = RecordingEmailer()
+        self.db.send_email(emailer, "Season", "Starts soon")
+        self.assertEqual(["fred@bedrock", "barney@bedrock", "Wilma@Bedrock", "slate@quarry"], emailer.recipients)
+        emailer = RecordingEmailer()
+        self.db.send_email_on_date(emailer, date(2024, 3, 30), "Tonight", "")
+        self.assertEqual(["fred@bedrock", "barney@bedrock", "Wilma@Bedrock", "slate@quarry"], emailer.recipients)
+        emailer = RecordingEmailer()
+        slate = self.db.league_named("Slate League")
+        self.db.send_email(emailer, "Slate only", "", leagues=[slate])
+        self.assertEqual(["FRED@bedrock", "slate@quarry"], emailer.recipients)
+        emailer = RecordingEmailer()
+        self.db.send_email_to_teams(emailer, [slate.team_named("Gravel"), self.stones], "Mixed", "")
+        self.assertEqual(["FRED@bedrock", "slate@quarry", "barney@bedrock"], emailer.recipients)
+
+    def test_large_broadcast_is_handed_over_in_batches(self):
+        league = League(3, "Big League")
+        for oid in range(1, 4):
+            team = Team(oid, f"Team {oid}")
+            for member_oid in range(1, 501):
+                team.add_member(TeamMember(member_oid, f"Member {member_oid}", f"m{member_oid}@{oid}.example.com"))
+            league.add_team(team)
+        emailer = RecordingEmailer()
+        self.assertEqual([1, 2, 3], league.send_email(emailer, "Bonspiel", ""))
+        self.assertEqual([500, 500, 500], [len(call[0]) for call in emailer.calls])
+        self.assertEqual(1500, len(set(emailer.recipients)))
+
+    def test_competition_email_dedupes(self):
+        emailer = RecordingEmailer()
+        competition = Competition(9, [self.stones, self.brooms, self.rocks], "Rink", None)
+        competition.send_email(emailer, "Game", "")
+        self.assertEqual([["fred@bedrock", "barney@bedrock", "Wilma@Bedrock"]], [call[0] for call in emailer.calls])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import unittest
+from datetime import datetime
+from model.change_journal import journal_file_name
+from model.competition import Competition
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.team import Team
+from model.team_member import TeamMember
+from tests.database_fixture import DatabaseTestCase, build_database, contents
+
+
+class TestChangeJournal(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_name = os.path.join(self.directory.name, "leagues.pkl")
+
+    @staticmethod
+    def journaled_database():
+        db = build_database()
+        db.journal_mode = True
+        return db
+
+    def reload(self):
+        LeagueDatabase().load(self.file_name)
+        return LeagueDatabase.instance()
+
+    def test_saves_append_changes_and_load_replays_them(self):
+        db = self.journaled_database()
+        db.save(self.file_name)
+        snapshot_size = os.path.getsize(self.file_name)
+        snapshot_mtime = os.stat(self.file_name).st_mtime_ns
+
+        league = db.league_named("Bedrock League")
+        stones = league.team_named("Stones")
+        quarry = Team(3, "Quarry")
+        quarry.add_member(TeamMember(1, "Betty", "betty@bedrock"))
+        league.add_team(quarry)
+        dino = TeamMember(3, "Dino", "dino@bedrock")
+        stones.add_member(dino)
+        # the same person on two teams is still one object after replay
+        quarry.add_member(dino)
+        dino.email = "dino@slate.com"
+        stones.name = "Stones United"
+        game = Competition(3, [stones, quarry], "Rink", None)
+        league.add_competition(game)
+        game.date_time = datetime(2024, 4, 6, 18, 0)
+        db.save(self.file_name)
+
+        other = League(3, "Granite League")
+        db.add_league(other)
+        other.name = "Quarry League"
+        stones.remove_member(stones.member_named("Fred"))
+        db.save(self.file_name)
+
+        # only the journal was written
+        self.assertEqual(snapshot_size, os.path.getsize(self.file_name))
+        self.assertEqual(snapshot_mtime, os.stat(self.file_name).st_mtime_ns)
+
+        loaded = self.reload()
+        self.assertEqual(contents(db), contents(loaded))
+        loaded_league = loaded.league_named("Bedrock League")
+        loaded_dino = loaded_league.team_named("Stones United").member_with_email("dino@slate.com")
+        self.assertIs(loaded_dino, loaded_league.team_named("Quarry").member_with_email("dino@slate.com"))
+
+        # the loaded database keeps appending to the same journal
+        loaded_league.team_named("Brooms").name = "Brooms FC"
+        loaded.save(self.file_name)
+        self.assertIsNotNone(self.reload().league_named("Bedrock League").team_named("Brooms FC"))
+
+    def test_torn_record_at_end_of_journal_is_ignored(self):
+        db = self.journaled_database()
+        db.save(self.file_name)
+        db.league_named("Bedrock League").name = "Renamed"
+        db.save(self.file_name)
+        with open(journal_file_name(self.file_name), "ab") as journal:
+            journal.write(b"\x00\x00\x01\x00partial")
+        self.assertIsNotNone(self.reload().league_named("Renamed"))
+
+    def test_compact_folds_journal_into_snapshot(self):
+        db = self.journaled_database()
+        db.save(self.file_name)
+        db.league_named("Bedrock League").team_named("Stones").add_member(TeamMember(3, "Dino", "dino@bedrock"))
+        db.save(self.file_name)
+        journal_size = os.path.getsize(journal_file_name(self.file_name))
+        db.compact(self.file_name)
+        self.assertLess(os.path.getsize(journal_file_name(self.file_name)), journal_size)
+        self.assertEqual(contents(db), contents(self.reload()))
+
+    def test_journal_from_another_snapshot_is_ignored(self):
+        db = self.journaled_database()
+        db.save(self.file_name)
+        db.league_named("Bedrock League").name = "Renamed"
+        db.save(self.file_name)
+        stale_journal = open(journal_file_name(self.file_name), "rb").read()
+        db.compact(self.file_name)
+        db.league_named("Renamed").name = "Renamed again"
+        with open(journal_file_name(self.file_name), "wb") as journal:
+            journal.write(stale_journal)
+        self.assertIsNotNone(self.reload().league_named("Renamed"))
+
+    def test_journal_mode_is_off_by_default(self):
+        db = LeagueDatabase()
+        db.add_league(League(1, "Bedrock League"))
+        db.save(self.file_name)
+        self.assertFalse(os.path.exists(journal_file_name(self.file_name)))
+
+
+if __name__ == '__main__':
+    unittest.main()
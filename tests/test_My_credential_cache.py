@@ -0,0 +1,89 @@
+import threading
+import time
+import unittest
+from model.credential_cache import CredentialCache
+from model.email_delivery import SmtpPool
+from tests.fake_smtp import FakeServer
+
+
+class TestCredentialCache(unittest.TestCase):
+    def setUp(self):
+        self.lookups = []
+        self.passwords = {"league@example.com": "secret"}
+
+    def lookup(self, key):
+        self.lookups.append(key)
+        return self.passwords.get(key)
+
+    def test_value_is_looked_up_once_per_ttl(self):
+        cache = CredentialCache(self.lookup, ttl=0.05)
+        self.assertEqual("secret", cache.get("league@example.com"))
+        self.assertEqual("secret", cache.get("league@example.com"))
+        self.assertEqual(1, len(self.lookups))
+        time.sleep(0.06)
+        self.passwords["league@example.com"] = "changed"
+        self.assertEqual("changed", cache.get("league@example.com"))
+        self.assertEqual(2, len(self.lookups))
+
+    def test_invalidate(self):
+        cache = CredentialCache(self.lookup, ttl=None)
+        cache.get("league@example.com")
+        cache.get("league@example.com")
+        cache.invalidate("league@example.com")
+        cache.get("league@example.com")
+        cache.invalidate()
+        cache.get("league@example.com")
+        self.assertEqual(3, len(self.lookups))
+
+    def test_missing_value_is_not_cached(self):
+        cache = CredentialCache(self.lookup)
+        self.assertIsNone(cache.get("new@example.com"))
+        self.passwords["new@example.com"] = "registered"
+        self.assertEqual("registered", cache.get("new@example.com"))
+
+    def test_concurrent_callers_share_one_lookup(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_lookup(key):
+            self.lookups.append(key)
+            started.set()
+            release.wait(5)
+            return "secret"
+
+        cache = CredentialCache(slow_lookup)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("league@example.com"))) for _ in range(4)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(["secret"] * 4, results)
+        self.assertEqual(1, len(self.lookups))
+
+    def test_failed_lookup_is_raised_and_not_cached(self):
+        def failing(key):
+            raise RuntimeError("keyring locked")
+
+        cache = CredentialCache(failing)
+        with self.assertRaises(RuntimeError):
+            cache.get("league@example.com")
+        cache._lookup = self.lookup
+        self.assertEqual("secret", cache.get("league@example.com"))
+
+    def test_pool_warm_up_opens_one_connection_for_the_first_send(self):
+        server = FakeServer()
+        pool = SmtpPool(server.connect)
+        pool.warm_up()
+        pool.warm_up()
+        self.assertEqual(1, len(server.connections))
+        with pool.connection() as connection:
+            self.assertIs(server.connections[0], connection)
+        self.assertEqual(1, len(server.connections))
+
+
+if __name__ == '__main__':
+    unittest.main()
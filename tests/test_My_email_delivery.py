@@ -0,0 +1,82 @@
+import email
+import unittest
+from model.email_delivery import DeliveryEngine, SmtpPool
+from tests.fake_smtp import FakeServer
+
+
+class TestEmailDelivery(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeServer()
+        self.engine = DeliveryEngine(SmtpPool(self.server.connect), "league@example.com", batch_size=3)
+
+    def test_recipients_are_sent_in_blind_copied_batches(self):
+        recipients = [f"m{i}@example.com" for i in range(7)]
+        result = self.engine.send(recipients, "Bonspiel", "See you on the ice.")
+        self.assertTrue(result.ok)
+        self.assertEqual(3, result.messages_sent)
+        self.assertEqual(recipients, [recipient.recipient for recipient in result.recipients])
+        self.assertEqual([recipients[0:3], recipients[3:6], recipients[6:]], [sent[2] for sent in self.server.sent])
+        message = email.message_from_bytes(self.server.sent[0][3])
+        self.assertEqual("Bonspiel", message["Subject"])
+        self.assertEqual("league@example.com", message["To"])
+        self.assertNotIn(b"m0@example.com", self.server.sent[0][3])
+
+    def test_connection_is_reused_between_sends(self):
+        self.engine.send(["a@example.com"], "One", "1")
+        self.engine.send(["b@example.com"], "Two", "2")
+        self.assertEqual(1, len(self.server.connections))
+        self.engine.pool.close()
+        self.assertTrue(self.server.connections[0].closed)
+        self.engine.send(["c@example.com"], "Three", "3")
+        self.assertEqual(2, len(self.server.connections))
+
+    def test_idle_connection_is_not_reused_after_max_idle(self):
+        engine = DeliveryEngine(SmtpPool(self.server.connect, max_idle=-1), "league@example.com")
+        engine.send(["a@example.com"], "One", "1")
+        engine.send(["b@example.com"], "Two", "2")
+        self.assertEqual(2, len(self.server.connections))
+        self.assertTrue(self.server.connections[0].closed)
+
+    def test_refused_recipients_are_reported(self):
+        self.server.unknown = {"m1@example.com", "m3@example.com", "m4@example.com", "m5@example.com"}
+        result = self.engine.send([f"m{i}@example.com" for i in range(7)], "Bonspiel", "See you on the ice.")
+        self.assertFalse(result.ok)
+        self.assertEqual(2, result.messages_sent)  # nobody in the second batch was accepted
+        self.assertEqual(["m1@example.com", "m3@example.com", "m4@example.com", "m5@example.com"],
+                         [failure.recipient for failure in result.failed])
+        self.assertEqual("550 No such user", result.failed[0].error)
+        self.assertEqual("3 of 7 recipients sent in 2 messages, 4 failed", str(result))
+        self.assertEqual(1, len(self.server.connections))  # refusals leave the connection usable
+
+    def test_dropped_connection_is_replaced_once(self):
+        self.engine.send(["a@example.com"], "One", "1")
+        self.server.drop_next = 1
+        result = self.engine.send(["b@example.com"], "Two", "2")
+        self.assertTrue(result.ok)
+        self.assertEqual(2, len(self.server.connections))
+        self.assertTrue(self.server.connections[0].closed)
+
+        self.server.drop_next = 2
+        result = self.engine.send(["c@example.com", "d@example.com", "e@example.com", "f@example.com"], "Three", "3")
+        self.assertEqual(["c@example.com", "d@example.com", "e@example.com"],
+                         [failure.recipient for failure in result.failed])
+        self.assertTrue(result.failed[0].error.startswith("disconnected"))
+        self.assertTrue(result.recipients[3].sent)
+
+    def test_connection_failure_fails_the_batch(self):
+        def refuse():
+            raise ConnectionRefusedError("Connection refused")
+
+        engine = DeliveryEngine(SmtpPool(refuse), "league@example.com")
+        result = engine.send(["a@example.com", "b@example.com"], "One", "1")
+        self.assertEqual(0, result.messages_sent)
+        self.assertEqual(["Connection refused"] * 2, [failure.error for failure in result.failed])
+
+    def test_nothing_is_sent_to_nobody(self):
+        result = self.engine.send([], "One", "1")
+        self.assertTrue(result.ok)
+        self.assertEqual([], self.server.connections)
+
+
+if __name__ == '__main__':
+    unittest.main()
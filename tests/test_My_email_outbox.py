@@ -0,0 +1,104 @@
+import threading
+import time
+import unittest
+from model.email_delivery import DeliveryEngine, SmtpPool
+from model.email_outbox import EmailOutbox, RateLimiter
+from model.team import Team
+from model.team_member import TeamMember
+from tests.fake_smtp import FakeServer
+
+
+class TestEmailOutbox(unittest.TestCase):
+    def make_outbox(self, server, workers=2, rate=None, batch_size=2):
+        engine = DeliveryEngine(SmtpPool(server.connect, max_connections=workers), "league@example.com", batch_size)
+        outbox = EmailOutbox(engine, workers, rate)
+        self.addCleanup(outbox.close)
+        return outbox
+
+    def test_send_returns_before_the_mail_is_sent(self):
+        server = FakeServer(delay=0.05)
+        outbox = self.make_outbox(server)
+        start = time.monotonic()
+        email = outbox.send_plain_email([f"m{i}@example.com" for i in range(5)], "Bonspiel", "See you on the ice.")
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertFalse(email.done)
+        self.assertTrue(email.wait(5))
+        self.assertTrue(email.result.ok)
+        self.assertEqual([f"m{i}@example.com" for i in range(5)], [r.recipient for r in email.result.recipients])
+        self.assertEqual(3, email.result.messages_sent)
+
+    def test_progress_and_done_callbacks(self):
+        server = FakeServer()
+        outbox = self.make_outbox(server, workers=1)
+        progress = []
+        finished = threading.Event()
+        email = outbox.send_plain_email([f"m{i}@example.com" for i in range(5)], "Bonspiel", "",
+                                        on_progress=lambda e: progress.append(e.batches_done),
+                                        on_done=lambda e: finished.set())
+        self.assertTrue(finished.wait(5))
+        self.assertEqual([1, 2, 3], progress)
+        called = []
+        email.add_done_callback(called.append)  # already done: called right away
+        self.assertEqual([email], called)
+
+    def test_workers_cap_the_batches_in_flight(self):
+        server = FakeServer(delay=0.02)
+        outbox = self.make_outbox(server, workers=3, batch_size=1)
+        emails = [outbox.send_plain_email([f"m{i}@example.com" for i in range(4)], "Bonspiel", "") for _ in range(3)]
+        for email in emails:
+            self.assertTrue(email.wait(5))
+        self.assertEqual(12, len(server.sent))
+        self.assertLessEqual(server.most_sending, 3)
+        self.assertGreater(server.most_sending, 1)
+        self.assertLessEqual(len(server.connections), 3)
+
+    def test_rate_limit_spaces_out_batches(self):
+        server = FakeServer()
+        outbox = self.make_outbox(server, workers=2, rate=50, batch_size=1)
+        email = outbox.send_plain_email([f"m{i}@example.com" for i in range(6)], "Bonspiel", "")
+        self.assertTrue(email.wait(5))
+        self.assertGreaterEqual(server.sent_times[-1] - server.sent_times[0], 5 / 50 * 0.9)
+
+    def test_sending_errors_are_reported_per_recipient(self):
+        def no_credentials():
+            raise LookupError("no password is registered")
+
+        engine = DeliveryEngine(SmtpPool(no_credentials), "league@example.com")
+        outbox = EmailOutbox(engine, rate=None)
+        self.addCleanup(outbox.close)
+        email = outbox.send_plain_email(["a@example.com"], "Bonspiel", "")
+        self.assertTrue(email.wait(5))
+        self.assertEqual("no password is registered", email.result.failed[0].error)
+
+    def test_team_email_through_the_outbox(self):
+        server = FakeServer()
+        outbox = self.make_outbox(server)
+        team = Team(1, "Stones")
+        team.add_member(TeamMember(1, "Fred", "fred@bedrock"))
+        team.add_member(TeamMember(2, "Barney", "barney@bedrock"))
+        email = team.send_email(outbox, "Practice", "Tuesday at 7")
+        self.assertTrue(email.wait(5))
+        self.assertEqual([["fred@bedrock", "barney@bedrock"]], [sent[2] for sent in server.sent])
+
+    def test_close_sends_what_is_queued_then_refuses_more(self):
+        server = FakeServer(delay=0.01)
+        outbox = self.make_outbox(server, workers=1, batch_size=1)
+        email = outbox.send_plain_email([f"m{i}@example.com" for i in range(4)], "Bonspiel", "")
+        outbox.close()
+        self.assertTrue(email.done)
+        self.assertEqual(4, len(server.sent))
+        with self.assertRaises(RuntimeError):
+            outbox.send_plain_email(["a@example.com"], "Bonspiel", "")
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(100)
+        start = time.monotonic()
+        for _ in range(11):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from model.email_delivery import DeliveryEngine, SmtpPool
+from model.email_queue import EmailQueue
+from tests.fake_smtp import FakeServer
+
+
+class TestEmailQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, "outbox.sqlite")
+        self.server = FakeServer()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open_queue(self, **kwargs):
+        engine = DeliveryEngine(SmtpPool(self.server.connect), "league@example.com", batch_size=2)
+        queue = EmailQueue(self.file_name, engine, rate=None, **kwargs)
+        self.addCleanup(queue.close)
+        return queue
+
+    def sent_to(self):
+        return [recipient for sent in self.server.sent for recipient in sent[2]]
+
+    def test_queued_mail_is_sent_in_batches(self):
+        queue = self.open_queue()
+        recipients = [f"m{i}@example.com" for i in range(5)]
+        message_id = queue.send_plain_email(recipients + ["m0@example.com"], "Bonspiel", "See you on the ice.")
+        self.assertEqual({"pending": 5, "sending": 0, "sent": 0, "failed": 0}, queue.message_status(message_id))
+        self.assertEqual(5, queue.send_due())
+        self.assertEqual(recipients, self.sent_to())
+        self.assertEqual(3, len(self.server.sent))
+        self.assertEqual(5, queue.message_status(message_id)["sent"])
+        self.assertIsNone(queue.next_due())
+        self.assertEqual(0, queue.send_due())
+
+    def test_reopened_queue_sends_only_what_is_left(self):
+        queue = self.open_queue()
+        message_id = queue.send_plain_email([f"m{i}@example.com" for i in range(5)], "Bonspiel", "")
+        # the program stops after the first batch: one batch sent, one in flight
+        with sqlite3.connect(self.file_name) as connection:
+            connection.execute("UPDATE deliveries SET status = 'sent'"
+                               " WHERE recipient IN ('m0@example.com', 'm1@example.com')")
+            connection.execute("UPDATE deliveries SET status = 'sending' WHERE recipient = 'm2@example.com'")
+        queue.close()
+
+        queue = self.open_queue()
+        self.assertEqual({"pending": 3, "sending": 0, "sent": 2, "failed": 0}, queue.message_status(message_id))
+        queue.send_due()
+        self.assertEqual(["m2@example.com", "m3@example.com", "m4@example.com"], self.sent_to())
+
+    def test_passing_failures_are_retried_with_backoff(self):
+        queue = self.open_queue(base_delay=10, max_delay=25, max_attempts=4)
+        message_id = queue.send_plain_email(["a@example.com", "b@example.com"], "Bonspiel", "")
+        self.server.drop_next = 2  # the batch and its retry on a new connection
+        start = time.time()
+        queue.send_due()
+        self.assertEqual(2, queue.message_status(message_id)["pending"])
+        self.assertAlmostEqual(start + 10, queue.next_due(), delta=5)
+        self.assertEqual(0, queue.send_due())  # not due yet
+
+        delays = []
+        for _ in range(2):
+            due = queue.next_due()
+            self.server.drop_next = 2
+            queue.send_due(now=due)
+            delays.append(queue.next_due() - time.time())
+        self.assertAlmostEqual(20, delays[0], delta=5)
+        self.assertAlmostEqual(25, delays[1], delta=5)  # capped at max_delay
+
+        self.server.drop_next = 2
+        queue.send_due(now=queue.next_due())  # the fourth attempt is the last
+        self.assertEqual(2, queue.message_status(message_id)["failed"])
+        self.assertTrue(queue.failures(message_id)[0].error.startswith("disconnected"))
+        self.assertEqual([], self.server.sent)
+
+    def test_permanent_refusal_is_not_retried(self):
+        self.server.unknown = {"nobody@example.com"}
+        queue = self.open_queue()
+        message_id = queue.send_plain_email(["a@example.com", "nobody@example.com"], "Bonspiel", "")
+        queue.send_due()
+        self.assertEqual({"pending": 0, "sending": 0, "sent": 1, "failed": 1}, queue.message_status(message_id))
+        self.assertEqual(["nobody@example.com: 550 No such user"], [str(f) for f in queue.failures(message_id)])
+        self.assertEqual(1, queue.purge())
+        self.assertEqual(0, sum(queue.message_status(message_id).values()))
+
+    def test_background_thread_sends_queued_mail(self):
+        queue = self.open_queue()
+        queue.start()
+        message_id = queue.send_plain_email(["a@example.com", "b@example.com", "c@example.com"], "Bonspiel", "")
+        deadline = time.monotonic() + 5
+        while queue.message_status(message_id)["sent"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(3, queue.message_status(message_id)["sent"])
+        queue.close()
+
+    def test_enqueueing_many_recipients_is_cheap(self):
+        queue = self.open_queue()
+        start = time.perf_counter()
+        message_id = queue.send_plain_email([f"m{i}@example.com" for i in range(20_000)], "Bonspiel", "")
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(20_000, queue.message_status(message_id)["pending"])
+
+
+if __name__ == '__main__':
+    unittest.main()
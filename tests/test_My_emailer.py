@@ -1,4 +1,6 @@
 import unittest
+from unittest import mock
+from model.credential_cache import CredentialCache
 from model.emailer import Emailer
 
 class TestEmailer(unittest.TestCase):
@@ -6,5 +8,26 @@ class TestEmailer(unittest.TestCase):
         recipients= ['ofamous1@gmail.com']
         Emailer.send_plain_email(self, recipients,'This is a test email','hello world')
 
+    def test_reconnect_after_configure_logs_in_as_the_old_sender(self):
+        logins = []  # (login, sender) per connection: who logged in, and who it sent From
+        def connect(*args, **kwargs):
+            connection = mock.MagicMock()
+            connection.login.side_effect = lambda user, password: logins.append([user])
+            connection.sendmail.side_effect = lambda sender, recipients, data: logins[-1].append(sender) or {}
+            return connection
+
+        self.addCleanup(Emailer.configure, Emailer.sender_address)
+        with mock.patch.object(Emailer, "_credentials", CredentialCache(lambda sender: f"password of {sender}")), \
+                mock.patch("smtplib.SMTP_SSL", side_effect=connect):
+            Emailer.configure("fred@bedrock")
+            old_engine = Emailer.delivery_engine()
+            old_engine.pool.warm_up()
+            # switching senders closes the old connection while the old engine still has mail to send
+            Emailer.configure("wilma@bedrock")
+            self.assertTrue(old_engine.send(["barney@bedrock"], "Bonspiel", "").ok)
+            self.assertTrue(Emailer.delivery_engine().send(["barney@bedrock"], "Bonspiel", "").ok)
+        self.assertEqual([["fred@bedrock"], ["fred@bedrock", "fred@bedrock"], ["wilma@bedrock", "wilma@bedrock"]],
+                         logins)
+
 if __name__ == '__main__':
     unittest.main()
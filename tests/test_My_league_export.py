@@ -0,0 +1,63 @@
+import csv
+import gzip
+import io
+import lzma
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from model.competition import Competition
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.team import Team
+from model.team_member import TeamMember
+
+
+class TestLeagueExport(unittest.TestCase):
+    @staticmethod
+    def build_league():
+        league = League(7, "Bedrock League")
+        stones = Team(1, "Stones")
+        brooms = Team(2, "Brooms")
+        stones.add_member(TeamMember(1, "Fred", "fred@bedrock"))
+        stones.add_member(TeamMember(2, "Bárney", None))
+        brooms.add_member(TeamMember(1, "Wilma", "wilma@bedrock"))
+        league.add_team(stones)
+        league.add_team(brooms)
+        league.add_competition(Competition(1, [stones, brooms], "Rink, east", datetime(2024, 3, 30, 18, 0)))
+        league.add_competition(Competition(2, [brooms, stones], "Rink", None))
+        return league
+
+    expected_rows = [
+        ["league", "7", "Bedrock League"],
+        ["team", "1", "Stones"],
+        ["member", "1", "1", "Fred", "fred@bedrock"],
+        ["member", "1", "2", "Bárney", ""],
+        ["team", "2", "Brooms"],
+        ["member", "2", "1", "Wilma", "wilma@bedrock"],
+        ["competition", "1", "Rink, east", "2024-03-30T18:00:00", "1", "2"],
+        ["competition", "2", "Rink", "", "2", "1"],
+    ]
+
+    def test_export_to_stream_leaves_it_open(self):
+        stream = io.BytesIO()
+        rows = LeagueDatabase().export_league(self.build_league(), stream)
+        self.assertFalse(stream.closed)
+        self.assertEqual(8, rows)
+        self.assertEqual(self.expected_rows, list(csv.reader(io.StringIO(stream.getvalue().decode("utf-8")))))
+
+    def test_export_compressed_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for compression, opener in (("gzip", gzip.open), ("lzma", lzma.open)):
+                file_name = os.path.join(directory, f"league.{compression}")
+                LeagueDatabase().export_league(self.build_league(), file_name, compression)
+                with opener(file_name, "rt", encoding="utf-8", newline="") as file:
+                    self.assertEqual(self.expected_rows, list(csv.reader(file)))
+
+    def test_unknown_compression_is_rejected(self):
+        with self.assertRaises(ValueError):
+            LeagueDatabase().export_league(self.build_league(), io.BytesIO(), "zip")
+
+
+if __name__ == '__main__':
+    unittest.main()
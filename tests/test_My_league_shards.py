@@ -0,0 +1,57 @@
+import json
+import os
+import unittest
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.league_shards import MANIFEST
+from tests.database_fixture import DatabaseTestCase, build_database, contents
+
+
+class TestLeagueShards(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.shards = os.path.join(self.directory.name, "leagues.shards")
+
+    def modified_times(self):
+        return {name: os.stat(os.path.join(self.shards, name)).st_mtime_ns for name in os.listdir(self.shards)}
+
+    def test_round_trip(self):
+        db = build_database()
+        db.save(self.shards)
+        self.assertEqual(["league-1.pkl", "league-2.pkl", MANIFEST], sorted(os.listdir(self.shards)))
+        for max_workers in (1, 4):
+            loaded = LeagueDatabase.read(self.shards, max_workers)
+            self.assertEqual(contents(db), contents(loaded))
+            self.assertTrue(all(league._databases == [loaded] for league in loaded.leagues))
+
+    def test_only_changed_leagues_are_rewritten(self):
+        db = build_database()
+        db.add_league(League(3, "Granite League"))
+        db.save(self.shards)
+        LeagueDatabase().load(self.shards)
+        db = LeagueDatabase.instance()
+        before = self.modified_times()
+        db.league_named("Slaté League").team_named("Gravel").name = "Pebbles"
+        db.remove_league(db.league_named("Granite League"))
+        db.add_league(League(4, "Quarry League"))
+        db.save(self.shards)
+        after = self.modified_times()
+        self.assertEqual(before["league-1.pkl"], after["league-1.pkl"])
+        self.assertNotEqual(before["league-2.pkl"], after["league-2.pkl"])
+        self.assertNotIn("league-3.pkl", after)
+        self.assertIn("league-4.pkl", after)
+        with open(os.path.join(self.shards, MANIFEST), encoding="utf-8") as file:
+            self.assertEqual(["Bedrock League", "Slaté League", "Quarry League"],
+                             [entry["name"] for entry in json.load(file)["leagues"]])
+        self.assertEqual(contents(db), contents(LeagueDatabase.read(self.shards)))
+
+    def test_save_to_another_directory_writes_every_league(self):
+        db = build_database()
+        db.save(self.shards)
+        other = os.path.join(self.directory.name, "copy.shards")
+        db.save(other)
+        self.assertEqual(3, len(os.listdir(other)))
+
+
+if __name__ == '__main__':
+    unittest.main()
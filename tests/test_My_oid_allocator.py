@@ -0,0 +1,71 @@
+import unittest
+import random
+from model.oid_allocator import OidAllocator
+from model.team import Team
+from model.team_member import TeamMember
+
+
+class TestOidAllocator(unittest.TestCase):
+    @staticmethod
+    def smallest_free(used):
+        oid = 1
+        while oid in used:
+            oid += 1
+        return oid
+
+    def test_peek_returns_smallest_free_oid(self):
+        used = {}
+        allocator = OidAllocator(used)
+        self.assertEqual(1, allocator.peek())
+        for oid in (1, 2, 3, 5):
+            used[oid] = oid
+            allocator.claim(oid)
+        self.assertEqual(4, allocator.peek())
+        used[4] = 4
+        allocator.claim(4)
+        self.assertEqual(6, allocator.peek())
+        del used[2]
+        allocator.release(2)
+        self.assertEqual(2, allocator.peek())
+
+    def test_matches_linear_scan_under_random_churn(self):
+        random.seed(4970)
+        used = {}
+        allocator = OidAllocator(used)
+        for _ in range(2000):
+            if used and random.random() < 0.4:
+                oid = random.choice(list(used))
+                del used[oid]
+                allocator.release(oid)
+            else:
+                # mix allocator-chosen oids with explicit ones, as the UI and tests both do
+                oid = allocator.allocate() if random.random() < 0.7 else random.randint(1, 300)
+                if oid not in used:
+                    used[oid] = oid
+                    allocator.claim(oid)
+                else:
+                    allocator.release(oid)
+            self.assertEqual(self.smallest_free(used), allocator.peek())
+
+    def test_reserve_block_skips_used_and_reserved_oids(self):
+        used = {2: 2, 4: 4}
+        allocator = OidAllocator(used)
+        self.assertEqual([1, 3, 5], allocator.reserve_block(3))
+        self.assertEqual(6, allocator.peek())
+        allocator.release(3)
+        self.assertEqual(3, allocator.peek())
+
+    def test_team_reuses_smallest_free_member_oid(self):
+        t = Team(1, "Flintstones")
+        for oid in (1, 2, 3):
+            t.add_member(TeamMember(oid, f"m{oid}", f"m{oid}@bedrock"))
+        self.assertEqual(4, t.find_free_member_oid())
+        t.remove_member(t.member_named("m2"))
+        self.assertEqual(2, t.find_free_member_oid())
+        reserved = t.reserve_member_oids(2)
+        self.assertEqual([2, 4], reserved)
+        self.assertEqual(5, t.find_free_member_oid())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import os
+import tempfile
+import unittest
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.team import Team
+from model.team_member import TeamMember
+from model.custom_exceptions import DuplicateEmail
+
+
+class TestRosterImport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_csv(self, text, name="roster.csv"):
+        file_name = os.path.join(self.directory.name, name)
+        with open(file_name, "w", encoding="utf-8", newline="") as file:
+            file.write(text)
+        return file_name
+
+    def test_import_creates_teams_and_members(self):
+        league = League(1, "Some league")
+        league.add_team(Team(1, "Stones"))
+        file_name = self.write_csv("Team name,Member name,Member email\n"
+                                   "Stones,Fred,fred@bedrock\n"
+                                   "Brooms,Wilma,wilma@bedrock\n"
+                                   "Stones,Barney,barney@bedrock\n"
+                                   "Brooms,Bétty,betty@bedrock\n")
+        result = league.import_league_team(file_name)
+        self.assertTrue(result.ok)
+        self.assertEqual(4, result.rows_read)
+        self.assertEqual(1, result.teams_created)
+        self.assertEqual(4, result.members_created)
+        stones = league.team_named("Stones")
+        brooms = league.team_named("Brooms")
+        self.assertEqual(2, brooms.oid)
+        self.assertEqual([1, 2], [member.oid for member in stones.members])
+        self.assertEqual("betty@bedrock", brooms.member_named("Bétty").email)
+
+        # unused reserved oids are handed back
+        self.assertEqual(3, league.find_free_team_oid())
+        self.assertEqual(3, stones.find_free_member_oid())
+
+    def test_reimport_leaves_existing_members_alone(self):
+        league = League(1, "Some league")
+        file_name = self.write_csv("Team name,Member name,Member email\nStones,Fred,fred@bedrock\n")
+        league.import_league_team(file_name)
+        file_name = self.write_csv("Team name,Member name,Member email\nStones,Fred,FRED@bedrock\n")
+        result = league.import_league_team(file_name)
+        self.assertTrue(result.ok)
+        self.assertEqual(1, result.members_unchanged)
+        self.assertEqual(1, len(league.team_named("Stones").members))
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        league = League(1, "Some league")
+        stones = Team(1, "Stones")
+        stones.add_member(TeamMember(1, "Fred", "fred@bedrock"))
+        league.add_team(stones)
+        file_name = self.write_csv("Team name,Member name,Member email\n"
+                                   "Stones,Wilma\n"
+                                   "Stones,Barney,FRED@bedrock\n"
+                                   ",Nobody,nobody@bedrock\n"
+                                   "Stones,Betty,betty@bedrock\n")
+        result = league.import_league_team(file_name)
+        self.assertFalse(result.ok)
+        self.assertEqual([2, 3, 4], [error.line for error in result.errors])
+        self.assertEqual(1, result.members_created)
+        self.assertIsNotNone(stones.member_named("Betty"))
+        self.assertIsNone(stones.member_named("Barney"))
+
+    def test_missing_file_is_reported(self):
+        league = League(1, "Some league")
+        result = league.import_league_team(os.path.join(self.directory.name, "missing.csv"))
+        self.assertFalse(result.ok)
+        self.assertIsNone(result.errors[0].line)
+        self.assertEqual([], league.teams)
+
+    def test_bulk_load_validates_whole_file_first(self):
+        db = LeagueDatabase()
+        league = League(1, "Some league")
+        stones = Team(1, "Stones")
+        stones.add_member(TeamMember(1, "Fred", "fred@bedrock"))
+        league.add_team(stones)
+        db.add_league(league)
+        file_name = self.write_csv("Team name,Member name,Member email\n"
+                                   "Stones,Barney,barney@bedrock\n"
+                                   "Stones,Barney Rubble,BARNEY@bedrock\n"
+                                   "Stones,Freddy,fred@BEDROCK\n"
+                                   "Brooms,Wilma,wilma@bedrock\n"
+                                   "Brooms,Wilma,wilma@bedrock\n")
+
+        preview = db.import_league_teams(league, file_name, dry_run=True)
+        self.assertTrue(preview.dry_run)
+        self.assertEqual(1, preview.teams_created)
+        self.assertEqual(2, preview.members_created)
+        self.assertEqual(1, preview.members_unchanged)
+        self.assertEqual([3, 4], [error.line for error in preview.errors])
+        # nothing changed
+        self.assertIsNone(league.team_named("Brooms"))
+        self.assertEqual(1, len(stones.members))
+        self.assertEqual(2, league.find_free_team_oid())
+
+        result = db.import_league_teams(league, file_name)
+        self.assertFalse(result.dry_run)
+        self.assertEqual((1, 2, 1), (result.teams_created, result.members_created, result.members_unchanged))
+        self.assertEqual([3, 4], [error.line for error in result.errors])
+        self.assertEqual(2, league.team_named("Brooms").oid)
+        self.assertEqual(2, stones.member_named("Barney").oid)
+        self.assertEqual(1, len(league.team_named("Brooms").members))
+
+    def test_many_files_merge_in_order_given(self):
+        club_a = self.write_csv("Team name,Member name,Member email\n"
+                                "Stones,Fred,fred@bedrock\n"
+                                "Brooms,Wilma,wilma@bedrock\n", "club_a.csv")
+        club_b = self.write_csv("Team name,Member name,Member email\n"
+                                "Stones,Freddy,FRED@bedrock\n"
+                                "Stones,Barney,barney@bedrock\n"
+                                "Sweepers\n", "club_b.csv")
+        missing = os.path.join(self.directory.name, "club_c.csv")
+        outcomes = []
+        for max_workers in (1, 2):
+            league = League(1, "Some league")
+            result = league.import_league_team_files([club_a, club_b, missing], max_workers)
+            outcomes.append([(team.oid, team.name, [(m.oid, m.name) for m in team.members]) for team in league.teams])
+            self.assertEqual(5, result.rows_read)
+            self.assertEqual(2, result.teams_created)
+            self.assertEqual(3, result.members_created)
+            # the later file loses the conflict, and every error names its file
+            self.assertEqual([("club_b.csv", 2), ("club_b.csv", 4), ("club_c.csv", None)],
+                             [(os.path.basename(error.source), error.line) for error in result.errors])
+            self.assertTrue(str(result.errors[0]).startswith("club_b.csv: line 2: "))
+        self.assertEqual(outcomes[0], outcomes[1])
+        self.assertEqual([(1, "Stones", [(1, "Fred"), (2, "Barney")]), (2, "Brooms", [(1, "Wilma")])], outcomes[0])
+
+    def test_teams_built_by_workers_are_checked_and_indexed(self):
+        club_a = self.write_csv("Team name,Member name,Member email\n"
+                                "Stones,Fred,fred@bedrock\n"
+                                "Stones,Fred,FRED@bedrock\n"
+                                "Stones,Barney,fred@BEDROCK\n"
+                                "Brooms,Wilma,wilma@bedrock\n", "club_a.csv")
+        club_b = self.write_csv("Team name,Member name,Member email\n"
+                                "Quarry,Betty,betty@bedrock\n", "club_b.csv")
+        league = League(1, "Some league")
+        league.add_team(Team(1, "Brooms"))
+        result = league.import_league_team_files([club_a, club_b], max_workers=2)
+        self.assertEqual((2, 3, 1), (result.teams_created, result.members_created, result.members_unchanged))
+        self.assertEqual([("club_a.csv", 4)], [(os.path.basename(error.source), error.line) for error in result.errors])
+        stones = league.team_named("Stones")
+        self.assertEqual([(1, "Brooms"), (2, "Stones"), (3, "Quarry")], [(team.oid, team.name) for team in league.teams])
+        fred = stones.member_with_email("Fred@Bedrock")
+        self.assertEqual((1, "Fred"), (fred.oid, fred.name))
+        self.assertEqual((stones,), fred._teams)
+        self.assertEqual([league], stones._leagues)
+        with self.assertRaises(DuplicateEmail):
+            stones.add_member(TeamMember(2, "Freddy", "FRED@bedrock"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.rw_lock import ReadWriteLock
+from model.team import Team
+from model.team_member import TeamMember
+
+
+def start_threads(targets, errors):
+    def guarded(target):
+        try:
+            target()
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=guarded, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_threads(targets):
+    errors = []
+    for thread in start_threads(targets, errors):
+        thread.join(60)
+    return errors
+
+
+class TestReadWriteLock(unittest.TestCase):
+    def test_readers_share_the_lock(self):
+        lock = ReadWriteLock()
+        barrier = threading.Barrier(3, timeout=5)
+
+        def reader():
+            with lock.read():
+                barrier.wait()  # only returns if all three readers hold the lock at once
+
+        self.assertEqual([], run_threads([reader] * 3))
+
+    def test_writer_excludes_readers(self):
+        lock = ReadWriteLock()
+        events = []
+        writing = threading.Event()
+
+        def writer():
+            with lock.write():
+                writing.set()
+                events.append("write start")
+                time.sleep(0.05)
+                events.append("write end")
+
+        def reader():
+            writing.wait(5)
+            with lock.read():
+                events.append("read")
+
+        self.assertEqual([], run_threads([writer, reader]))
+        self.assertEqual(["write start", "write end", "read"], events)
+
+    def test_waiting_writer_goes_before_new_readers(self):
+        lock = ReadWriteLock()
+        events = []
+        lock.acquire_read()
+        writer = threading.Thread(target=lambda: (lock.acquire_write(), events.append("write"), lock.release_write()))
+        writer.start()
+        while not lock._waiting_writers:
+            time.sleep(0.001)
+        reader = threading.Thread(target=lambda: (lock.acquire_read(), events.append("read"), lock.release_read()))
+        reader.start()
+        time.sleep(0.05)
+        self.assertEqual([], events)
+        lock.release_read()
+        writer.join(5)
+        reader.join(5)
+        self.assertEqual(["write", "read"], events)
+
+    def test_reentrancy(self):
+        lock = ReadWriteLock()
+        with lock.write():
+            with lock.write():
+                with lock.read():
+                    pass
+        with lock.read():
+            with lock.read():
+                with self.assertRaises(RuntimeError):
+                    lock.acquire_write()
+        with lock.write():
+            pass  # everything was released
+
+
+class TestConcurrentDatabase(unittest.TestCase):
+    TEAMS = 4
+
+    def setUp(self):
+        self.current = LeagueDatabase._sole_instance
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)  # switch threads often so that races show up
+        self.db = LeagueDatabase()
+        for oid in range(1, 3):
+            league = League(oid, f"League {oid}")
+            for team_oid in range(1, self.TEAMS + 1):
+                league.add_team(Team(team_oid, f"Team {team_oid}"))
+            self.db.add_league(league)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+        LeagueDatabase._sole_instance = self.current
+
+    def check_consistent(self):
+        # every index agrees with the collection it indexes
+        for league in self.db.leagues:
+            for team in league.teams:
+                self.assertIs(team, league.team_named(team.name))
+                self.assertEqual(len(team.members), len(team._member_emails))
+                for member in team.members:
+                    self.assertIs(member, team.member_with_email(member.email))
+                    self.assertIs(member, team.member_named(member.name))
+                    self.assertIn(team, league.teams_for_member(member))
+
+    def total_members(self):
+        return sum(len(team.members) for league in self.db.leagues for team in league.iter_teams())
+
+    def test_concurrent_readers_and_writers(self):
+        stop = threading.Event()
+        checks = []
+
+        def writer(league_oid, team_oid):
+            team = self.db._leagues[league_oid]._teams[team_oid]
+            for round_number in range(150):
+                member = TeamMember(round_number, f"Member {team_oid}.{round_number}", f"m{round_number}@{team_oid}")
+                team.add_member(member)
+                member.name = f"Renamed {team_oid}.{round_number}"
+                member.email = f"r{round_number}@{team_oid}"
+                if round_number % 3:
+                    team.remove_member(member)
+
+        def renamer():
+            league = self.db._leagues[1]
+            for round_number in range(300):
+                league.teams[round_number % self.TEAMS].name = f"Team {round_number % self.TEAMS + 1}"
+
+        def reader():
+            while not stop.is_set():
+                with self.db.reading():
+                    before = self.total_members()
+                    self.check_consistent()
+                    self.assertEqual(before, self.total_members())  # nothing changed while we read
+                    with open(os.devnull, "wb") as null:
+                        for league in self.db.leagues.snapshot():
+                            self.db.export_league(league, null)
+                checks.append(before)
+
+        errors = []
+        readers = start_threads([reader] * 3, errors)
+        errors.extend(run_threads([lambda l=league_oid, t=team_oid: writer(l, t)
+                                   for league_oid in (1, 2) for team_oid in range(1, self.TEAMS + 1)] + [renamer]))
+        stop.set()
+        for thread in readers:
+            thread.join(60)
+
+        self.assertEqual([], errors)
+        self.assertTrue(checks)
+        self.check_consistent()
+        self.assertEqual(2 * self.TEAMS * 50, self.total_members())
+
+    def test_singleton_is_created_once(self):
+        LeagueDatabase._sole_instance = None
+        barrier = threading.Barrier(8, timeout=5)
+        instances = []
+
+        def get_instance():
+            barrier.wait()
+            instances.append(LeagueDatabase.instance())
+
+        self.assertEqual([], run_threads([get_instance] * 8))
+        self.assertEqual(8, len(instances))
+        self.assertTrue(all(instance is instances[0] for instance in instances))
+
+    def test_deferred_league_loads_once_for_concurrent_readers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "leagues.sqlite")
+            league = self.db._leagues[1]
+            for team in league.teams:
+                for oid in range(1, 21):
+                    team.add_member(TeamMember(oid, f"Member {oid}", f"m{oid}@{team.oid}"))
+            self.db.save(file_name)
+            loaded = LeagueDatabase.read(file_name)
+            deferred = loaded.league_named("League 1")
+            self.assertFalse(deferred.is_loaded)
+            barrier = threading.Barrier(6, timeout=5)
+            counts = []
+
+            def read_members():
+                barrier.wait()
+                counts.append(sum(len(team.members) for team in deferred.teams))
+
+            self.assertEqual([], run_threads([read_members] * 6))
+            self.assertEqual([self.TEAMS * 20] * 6, counts)
+            self.assertTrue(all(team._leagues == [deferred] for team in deferred.teams))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import contextlib
+import io
+import json
+import os
+import pickle
+import shutil
+import unittest
+from unittest import mock
+from model import schema
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.league_shards import MANIFEST
+from model.sectioned_file import SectionedReader
+from model.team import Team
+from model.team_member import TeamMember
+from tests.database_fixture import DatabaseTestCase
+
+
+class TestSchema(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_name = os.path.join(self.directory.name, "leagues.pkl")
+        self.db = LeagueDatabase()
+        for oid in range(1, 4):
+            league = League(oid, f"League {oid}")
+            team = Team(1, "Stones")
+            team.add_member(TeamMember(1, "Fred", f"FRED@League{oid}.example"))
+            league.add_team(team)
+            self.db.add_league(league)
+        self.upgraded = []  # emails of the members upgraded, in order
+
+    def lower_email(self, member, state):
+        self.upgraded.append(state["_email"])
+        state["_email"] = state["_email"].lower()
+
+    @contextlib.contextmanager
+    def version_3(self):
+        # schema 3 stores member emails in lower case
+        with mock.patch.object(schema, "SCHEMA_VERSION", 3), \
+                mock.patch.dict(schema._migrations, {("TeamMember", 2): [self.lower_email]}):
+            yield
+
+    @staticmethod
+    def emails(db):
+        return [member.email for league in db.leagues for team in league.teams for member in team.members]
+
+    def schema_version(self, file_name=None):
+        file_name = file_name or self.file_name
+        with open(file_name, "rb") as file:
+            return SectionedReader(file, file_name).schema_version
+
+    def test_version_is_recorded(self):
+        self.db.save(self.file_name)
+        self.assertEqual(schema.SCHEMA_VERSION, self.schema_version())
+        other_file_name = os.path.join(self.directory.name, "other.pkl")
+        with self.version_3():
+            self.db.save(other_file_name)
+        self.assertEqual(3, self.schema_version(other_file_name))
+
+    def test_older_file_is_upgraded_on_read(self):
+        self.db.save(self.file_name)
+        with self.version_3():
+            loaded = LeagueDatabase.read(self.file_name)
+        self.assertEqual([f"fred@league{oid}.example" for oid in range(1, 4)], self.emails(loaded))
+        self.assertEqual(3, len(self.upgraded))
+
+    def test_current_file_is_not_upgraded(self):
+        with self.version_3():
+            self.db.save(self.file_name)
+            loaded = LeagueDatabase.read(self.file_name)
+        self.assertEqual(self.emails(self.db), self.emails(loaded))
+        self.assertEqual([], self.upgraded)
+
+    def test_plain_pickle_is_upgraded(self):
+        with open(self.file_name, "wb") as file:
+            pickle.dump(self.db, file)
+        with self.version_3():
+            loaded = LeagueDatabase.read(self.file_name)
+        self.assertEqual(3, len(self.upgraded))
+        self.assertTrue(all(email.islower() for email in self.emails(loaded)))
+
+    def test_newer_file_is_refused(self):
+        with self.version_3():
+            self.db.save(self.file_name)
+        with self.assertRaises(ValueError):
+            LeagueDatabase.read(self.file_name)
+
+    def test_upgrade_file(self):
+        self.db.save(self.file_name)
+        with self.version_3():
+            self.assertTrue(LeagueDatabase.upgrade_file(self.file_name))
+            self.assertEqual(3, self.schema_version())
+            self.assertEqual(3, len(self.upgraded))
+            self.assertFalse(LeagueDatabase.upgrade_file(self.file_name))
+            loaded = LeagueDatabase.read(self.file_name)
+        self.assertEqual(3, len(self.upgraded))
+        self.assertTrue(all(email.islower() for email in self.emails(loaded)))
+        self.assertEqual(["League 1", "League 2", "League 3"], [league.name for league in loaded.leagues])
+        self.assertEqual(self.db._last_oid, loaded._last_oid)
+        # the file as it was before the upgrade is the newest backup
+        with contextlib.redirect_stdout(io.StringIO()):
+            LeagueDatabase().load_backup(self.file_name)
+        self.assertEqual(self.emails(self.db), self.emails(LeagueDatabase.instance()))
+
+    def test_version_1_pickle_is_upgraded_by_upgrade_file(self):
+        legacy_file = os.path.join(os.path.dirname(__file__), "data", "legacy_league_db.pkl")
+        shutil.copyfile(legacy_file, self.file_name)
+        self.assertTrue(LeagueDatabase.upgrade_file(self.file_name))
+        self.assertEqual(schema.SCHEMA_VERSION, self.schema_version())
+        self.assertFalse(LeagueDatabase.upgrade_file(self.file_name))
+        loaded = LeagueDatabase.read(self.file_name)
+        self.assertEqual(["Legacy league", "Empty league"], [league.name for league in loaded.leagues])
+        league = loaded.league_named("Legacy league")
+        self.assertEqual([loaded], league._databases)
+        stones, brooms = league.teams
+        self.assertEqual(["Fred", "Barney"], [member.name for member in stones.members])
+        self.assertIs(stones.member_named("Fred"), stones.member_with_email("FRED@bedrock"))
+        self.assertEqual([league], stones._leagues)
+        self.assertEqual((stones,), stones.member_named("Fred")._teams)
+        self.assertEqual([stones, brooms], list(league.competitions[0].teams_competing))
+        self.assertEqual((league,), league.competitions[0]._leagues)
+
+    def test_shards_record_a_version_per_league(self):
+        shards = os.path.join(self.directory.name, "leagues.shards")
+        self.db.save(shards)
+        with self.version_3():
+            loaded = LeagueDatabase.read(shards)
+            self.assertEqual(3, len(self.upgraded))
+            loaded.league_named("League 1").name = "League One"
+            loaded.save(shards)
+            with open(os.path.join(shards, MANIFEST), encoding="utf-8") as file:
+                versions = [entry["schema_version"] for entry in json.load(file)["leagues"]]
+            self.assertEqual([3, 2, 2], versions)
+            self.upgraded.clear()
+            LeagueDatabase.read(shards)
+        # only the shards still written with schema 2 are upgraded
+        self.assertEqual(["FRED@League2.example", "FRED@League3.example"], self.upgraded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import contextlib
+import io
+import os
+import random
+import unittest
+from model.custom_exceptions import DamagedFile
+from model.league import League
+from model.league_database import LeagueDatabase
+from model.sectioned_file import SectionedReader
+from model.team import Team
+from model.team_member import TeamMember
+from tests.database_fixture import DatabaseTestCase, contents
+
+
+class TestSectionedFile(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_name = os.path.join(self.directory.name, "leagues.pkl")
+        self.db = LeagueDatabase()
+        for oid in range(1, 4):
+            league = League(oid, f"League {oid}")
+            for team_oid in range(1, 4):
+                team = Team(team_oid, f"Team {team_oid}")
+                for member_oid in range(1, 6):
+                    team.add_member(TeamMember(member_oid, f"Member {member_oid}", f"m{team_oid}.{member_oid}@{oid}"))
+                league.add_team(team)
+            self.db.add_league(league)
+
+    def save_two_versions(self):
+        # the backup holds every league as first saved; the live file has league 1 changed
+        self.db.save(self.file_name)
+        first = contents(self.db)
+        self.db.league_named("League 1").name = "League One"
+        self.db.save(self.file_name)
+        return first, contents(self.db)
+
+    def section_of(self, oid):
+        with open(self.file_name, "rb") as file:
+            reader = SectionedReader(file, self.file_name)
+            return reader.league_entry(oid)
+
+    def flip_byte(self, offset):
+        with open(self.file_name, "r+b") as file:
+            file.seek(offset)
+            value = file.read(1)[0]
+            file.seek(offset)
+            file.write(bytes([value ^ 0x5a]))
+
+    def load_quietly(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            LeagueDatabase().load(self.file_name)
+        return LeagueDatabase.instance(), output.getvalue()
+
+    def test_intact_file_has_no_damaged_leagues(self):
+        self.db.save(self.file_name)
+        self.assertEqual([], LeagueDatabase.verify_file(self.file_name))
+        self.assertEqual(contents(self.db), contents(LeagueDatabase.read(self.file_name)))
+
+    def test_damaged_league_is_restored_from_backup(self):
+        _, expected = self.save_two_versions()
+        _, _, offset, length, _ = self.section_of(2)
+        self.flip_byte(offset + length // 2)
+        self.assertEqual([2], LeagueDatabase.verify_file(self.file_name))
+
+        loaded, output = self.load_quietly()
+        self.assertIn("League 2", output)
+        self.assertEqual(expected, contents(loaded))
+        self.assertEqual([loaded.league_named("League 2")], loaded.dirty_leagues)
+
+        loaded.save(self.file_name)
+        self.assertEqual([], LeagueDatabase.verify_file(self.file_name))
+
+    def test_damaged_league_without_backup_is_left_out(self):
+        self.db.backup_generations = 0
+        self.db.save(self.file_name)
+        _, _, offset, length, _ = self.section_of(3)
+        self.flip_byte(offset)
+        loaded, output = self.load_quietly()
+        self.assertIn("left out", output)
+        self.assertEqual(["League 1", "League 2"], [league.name for league in loaded.leagues])
+        self.assertFalse(loaded.is_dirty)
+
+    def test_damaged_structure_falls_back_to_backup(self):
+        first, _ = self.save_two_versions()
+        self.flip_byte(os.path.getsize(self.file_name) - 20)  # inside the footer
+        with self.assertRaises(DamagedFile):
+            LeagueDatabase.verify_file(self.file_name)
+        loaded, _ = self.load_quietly()
+        self.assertEqual(first, contents(loaded))
+
+    def test_random_byte_flips(self):
+        first, second = self.save_two_versions()
+        with open(self.file_name, "rb") as file:
+            pristine = file.read()
+        rng = random.Random(4970)
+        for _ in range(300):
+            damaged = bytearray(pristine)
+            for _ in range(rng.randint(1, 3)):
+                damaged[rng.randrange(len(damaged))] ^= rng.randint(1, 255)
+            with open(self.file_name, "wb") as file:
+                file.write(damaged)
+            loaded, _ = self.load_quietly()
+            # every league comes back intact, either from the live file or from the backup
+            self.assertEqual([1, 2, 3], [league.oid for league in loaded.leagues])
+            for league_contents, before, after in zip(contents(loaded), first, second):
+                self.assertIn(league_contents, (before, after))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import unittest
+from model.league_database import LeagueDatabase, convert_database_file
+from model.snapshot import SnapshotStore
+from model.team_member import TeamMember
+from tests.database_fixture import DatabaseTestCase, build_database, contents
+
+
+class TestSnapshot(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_name = os.path.join(self.directory.name, "leagues.snapshot")
+
+    def test_leagues_materialize_on_first_use(self):
+        db = build_database()
+        db.save(self.file_name)
+        loaded = LeagueDatabase.read(self.file_name)
+        self.assertEqual(["Bedrock League", "Slaté League"], [league.name for league in loaded.leagues])
+        self.assertEqual([2, 2], [league.team_count for league in loaded.leagues])
+        self.assertTrue(all(not league.is_loaded for league in loaded.leagues))
+        self.assertEqual(1, loaded.next_oid() - 1)
+
+        slate = loaded.league_named("Slaté League")
+        self.assertEqual(["Gravel", "Stones"], [team.name for team in slate.teams])
+        self.assertFalse(loaded.league_named("Bedrock League").is_loaded)
+
+        bedrock = loaded.league_named("Bedrock League")
+        barney = bedrock.team_named("Stones").member_named("Barney")
+        self.assertIs(barney, bedrock.team_named("Brooms").member_named("Barney"))
+        self.assertIsNone(bedrock.competitions[1].location)
+        self.assertEqual(contents(db), contents(loaded))
+
+    def test_file_is_unmapped_once_every_league_is_loaded(self):
+        build_database().save(self.file_name)
+        loaded = LeagueDatabase.read(self.file_name)
+        store = loaded.league_named("Bedrock League")._loader
+        loaded.league_named("Bedrock League").teams
+        self.assertFalse(store.closed)
+        loaded.league_named("Slaté League").teams
+        self.assertTrue(store.closed)
+
+    def test_replaced_database_unmaps_its_file(self):
+        build_database().save(self.file_name)
+        db = LeagueDatabase.instance()
+        self.assertTrue(db.load(self.file_name))
+        old = LeagueDatabase.instance()
+        store = old.league_named("Bedrock League")._loader
+        self.assertTrue(db.load(self.file_name))
+        self.assertIsNot(old, LeagueDatabase.instance())
+        self.assertTrue(store.closed)
+        with self.assertRaises(ValueError):
+            old.league_named("Bedrock League").teams
+
+    def test_store_closes_as_a_context_manager(self):
+        build_database().save(self.file_name)
+        with SnapshotStore(self.file_name) as store:
+            self.assertEqual(1, store.last_oid)
+        self.assertTrue(store.closed)
+        store.close()
+
+    def test_changes_are_saved_by_rewriting_the_snapshot(self):
+        build_database().save(self.file_name)
+        LeagueDatabase().load(self.file_name)
+        loaded = LeagueDatabase.instance()
+        loaded.league_named("Bedrock League").team_named("Stones").add_member(TeamMember(3, "Dino", "dino@bedrock"))
+        loaded.save(self.file_name)
+        self.assertEqual(contents(loaded), contents(LeagueDatabase.read(self.file_name)))
+        self.assertEqual(["leagues.snapshot"], os.listdir(self.directory.name))
+
+    def test_convert_from_pickle(self):
+        db = build_database()
+        pickle_file = os.path.join(self.directory.name, "leagues.pkl")
+        db.save(pickle_file)
+        self.assertEqual(2, convert_database_file(pickle_file, self.file_name))
+        self.assertEqual(contents(db), contents(LeagueDatabase.read(self.file_name)))
+
+    def test_truncated_snapshot_is_rejected(self):
+        build_database().save(self.file_name)
+        with open(self.file_name, "r+b") as file:
+            file.truncate(os.path.getsize(self.file_name) - 8)
+        with self.assertRaises(ValueError):
+            LeagueDatabase.read(self.file_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import pickle
+import sqlite3
+import unittest
+from model.league import League
+from model.league_database import LeagueDatabase, convert_database_file
+from tests.database_fixture import DatabaseTestCase, build_database, contents
+
+
+class TestSqliteStore(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_name = os.path.join(self.directory.name, "leagues.sqlite")
+
+    def test_leagues_load_their_contents_on_first_use(self):
+        db = build_database()
+        db.save(self.file_name)
+        loaded = LeagueDatabase.read(self.file_name)
+        self.assertEqual(["Bedrock League", "Slaté League"], [league.name for league in loaded.leagues])
+        self.assertTrue(all(not league.is_loaded for league in loaded.leagues))
+        self.assertEqual(1, loaded.next_oid() - 1)
+
+        bedrock = loaded.league_named("Bedrock League")
+        self.assertEqual(["Stones", "Brooms"], [team.name for team in bedrock.teams])
+        self.assertTrue(bedrock.is_loaded)
+        self.assertFalse(loaded.league_named("Slaté League").is_loaded)
+        barney = bedrock.team_named("Stones").member_named("Barney")
+        self.assertIs(barney, bedrock.team_named("Brooms").member_named("Barney"))
+        self.assertEqual(2, len(bedrock.competitions_for_member(barney)))
+        self.assertEqual(contents(db), contents(loaded))
+
+    def test_save_in_place_keeps_unread_leagues(self):
+        build_database().save(self.file_name)
+        loaded = LeagueDatabase.read(self.file_name)
+        bedrock = loaded.league_named("Bedrock League")
+        bedrock.team_named("Stones").name = "Stones United"
+        loaded.league_named("Slaté League").name = "Quarry League"
+        loaded.add_league(League(3, "Granite League"))
+        loaded.save(self.file_name)
+        self.assertFalse(loaded.league_named("Quarry League").is_loaded)
+
+        reloaded = LeagueDatabase.read(self.file_name)
+        self.assertEqual(["Bedrock League", "Quarry League", "Granite League"],
+                         [league.name for league in reloaded.leagues])
+        self.assertEqual(contents(loaded), contents(reloaded))
+
+        reloaded.remove_league(reloaded.league_named("Bedrock League"))
+        reloaded.save(self.file_name)
+        with sqlite3.connect(self.file_name) as connection:
+            self.assertEqual(0, connection.execute("SELECT COUNT(*) FROM teams WHERE league_oid = 1").fetchone()[0])
+        self.assertEqual(["Quarry League", "Granite League"],
+                         [league.name for league in LeagueDatabase.read(self.file_name).leagues])
+
+    def test_pickling_a_deferred_league_loads_it_first(self):
+        build_database().save(self.file_name)
+        loaded = LeagueDatabase.read(self.file_name)
+        copy = pickle.loads(pickle.dumps(loaded))
+        self.assertTrue(copy.league_named("Bedrock League").is_loaded)
+        self.assertEqual(contents(loaded), contents(copy))
+
+    def test_convert_between_pickle_and_sqlite(self):
+        db = build_database()
+        pickle_file = os.path.join(self.directory.name, "leagues.pkl")
+        db.save(pickle_file)
+        sole_instance = LeagueDatabase._sole_instance
+        self.assertEqual(2, convert_database_file(pickle_file, self.file_name))
+        self.assertIs(sole_instance, LeagueDatabase._sole_instance)
+        self.assertEqual(contents(db), contents(LeagueDatabase.read(self.file_name)))
+
+        round_trip = os.path.join(self.directory.name, "round_trip.pkl")
+        convert_database_file(self.file_name, round_trip)
+        self.assertEqual(contents(db), contents(LeagueDatabase.read(round_trip)))
+
+    def test_load_makes_the_store_the_sole_instance(self):
+        build_database().save(self.file_name)
+        LeagueDatabase().load(self.file_name)
+        self.assertEqual(2, len(LeagueDatabase.instance().leagues))
+
+    def test_load_missing_store_does_not_create_it(self):
+        missing = os.path.join(self.directory.name, "missing.sqlite")
+        LeagueDatabase().load(missing)
+        self.assertFalse(os.path.exists(missing))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ from model.team import Team, DuplicateEmail
 from model.team_member import TeamMember
 from tests.fake_emailer import FakeEmailer
 from model.custom_exceptions import DuplicateOid
+from model import schema
 class TeamTests(unittest.TestCase):
     def test_create(self):
         name = "Curl Jam"
@@ -40,6 +41,70 @@ class TeamTests(unittest.TestCase):
         self.assertEqual(3, len(t.members))
 
 
+    def test_email_index_follows_member_changes(self):
+        t = Team(1, "Flintstones")
+        tm1 = TeamMember(5, "f", "f@bedrock")
+        tm2 = TeamMember(6, "g", "g@bedrock")
+        t.add_member(tm1)
+        t.add_member(tm2)
+
+        # changing an email to one used by a teammate is rejected and leaves the member unchanged
+        with self.assertRaises(DuplicateEmail):
+            tm2.email = "F@Bedrock"
+        self.assertEqual("g@bedrock", tm2.email)
+
+        # the old address is released once the member moves to a new one
+        tm1.email = "fred@bedrock"
+        t.add_member(TeamMember(7, "h", "F@BEDROCK"))
+        with self.assertRaises(DuplicateEmail):
+            t.add_member(TeamMember(8, "i", "FRED@bedrock"))
+
+        # removing a member releases both its oid and its email
+        t.remove_member(tm1)
+        t.add_member(TeamMember(5, "j", "fred@bedrock"))
+        self.assertEqual(3, len(t.members))
+
+    def test_member_email_checked_on_every_team(self):
+        stones = Team(1, "Stones")
+        brooms = Team(2, "Brooms")
+        barney = TeamMember(1, "Barney", "barney@bedrock")
+        stones.add_member(barney)
+        brooms.add_member(barney)
+        brooms.add_member(TeamMember(2, "Wilma", "wilma@bedrock"))
+
+        # Wilma is not on Stones, but Barney also plays on Brooms
+        stones.check_email_available("WILMA@bedrock", barney)
+        with self.assertRaises(DuplicateEmail):
+            barney.check_email_available("WILMA@bedrock")
+        barney.check_email_available("barney@BEDROCK")
+
+    def test_unpickles_list_based_team(self):
+        # teams saved before the indexes existed kept their members in a list
+        tm1 = TeamMember(5, "f", "f@bedrock")
+        del tm1._teams
+        t = Team.__new__(Team)
+        with schema.reading(schema.FIRST_VERSION):
+            t.__setstate__({"_oid": 1, "_name": "Flintstones", "_members": [tm1]})
+        self.assertEqual([tm1], t.members)
+        with self.assertRaises(DuplicateEmail):
+            t.add_member(TeamMember(6, "g", "F@bedrock"))
+        # the restored member is registered with the team, so its setter is checked too
+        t.add_member(TeamMember(7, "h", "h@bedrock"))
+        with self.assertRaises(DuplicateEmail):
+            tm1.email = "H@bedrock"
+
+    def test_members_is_read_only_live_view(self):
+        t = Team(1, "Flintstones")
+        tm1 = TeamMember(5, "f", "f")
+        members = t.members
+        self.assertEqual([], members)
+        t.add_member(tm1)
+        # the view reflects later changes without being fetched again
+        self.assertEqual([tm1], members)
+        self.assertIs(tm1, members[-1])
+        self.assertFalse(hasattr(members, "append"))
+        self.assertEqual([tm1], list(t.iter_members()))
+
     def test_removing_removes_from_members(self):
         t = Team(1, "Flintstones")
         tm1 = TeamMember(5, "f", "f")
@@ -60,6 +125,19 @@ class TeamTests(unittest.TestCase):
         self.assertEqual(t.members[2], t.member_named("Wilma"))
         self.assertIsNone(t.member_named("fred"))
 
+    def test_member_named_follows_renames(self):
+        t = Team(1, "Flintstones")
+        fred = TeamMember(2, "Fred", "fred@bedrock")
+        t.add_member(fred)
+        t.add_member(TeamMember(3, "Fred", "fred2@bedrock"))
+        # names are not unique; the first member added under a name is returned
+        self.assertIs(fred, t.member_named("Fred"))
+        fred.name = "Freddy"
+        self.assertIs(fred, t.member_named("Freddy"))
+        self.assertEqual(3, t.member_named("Fred").oid)
+        t.remove_member(fred)
+        self.assertIsNone(t.member_named("Freddy"))
+
     def test_sends_email(self):
         t = Team(1, "Flintstones")
         tm1 = TeamMember(5, "f", "f@foo.com")
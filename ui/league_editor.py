@@ -5,18 +5,44 @@ from PyQt5.QtGui import QIcon
 from model.league import League
 from model.team import Team
 from PyQt5 import uic, QtWidgets
-from PyQt5.QtWidgets import QMessageBox, QFileDialog
-from PyQt5.QtCore import pyqtSignal, Qt
+from PyQt5.QtWidgets import QMessageBox, QFileDialog, QProgressDialog
+from PyQt5.QtCore import pyqtSignal, Qt, QThread
 from ui.member_editor import MemberEditorWindow
 from ui.ui_base import UIBase
 
 UI_LeagueEditorWindow, QtBaseWindow = uic.loadUiType("ui/league_editor.ui")
 
 
+class ImportFilesThread(QThread):
+    """
+    Imports roster files into a league away from the GUI thread, so the window keeps
+    repainting while worker processes read the files and the league takes them in.
+    """
+    file_merged = pyqtSignal(int)  # number of files merged so far
+    imported = pyqtSignal(object)  # the ImportResult
+    failed = pyqtSignal(str)
+
+    def __init__(self, league, file_names, parent=None):
+        super().__init__(parent)
+        self._league = league
+        self._file_names = file_names
+
+    def run(self):
+        try:
+            result = self._league.import_league_team_files(
+                self._file_names, progress=lambda done, total: self.file_merged.emit(done))
+        except Exception as e:  # e.g. a worker process that died
+            self.failed.emit(str(e))
+            return
+        self.imported.emit(result)
+
+
 class LeagueEditorWindow(UI_LeagueEditorWindow, QtBaseWindow, UIBase):
     closed = pyqtSignal()
 
     def closeEvent(self, event):
+        if self._import_thread is not None:
+            self._import_thread.wait()  # the league must not be left half imported
         self.closed.emit()
         event.accept()
 
@@ -25,6 +51,7 @@ class LeagueEditorWindow(UI_LeagueEditorWindow, QtBaseWindow, UIBase):
         self.setupUi(self)
         self.setWindowIcon(QIcon('icons/curling.png'))
         self._league = league
+        self._import_thread = None  # ImportFilesThread while an import of team files runs
 
         if league:
             self.setWindowTitle(f"Editing League: {league.name}")
@@ -40,6 +67,7 @@ class LeagueEditorWindow(UI_LeagueEditorWindow, QtBaseWindow, UIBase):
         # #Connect the menu item triggered signals to slots
         self.exit_menu_item.triggered.connect(self.exit_menu_item_triggered)
         self.import_team_menu_item.triggered.connect(self.import_team_menu_item_triggered)
+        self.import_team_files_menu_item.triggered.connect(self.import_team_files_menu_item_triggered)
         self.export_team_menu_item.triggered.connect(self.export_team_menu_item_triggered)
         self.refresh_team_list()
 
@@ -57,9 +85,66 @@ class LeagueEditorWindow(UI_LeagueEditorWindow, QtBaseWindow, UIBase):
             file_dialog.setViewMode(QFileDialog.Detail)
             if file_dialog.exec_():
                 file_name = file_dialog.selectedFiles()[0]
-                self._league.import_league_team(file_name)
+                result = self._league.import_league_team(file_name)
+                if not result.ok:
+                    self.show_import_errors(result)
+        self.refresh_team_list()
+
+    def import_team_files_menu_item_triggered(self):
+        if self._league:
+            file_dialog = QFileDialog()
+            file_dialog.setNameFilter("Csv files (*.csv)")
+            file_dialog.setViewMode(QFileDialog.Detail)
+            file_dialog.setFileMode(QFileDialog.ExistingFiles)
+            if file_dialog.exec_() and self._import_thread is None:
+                # merge in name order so the same selection always gives the same oids
+                file_names = sorted(file_dialog.selectedFiles())
+                progress = QProgressDialog("Importing team files...", None, 0, len(file_names), self)
+                progress.setWindowModality(Qt.WindowModal)
+                progress.setMinimumDuration(0)
+                thread = ImportFilesThread(self._league, file_names, self)
+                thread.file_merged.connect(progress.setValue)
+                thread.imported.connect(self.team_files_imported)
+                thread.failed.connect(self.team_files_import_failed)
+                thread.finished.connect(progress.close)
+                thread.finished.connect(self.import_thread_finished)
+                self._import_thread = thread
+                thread.start()
+                return
         self.refresh_team_list()
 
+    def team_files_imported(self, result):
+        """
+        Shows the teams imported by an ImportFilesThread, and the rows it could not import.
+        :param result: The ImportResult of the import.
+        :return: None
+        """
+        self.refresh_team_list()
+        if not result.ok:
+            self.show_import_errors(result)
+
+    def team_files_import_failed(self, message):
+        self.refresh_team_list()
+        QMessageBox.critical(self, "Import failed", message)
+
+    def import_thread_finished(self):
+        self._import_thread = None
+
+    def show_import_errors(self, result):
+        """
+        Displays the rows that could not be imported.
+        :param result: The ImportResult returned by the import.
+        :return: None
+        """
+        details = "\n".join(str(error) for error in result.errors[:20])
+        if len(result.errors) > 20:
+            details += f"\n... and {len(result.errors) - 20} more"
+        dialog = QMessageBox(QMessageBox.Icon.Warning,
+                             "Import finished with errors",
+                             f"{result}\n\n{details}",
+                             QMessageBox.StandardButton.Ok)
+        dialog.exec()
+
     def export_team_menu_item_triggered(self):
         if self._league:
             team = self.get_team_from_selected_row()
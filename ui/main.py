@@ -1,12 +1,13 @@
 import os
-import sys
 from PyQt5 import QtWidgets
 from PyQt5 import uic
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QMessageBox, QFileDialog
 from model.league import League
+from model.autosave import AutosaveService
 from model.league_database import LeagueDatabase
+from model.sqlite_store import SQLITE_SUFFIXES
 from model.custom_exceptions import DuplicateOid
 from ui.ui_base import UIBase
 from ui.league_editor import LeagueEditorWindow
@@ -23,6 +24,7 @@ class MainWindow(UI_MainWindow, QtBaseWindow, UIBase):
         self.setWindowIcon(QIcon('icons/curling.png'))
 
         self.db = LeagueDatabase.instance()
+        self.autosave = None  # AutosaveService for the file last saved or loaded
 
         # set up the table widget
         super().initialize_table_widget(self.league_table_widget, ["OID", "League Name", "Number of Teams"])
@@ -173,7 +175,7 @@ class MainWindow(UI_MainWindow, QtBaseWindow, UIBase):
         """
         self.league_table_widget.setRowCount(0)
         for league in self.db.leagues:
-            super().add_item_to_table_widget(self.league_table_widget, league, str(len(league.teams)))
+            super().add_item_to_table_widget(self.league_table_widget, league, str(league.team_count))
 
         self.league_table_widget.sortItems(0)
         self.league_table_widget.resizeColumnsToContents()  # Resizes the table to its contents
@@ -181,28 +183,57 @@ class MainWindow(UI_MainWindow, QtBaseWindow, UIBase):
     # --------------------------------------------------------------------------
     # MENU Item Trigger slots
     # --------------------------------------------------------------------------
+    def closeEvent(self, event):
+        # write any changes the autosave service has not saved yet
+        self.stop_autosave()
+        event.accept()
+
+    def start_autosave(self, file_name):
+        """
+        Saves the database to file_name in the background from now on, a short time after each change.
+        :param file_name: The file the database was just saved to or loaded from.
+        :return: None
+        """
+        self.stop_autosave()
+        self.autosave = AutosaveService(self.db, file_name)
+        self.autosave.start()
+
+    def stop_autosave(self):
+        """
+        Stops the autosave service, saving whatever it has not saved yet.
+        :return: None
+        """
+        if self.autosave is not None:
+            self.autosave.stop()
+            self.autosave = None
+
     def quit_menu_item_triggered(self):
-        sys.exit(app.exec_())
+        self.close()
 
     def save_menu_item_triggered(self):
         if self.db:
             file_dialog = QFileDialog()
-            file_dialog.setNameFilter("Pickle files (*.pkl)")
+            file_dialog.setNameFilter("League files (*.pkl *.sqlite)")
             file_dialog.setViewMode(QFileDialog.Detail)
             file_dialog.setAcceptMode(QFileDialog.AcceptSave)
             if file_dialog.exec_():
                 file_name = file_dialog.selectedFiles()[0]
-                if not file_name.endswith(".pkl"):
+                if not file_name.endswith((".pkl",) + SQLITE_SUFFIXES):
                     file_name += ".pkl"
-                self.db.save(file_name)
+                if self.db.save(file_name):
+                    self.start_autosave(file_name)
 
     def load_menu_item_triggered(self):
         file_dialog = QFileDialog()
-        file_dialog.setNameFilter("Pickle files (*.pkl)")
+        file_dialog.setNameFilter("League files (*.pkl *.sqlite)")
         file_dialog.setViewMode(QFileDialog.Detail)
         if file_dialog.exec_():
             file_name = file_dialog.selectedFiles()[0]
-            self.db.load(file_name)
+            self.stop_autosave()
+            loaded = self.db.load(file_name)
             self.db = LeagueDatabase.instance()
             self.refresh_league_list()
+            if loaded:
+                # after a failed load the file may be damaged but recoverable; autosave must not overwrite it
+                self.start_autosave(file_name)
 
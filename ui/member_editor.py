@@ -78,10 +78,9 @@ class MemberEditorWindow(UI_MemberEditorWindow, QtBaseWindow, UIBase):
         if self.update_mode:
             if self.member_to_update:
                 try:
-                    for team_member in self._team.members:
-                        if team_member != self.member_to_update:
-                            if team_member.email.lower() == member_email.lower():
-                                raise DuplicateEmail(member_email)
+                    # check every team the member plays on before changing anything, so a
+                    # clash on another team cannot leave the name changed and the email not
+                    self.member_to_update.check_email_available(member_email)
 
                     self.member_to_update.name = member_name
                     self.member_to_update.email = member_email